@@ -0,0 +1,155 @@
+# Synthetic Notion dataset generator
+# Pages have the same property shapes as notion_example_data.json, select values are drawn
+# from vocabularies of the example file. Page i is always the same for given seed so pages
+# can be generated on demand (stub server, chunked benchmarks) without keeping them in memory.
+#
+# Run from repository root to write all pages as single query response (layout of notion_example_data.json):
+#   python bench/dataset.py 10000 bench_dataset.json
+import json
+import os
+import random
+import sys
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Iterator
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EXAMPLE_FILE = os.path.join(ROOT_DIR, 'notion_example_data.json')
+
+DATASET_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+LINK_BASE = 'https://example.com' # stand-in serves article pages itself with --local-links
+DATABASE_ID = '6e6fcb7f-1e38-4165-b414-0a8b5419b5ec'
+USER_ID = '0f198a89-6548-49a2-9d5c-8cb8a046afd7'
+START_TIME = datetime(2023, 1, 1, tzinfo=timezone.utc)
+MAX_EDIT_DELAY_MINUTES = 60 * 24 * 7 # pages are last edited within a week after creation
+COLORS = ['default', 'gray', 'brown', 'orange', 'yellow', 'green', 'blue', 'purple', 'pink', 'red']
+WORDS = (
+    'cloud native java kotlin python database index query cache kubernetes docker pipeline '
+    'security release platform service mesh observability metrics tracing team meeting '
+    'architecture design pattern testing performance scaling streaming event driven api'
+).split()
+
+def _example_vocabularies() -> dict[str, list[str]]:
+    with open(EXAMPLE_FILE) as f:
+        pages = json.load(f)['results']
+    vocabularies = {'Category': set(), 'Type': set(), 'Source': set(), 'Technical Category': set()}
+    for page in pages:
+        properties = page['properties']
+        for name in ('Category', 'Type', 'Source'):
+            select = properties[name]['select']
+            if (select):
+                vocabularies[name].add(select['name'])
+        for select in properties['Technical Category']['multi_select']:
+            vocabularies['Technical Category'].add(select['name'])
+    return {name: sorted(values) for name, values in vocabularies.items()}
+
+_VOCABULARIES = _example_vocabularies()
+
+def _timestamp(moment: datetime) -> str:
+    return moment.strftime('%Y-%m-%dT%H:%M:00.000Z')
+
+def _select(name: str) -> dict:
+    return {'id': name[:4], 'name': name, 'color': COLORS[len(name) % len(COLORS)]}
+
+def _rich_text(content: str|None) -> list:
+    if (not content):
+        return []
+    return [{
+        'type': 'text',
+        'text': {'content': content, 'link': None},
+        'annotations': {'bold': False, 'italic': False, 'strikethrough': False, 'underline': False, 'code': False, 'color': 'default'},
+        'plain_text': content,
+        'href': None,
+    }]
+
+def make_page(index: int, seed: int = 0, link_base: str = LINK_BASE) -> dict:
+    """
+    Page number index of synthetic database, pages are created one minute apart
+    """
+    rng = random.Random(seed * 1_000_003 + index)
+    page_id = str(uuid.UUID(int=rng.getrandbits(128), version=4))
+    created = START_TIME + timedelta(minutes=index)
+    edited = created + timedelta(minutes=rng.randrange(0, MAX_EDIT_DELAY_MINUTES))
+    name = ' '.join(rng.choice(WORDS) for _ in range(rng.randrange(3, 12))).capitalize()
+    page_type = rng.choice(_VOCABULARIES['Type'])
+    summary = None
+    if (page_type == 'Meeting' or rng.random() < 0.1):
+        summary = '\\n'.join(' '.join(rng.choice(WORDS) for _ in range(8)) for _ in range(rng.randrange(1, 4)))
+    credit = 'credit {}'.format(rng.randrange(100)) if rng.random() < 0.05 else None
+    tech = rng.sample(_VOCABULARIES['Technical Category'], rng.randrange(0, 4))
+    return {
+        'object': 'page',
+        'id': page_id,
+        'created_time': _timestamp(created),
+        'last_edited_time': _timestamp(edited),
+        'created_by': {'object': 'user', 'id': USER_ID},
+        'last_edited_by': {'object': 'user', 'id': USER_ID},
+        'cover': None,
+        'icon': None,
+        'parent': {'type': 'database_id', 'database_id': DATABASE_ID},
+        'archived': False,
+        'properties': {
+            'Credit': {'id': '%3B%3F%40%3D', 'type': 'rich_text', 'rich_text': _rich_text(credit)},
+            'Created time': {'id': 'C%3CQS', 'type': 'created_time', 'created_time': _timestamp(created)},
+            'Link': {'id': 'CkbV', 'type': 'url', 'url': '{}/articles/{}/{}'.format(link_base, index, name.lower().replace(' ', '-'))},
+            'Source': {'id': 'JXzw', 'type': 'select', 'select': _select(rng.choice(_VOCABULARIES['Source']))},
+            'Category': {'id': 'Q_xq', 'type': 'select', 'select': _select(rng.choice(_VOCABULARIES['Category']))},
+            'Technical Category': {'id': 'W%3E%3AU', 'type': 'multi_select', 'multi_select': [_select(value) for value in tech]},
+            'Type': {'id': 'gMat', 'type': 'select', 'select': _select(page_type)},
+            'Published time': {'id': 'n%3Cw%5D', 'type': 'date', 'date': None},
+            'Last edited time': {'id': 'rFcb', 'type': 'last_edited_time', 'last_edited_time': _timestamp(edited)},
+            'Summary': {'id': 'yUtS', 'type': 'rich_text', 'rich_text': _rich_text(summary)},
+            'Name': {'id': 'title', 'type': 'title', 'title': _rich_text(name)},
+        },
+        'url': 'https://www.notion.so/{}'.format(page_id.replace('-', '')),
+    }
+
+def database() -> dict:
+    """
+    Database object of synthetic pages, property ids and types are the same as in make_page
+    """
+    properties = make_page(0)['properties']
+    return {
+        'object': 'database',
+        'id': DATABASE_ID,
+        'title': [{'type': 'text', 'text': {'content': 'Articles', 'link': None}, 'plain_text': 'Articles', 'href': None}],
+        'properties': {name: {'id': prop['id'], 'name': name, 'type': prop['type'], prop['type']: {}} for name, prop in properties.items()},
+    }
+
+def iter_pages(count: int, start: int = 0, seed: int = 0) -> Iterator[dict]:
+    for index in range(start, start + count):
+        yield make_page(index, seed)
+
+def query_response(total: int, start_cursor: str = None, page_size: int = 100, seed: int = 0) -> dict:
+    """
+    Database query response for database of total pages, cursor is index of first page
+    """
+    start = int(start_cursor) if start_cursor else 0
+    end = min(start + page_size, total)
+    has_more = end < total
+    return {
+        'object': 'list',
+        'results': [make_page(index, seed) for index in range(start, end)],
+        'next_cursor': str(end) if has_more else None,
+        'has_more': has_more,
+        'type': 'page',
+        'page': {},
+    }
+
+def write_dataset(path: str, count: int, seed: int = 0) -> None:
+    """
+    Writes all pages as single query response, same layout as notion_example_data.json
+    """
+    with open(path, 'w') as f:
+        f.write('{"object": "list", "results": [')
+        for index in range(count):
+            if (index):
+                f.write(', ')
+            json.dump(make_page(index, seed), f)
+        f.write('], "next_cursor": null, "has_more": false, "type": "page", "page": {}}')
+
+if __name__ == "__main__":
+    if (len(sys.argv) < 3):
+        print('Usage: python bench/dataset.py <page count> <output file> [seed]')
+        sys.exit(1)
+    write_dataset(sys.argv[2], int(sys.argv[1]), int(sys.argv[3]) if len(sys.argv) > 3 else 0)
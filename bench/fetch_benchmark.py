@@ -0,0 +1,47 @@
+# Benchmark of sharded unpublished query (notion.fetch.shards) against local Notion stand-in
+# Cursor chain of single query is a sequence of dependent round trips, shards walk
+# disjoint created time windows at the same time so wall clock time drops with shards
+# until the rate limiter is the bottleneck
+#
+# Run from repository root:
+#   python bench/fetch_benchmark.py
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from standin import StandInServer, Profile
+from lib.notion import NotionDbClient
+from lib.transport import HttpTransport
+
+STANDIN_LATENCY = 0.2 # seconds per request
+PAGES = 5_000
+RATE = 20
+SHARDS = [1, 2, 4, 8]
+
+def run():
+    server = StandInServer(PAGES, profile=Profile(latency=STANDIN_LATENCY)).start()
+    print('{:>7} {:>9} {:>9} {:>10} {:>12}'.format('shards', 'articles', 'requests', 'wall[s]', 'in order'))
+    try:
+        expected = None
+        for shards in SHARDS:
+            config = {
+                'auth': {'token': 'bench'},
+                'database': {'id': 'bench'},
+                'api': {'url': server.url + '/v1', 'rate': RATE},
+                'fetch': {'shards': shards},
+            }
+            transport = HttpTransport()
+            client = NotionDbClient(config, transport=transport)
+            start = time.perf_counter()
+            ids = [article.id for article in client.iter_unpublished_articles()]
+            elapsed = time.perf_counter() - start
+            expected = ids if expected is None else expected
+            print('{:>7} {:>9} {:>9} {:>10.2f} {:>12}'.format(shards, len(ids), transport.stats.requests, elapsed, str(ids == expected)))
+            transport.close()
+    finally:
+        server.stop()
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,45 @@
+# Benchmark of ArticleToHtmlConverter rendering
+# Rows are taken from notion_example_data.json and replicated up to each size,
+# time per row should stay flat as size grows (linear scaling)
+#
+# Run from repository root:
+#   python bench/html_benchmark.py
+import io
+import json
+import logging
+import os
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from lib.notion import Article
+from lib.service import ArticleToHtmlConverter
+
+ROW_COUNTS = [1_000, 10_000, 100_000]
+
+def _load_articles(count: int) -> list[Article]:
+    with open(os.path.join(ROOT_DIR, 'notion_example_data.json')) as f:
+        results = json.load(f)['results']
+    articles = [Article.from_json(page) for page in results]
+    return (articles * (count // len(articles) + 1))[:count]
+
+def run():
+    logging.disable(logging.INFO)
+    articles = _load_articles(max(ROW_COUNTS))
+    print('{:>8} {:>8} {:>10} {:>12}'.format('mode', 'rows', 'wall[s]', 'per row[us]'))
+    for count in ROW_COUNTS:
+        rows = articles[:count]
+        start = time.perf_counter()
+        ArticleToHtmlConverter().convert(rows, 'Benchmark digest', 'preface')
+        elapsed = time.perf_counter() - start
+        print('{:>8} {:>8} {:>10.3f} {:>12.2f}'.format('string', count, elapsed, elapsed / count * 1e6))
+
+        start = time.perf_counter()
+        ArticleToHtmlConverter().write(io.StringIO(), rows, 'Benchmark digest', 'preface')
+        elapsed = time.perf_counter() - start
+        print('{:>8} {:>8} {:>10.3f} {:>12.2f}'.format('stream', count, elapsed, elapsed / count * 1e6))
+
+if __name__ == "__main__":
+    run()
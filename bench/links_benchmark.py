@@ -0,0 +1,49 @@
+# Benchmark of link enrichment (links section) against article pages of local stand-in
+# Checks are latency bound, concurrent checks limited per host cut wall clock time
+# and cached results make the next run free of requests
+#
+# Run from repository root:
+#   python bench/links_benchmark.py
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dataset
+from standin import StandInServer, Profile
+from lib.links import LinkCache, LinkEnricher
+from lib.transport import HttpTransport
+
+STANDIN_LATENCY = 0.1 # seconds per request
+LINKS = 500
+# (concurrency, per_host)
+LIMITS = [(1, 1), (4, 4), (16, 16)]
+
+def _check(urls: list[str], concurrency: int, per_host: int, cache: LinkCache = None) -> tuple[int, int, float, int]:
+    transport = HttpTransport({'pool': {'maxsize': per_host}})
+    enricher = LinkEnricher(transport, cache, concurrency, per_host)
+    start = time.perf_counter()
+    infos = enricher.enrich(urls)
+    elapsed = time.perf_counter() - start
+    transport.close()
+    return len(infos), transport.stats.requests, elapsed, sum(1 for info in infos.values() if info.dead)
+
+def run():
+    server = StandInServer(profile=Profile(latency=STANDIN_LATENCY), local_links=True).start()
+    urls = [dataset.make_page(index, link_base=server.url)['properties']['Link']['url'] for index in range(LINKS)]
+    print('{:>12} {:>9} {:>6} {:>9} {:>10} {:>6}'.format('concurrency', 'per_host', 'links', 'requests', 'wall[s]', 'dead'))
+    try:
+        for concurrency, per_host in LIMITS:
+            print('{:>12} {:>9} {:>6} {:>9} {:>10.2f} {:>6}'.format(concurrency, per_host, *_check(urls, concurrency, per_host)))
+        with tempfile.TemporaryDirectory() as directory:
+            cache = LinkCache(os.path.join(directory, 'link_cache.db'))
+            for run in ('cold', 'cached'):
+                print('{:>12} {:>9} {:>6} {:>9} {:>10.2f} {:>6}'.format(run, LIMITS[-1][1], *_check(urls, *LIMITS[-1], cache)))
+            cache.close()
+    finally:
+        server.stop()
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,141 @@
+# Micro benchmark of Notion page parsing
+# Compares compiled ArticleSchema with the former per property if/elif parser
+# on pages of notion_example_data.json replicated to PAGE_COUNT
+#
+# Run from repository root:
+#   python bench/parse_benchmark.py
+import json
+import os
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from lib.notion import Article, ArticleSchema
+
+PAGE_COUNT = 100_000
+REPEATS = 3
+# properties used by digest converters
+DIGEST_MAPPING = {
+    'name': 'Name',
+    'link': 'Link',
+    'type': 'Type',
+    'source': 'Source',
+    'summary': 'Summary',
+    'credit': 'Credit',
+    'category': 'Category',
+}
+
+def _legacy_from_json(json: dict) -> Article:
+    """
+    Article.from_json before schema compilation, kept for comparison
+    """
+    article = Article(json['id'], json['object'])
+    props_dict = {}
+    for prop_name, prop_value in json['properties'].items():
+        prop_type = prop_value['type']
+        if (prop_type == 'rich_text'):
+            props_dict[prop_name] = _legacy_parse_texts(prop_value, 'rich_text')
+        elif (prop_type == 'created_time'):
+            props_dict[prop_name] = _legacy_parse_generic(prop_value, 'created_time')
+        elif (prop_type == 'last_edited_time'):
+            props_dict[prop_name] = _legacy_parse_generic(prop_value, 'last_edited_time')
+        elif (prop_type == 'select'):
+            props_dict[prop_name] = _legacy_parse_select(prop_value)
+        elif (prop_type == 'multi_select'):
+            props_dict[prop_name] = _legacy_parse_multi_select(prop_value)
+        elif (prop_type == 'date'):
+            props_dict[prop_name] = _legacy_parse_generic(prop_value, 'date')
+        elif (prop_type == 'url'):
+            props_dict[prop_name] = _legacy_parse_generic(prop_value, 'url')
+        elif (prop_type == 'title'):
+            props_dict[prop_name] = _legacy_parse_texts(prop_value, 'title')
+    article.name = props_dict['Name']
+    article.link = props_dict['Link']
+    article.type = props_dict['Type']
+    article.source = props_dict['Source']
+    article.summary = props_dict['Summary']
+    article.credit = props_dict['Credit']
+    article.category = props_dict['Category']
+    article.tech_category = props_dict['Technical Category']
+    article.created_time = props_dict['Created time']
+    article.last_edited_time = props_dict['Last edited time']
+    article.published_time = props_dict['Published time']
+    return article
+
+def _legacy_parse_texts(json, key):
+    if (json['type'] != key):
+        raise ValueError('Expected ' + key + ' object but received ' + json['type'])
+    if (len(json[key]) == 0):
+        return None
+    result = []
+    for rich_text in json[key]:
+        result.append(rich_text['plain_text'])
+    return " ".join(result)
+
+def _legacy_parse_generic(json, key):
+    if (json['type'] != key):
+        raise ValueError('Expected ' + key + ' object but received ' + json['type'])
+    return json[key]
+
+def _legacy_parse_select(json):
+    if (json['type'] != 'select'):
+        raise ValueError('Expected select object but received ' + json['type'])
+    if (json['select']):
+        return json['select']['name']
+    return None
+
+def _legacy_parse_multi_select(json):
+    if (json['type'] != 'multi_select'):
+        raise ValueError('Expected multi_select object but received ' + json['type'])
+    result = []
+    if (json['multi_select']):
+        for select in json['multi_select']:
+            result.append(select['name'])
+    return result
+
+def _values(article: Article) -> tuple:
+    return tuple(getattr(article, slot) for slot in Article.__slots__)
+
+def _load_pages(count: int) -> list[dict]:
+    with open(os.path.join(ROOT_DIR, 'notion_example_data.json')) as f:
+        results = json.load(f)['results']
+    return (results * (count // len(results) + 1))[:count]
+
+def _parse_legacy(pages):
+    return [_legacy_from_json(page) for page in pages]
+
+def _parse_compiled(pages):
+    parse = ArticleSchema(Article).compile(pages[0])
+    return [parse(page) for page in pages]
+
+def _parse_compiled_digest(pages):
+    parse = ArticleSchema(Article, DIGEST_MAPPING).compile(pages[0])
+    return [parse(page) for page in pages]
+
+def _best_of(function, pages) -> float:
+    best = None
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        function(pages)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def run():
+    pages = _load_pages(PAGE_COUNT)
+    legacy = _parse_legacy(pages[:64])
+    compiled = _parse_compiled(pages[:64])
+    if ([_values(article) for article in legacy] != [_values(article) for article in compiled]):
+        raise RuntimeError('Compiled schema parses pages differently than legacy parser')
+
+    legacy_time = _best_of(_parse_legacy, pages)
+    print('{:>16} {:>10} {:>10} {:>9}'.format('parser', 'pages', 'best[s]', 'speedup'))
+    print('{:>16} {:>10} {:>10.3f} {:>9}'.format('legacy', PAGE_COUNT, legacy_time, '1.00x'))
+    for name, function in (('compiled', _parse_compiled), ('compiled digest', _parse_compiled_digest)):
+        elapsed = _best_of(function, pages)
+        print('{:>16} {:>10} {:>10.3f} {:>8.2f}x'.format(name, PAGE_COUNT, elapsed, legacy_time / elapsed))
+
+if __name__ == "__main__":
+    run()
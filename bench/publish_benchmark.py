@@ -0,0 +1,50 @@
+# Benchmark of NotionDbClient.publish_articles against local Notion stand-in
+# Shows that wall clock time follows the rate limiter (articles / rate)
+# and not article count times request latency
+#
+# Run from repository root:
+#   python bench/publish_benchmark.py
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from standin import StandInServer, Profile
+from lib.notion import NotionDbClient, Article
+from lib.ratelimit import TokenBucket
+from lib.transport import HttpTransport
+
+STANDIN_LATENCY = 0.2 # seconds per request
+RATES = [10, 20]
+ARTICLE_COUNTS = [20, 40, 80]
+WORKERS = 8
+
+def run():
+    server = StandInServer(profile=Profile(latency=STANDIN_LATENCY)).start()
+    config = {
+        'auth': {'token': 'bench'},
+        'database': {'id': 'bench'},
+        'api': {'url': server.url + '/v1'},
+    }
+    print('{:>6} {:>9} {:>10} {:>14} {:>14} {:>12}'.format('rate', 'articles', 'wall[s]', 'limiter[s]', 'sequential[s]', 'connections'))
+    try:
+        for rate in RATES:
+            for count in ARTICLE_COUNTS:
+                # capacity of one token so bursts do not hide the limiter
+                transport = HttpTransport()
+                client = NotionDbClient(config, rate_limiter=TokenBucket(rate, capacity=1), transport=transport)
+                articles = [Article('page-{}'.format(i), 'page') for i in range(count)]
+                start = time.perf_counter()
+                report = client.publish_articles(articles, workers=WORKERS)
+                elapsed = time.perf_counter() - start
+                if (report.failed):
+                    raise RuntimeError('Benchmark publish failed: ' + str(report))
+                print('{:>6} {:>9} {:>10.2f} {:>14.2f} {:>14.2f} {:>12}'.format(
+                    rate, count, elapsed, count / rate, count * STANDIN_LATENCY, transport.stats.connections))
+                transport.close()
+    finally:
+        server.stop()
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,476 @@
+# Local stand-in of the API subset used by publisher, for load tests and benchmarks without network
+#   Notion:     POST /v1/databases/<id>/query (cursors, and/or filters of select, multi_select, text
+#               and date properties and of page timestamps, filter_properties), GET /v1/databases/<id>,
+#               PATCH /v1/pages/<id>
+#   Confluence: POST /rest/api/content, GET /rest/api/content?title=&spaceKey=,
+#               GET and PUT /rest/api/content/<id>
+#   Medium:     POST /v1/users/<user>/posts
+#   Articles:   GET /articles/<index>/<slug> - html with OpenGraph metadata, every 25th one from index 7 is
+#               missing (404), from 13 moved (301) and from 19 unavailable (503), see --local-links
+#   Stand-in:   GET /_standin/stats - request counts by route and status
+# Database pages are synthetic (see dataset.py), created one minute apart and returned
+# in created time order. Profiles add latency, throttling (429 with Retry-After) and server errors.
+#
+# Run from repository root and point config.local.yml urls at printed address:
+#   python bench/standin.py --pages 1000 --profile realistic --port 8765
+import argparse
+import gzip
+import html
+import json
+import math
+import random
+import re
+import sys
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs, unquote
+
+import yaml
+
+import dataset
+
+class Profile:
+    """
+    Behaviour of stand-in on every API request
+    latency: seconds added to each response, plus uniform random jitter
+    rate: requests per second served, requests above it get 429, 0 is unlimited
+    throttle_rate: fraction of requests randomly answered with 429
+    error_rate: fraction of requests randomly answered with 5xx
+    """
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, rate: float = 0, throttle_rate: float = 0.0,
+            error_rate: float = 0.0, retry_after: float = 1.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate = rate
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+
+PROFILES = {
+    'fast': Profile(),
+    # Notion averages 3 requests per second
+    'realistic': Profile(latency=0.15, jitter=0.1, rate=3),
+    'throttled': Profile(latency=0.05, rate=3, throttle_rate=0.1),
+    'flaky': Profile(latency=0.05, jitter=0.05, throttle_rate=0.05, error_rate=0.05),
+}
+
+_ROUTES = (
+    ('notion_query', 'POST', re.compile(r'^/v1/databases/[^/]+/query$')),
+    ('notion_database', 'GET', re.compile(r'^/v1/databases/[^/]+$')),
+    ('notion_page', 'PATCH', re.compile(r'^/v1/pages/(?P<id>[^/]+)$')),
+    ('confluence_create', 'POST', re.compile(r'^/rest/api/content/?$')),
+    ('confluence_search', 'GET', re.compile(r'^/rest/api/content/?$')),
+    ('confluence_get', 'GET', re.compile(r'^/rest/api/content/(?P<id>\d+)/?$')),
+    ('confluence_update', 'PUT', re.compile(r'^/rest/api/content/(?P<id>\d+)/?$')),
+    ('confluence_property_get', 'GET', re.compile(r'^/rest/api/content/(?P<id>\d+)/property/(?P<key>[^/]+)$')),
+    ('confluence_property_create', 'POST', re.compile(r'^/rest/api/content/(?P<id>\d+)/property/?$')),
+    ('confluence_property_update', 'PUT', re.compile(r'^/rest/api/content/(?P<id>\d+)/property/(?P<key>[^/]+)$')),
+    ('medium_post', 'POST', re.compile(r'^/v1/users/[^/]+/posts$')),
+    ('article', 'GET', re.compile(r'^/articles/(?P<index>\d+)/(?P<slug>[^/]+)(?P<moved>/moved)?$')),
+    ('stats', 'GET', re.compile(r'^/_standin/stats$')),
+)
+
+class _Throttle:
+    """
+    Fixed one second window counter, enough to emulate API rate limit
+    """
+
+    def __init__(self, rate: float):
+        self._rate = rate
+        self._window = 0
+        self._count = 0
+
+    def allow(self) -> bool:
+        window = int(time.monotonic())
+        if (window != self._window):
+            self._window = window
+            self._count = 0
+        self._count += 1
+        return self._count <= self._rate
+
+def _property_value(page: dict, name: str):
+    prop = page['properties'].get(name)
+    if (prop is None):
+        return None
+    value = prop[prop['type']]
+    if (prop['type'] in ('title', 'rich_text')):
+        return ''.join(text['plain_text'] for text in value) if value else None
+    if (prop['type'] == 'select'):
+        return value['name'] if value else None
+    if (prop['type'] == 'multi_select'):
+        return [select['name'] for select in value]
+    if (prop['type'] == 'date'):
+        return value['start'] if value else None
+    return value
+
+def _matches(page: dict, condition: dict) -> bool:
+    """
+    Notion filter condition evaluated on page, subset of operators used by publisher
+    """
+    if ('and' in condition):
+        return all(_matches(page, part) for part in condition['and'])
+    if ('or' in condition):
+        return any(_matches(page, part) for part in condition['or'])
+    if ('timestamp' in condition):
+        value = page[condition['timestamp']]
+        operators = condition[condition['timestamp']]
+    else:
+        value = _property_value(page, condition['property'])
+        operators = next(value for key, value in condition.items() if key != 'property')
+    for operator, expected in operators.items():
+        if (operator == 'is_empty' and bool(value)):
+            return False
+        if (operator == 'is_not_empty' and not value):
+            return False
+        if (operator == 'equals' and value != expected):
+            return False
+        if (operator == 'contains' and expected not in (value or ())):
+            return False
+        # dates compare as strings, date only bound is the start of its day
+        if (operator == 'on_or_after' and (not value or value < expected)):
+            return False
+        if (operator == 'before' and (not value or value >= expected)):
+            return False
+    return True
+
+def _minutes(value: str) -> float:
+    moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if (moment.tzinfo is None):
+        moment = moment.replace(tzinfo=dataset.START_TIME.tzinfo)
+    return (moment - dataset.START_TIME).total_seconds() / 60
+
+def _index_range(condition: dict, page_count: int) -> tuple[int, int]:
+    """
+    Indexes of pages that can match timestamp bounds of and-ed filter, page i is created
+    i minutes after start and last edited at most a week later
+    """
+    start, end = 0, page_count
+    for part in condition.get('and', [condition]):
+        bounds = part.get(part.get('timestamp')) or {}
+        if (part.get('timestamp') == 'last_edited_time' and bounds.get('on_or_after')):
+            start = max(start, math.floor(_minutes(bounds['on_or_after'])) - dataset.MAX_EDIT_DELAY_MINUTES)
+        elif (part.get('timestamp') == 'created_time'):
+            if (bounds.get('on_or_after')):
+                start = max(start, math.ceil(_minutes(bounds['on_or_after'])))
+            if (bounds.get('before')):
+                end = min(end, math.ceil(_minutes(bounds['before'])))
+    return max(start, 0), max(min(end, page_count), 0)
+
+class _StandInState:
+
+    def __init__(self, page_count: int, seed: int, profile: Profile):
+        self.page_count = page_count
+        self.seed = seed
+        self.profile = profile
+        self.link_base = dataset.LINK_BASE
+        self.lock = threading.Lock()
+        self.random = random.Random(seed)
+        self.throttle = _Throttle(profile.rate) if profile.rate else None
+        self.published = {}
+        self.contents = {}
+        self.properties = {}
+        self.posts = 0
+        self.stats = {}
+
+    def count(self, route: str, status: int) -> None:
+        with self.lock:
+            by_status = self.stats.setdefault(route, {})
+            by_status[str(status)] = by_status.get(str(status), 0) + 1
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1' # keep-alive
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def do_PATCH(self):
+        self._dispatch('PATCH')
+
+    def do_PUT(self):
+        self._dispatch('PUT')
+
+    def log_message(self, format, *args):
+        pass
+
+    def handle(self):
+        try:
+            super().handle()
+        except ConnectionResetError:
+            # client dropped keep-alive connection, e.g. link checker not reading error page
+            pass
+
+    def _dispatch(self, method: str) -> None:
+        state = self.server.state
+        url = urlsplit(self.path)
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        if (self.headers.get('Content-Encoding') == 'gzip'):
+            body = gzip.decompress(body)
+        for route, route_method, pattern in _ROUTES:
+            match = pattern.match(url.path)
+            if (match and route_method == method):
+                break
+        else:
+            state.count('unknown', 404)
+            self._send_json(404, {'message': 'Unknown route {} {}'.format(method, url.path)})
+            return
+        if (route != 'stats' and self._inject(route)):
+            return
+        status, response, *headers = getattr(self, '_' + route)(match, parse_qs(url.query), json.loads(body) if body else {})
+        state.count(route, status)
+        if (isinstance(response, str)):
+            self._send_html(status, response, *headers)
+        else:
+            self._send_json(status, response, *headers)
+
+    def _inject(self, route: str) -> bool:
+        """
+        Applies profile, returns True when request was answered with injected failure
+        """
+        state = self.server.state
+        profile = state.profile
+        with state.lock:
+            delay = profile.latency + (state.random.uniform(0, profile.jitter) if profile.jitter else 0)
+            throttled = (state.throttle and not state.throttle.allow()) or state.random.random() < profile.throttle_rate
+            failed = not throttled and state.random.random() < profile.error_rate
+            error_status = state.random.choice((500, 502, 503))
+        if (delay):
+            time.sleep(delay)
+        if (throttled):
+            state.count(route, 429)
+            self._send_json(429, {'object': 'error', 'status': 429, 'code': 'rate_limited', 'message': 'Rate limited by stand-in'},
+                {'Retry-After': '{:g}'.format(profile.retry_after)})
+            return True
+        if (failed):
+            state.count(route, error_status)
+            self._send_json(error_status, {'object': 'error', 'status': error_status, 'message': 'Error injected by stand-in'})
+            return True
+        return False
+
+    def _send_json(self, status: int, body: dict, headers: dict = None) -> None:
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_html(self, status: int, body: str, headers: dict = None) -> None:
+        data = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _notion_query(self, match, params: dict, query: dict) -> tuple[int, dict]:
+        state = self.server.state
+        page_size = min(query.get('page_size', 100), 100)
+        query_filter = query.get('filter') or {}
+        projection = {unquote(property_id) for property_id in params.get('filter_properties', [])}
+        start, end = _index_range(query_filter, state.page_count)
+        # pages are sorted by created time, descending on request
+        step = -1 if any(sort.get('direction') == 'descending' for sort in query.get('sorts') or ()) else 1
+        index = int(query['start_cursor']) if query.get('start_cursor') else (start if step > 0 else end - 1)
+        results = []
+        while (start <= index < end and len(results) < page_size):
+            page = dataset.make_page(index, state.seed, state.link_base)
+            index += step
+            published = state.published.get(page['id'])
+            if (published):
+                page['properties']['Published time']['date'] = published
+            if (query_filter and not _matches(page, query_filter)):
+                continue
+            if (projection):
+                page['properties'] = {name: prop for name, prop in page['properties'].items() if unquote(prop['id']) in projection}
+            results.append(page)
+        has_more = start <= index < end
+        return 200, {'object': 'list', 'results': results, 'next_cursor': str(index) if has_more else None,
+            'has_more': has_more, 'type': 'page', 'page': {}}
+
+    def _notion_database(self, match, params: dict, body: dict) -> tuple[int, dict]:
+        return 200, dataset.database()
+
+    def _notion_page(self, match, params: dict, body: dict) -> tuple[int, dict]:
+        state = self.server.state
+        published = ((body.get('properties') or {}).get('Published time') or {}).get('date')
+        with state.lock:
+            if (published):
+                state.published[match['id']] = published
+        return 200, {'object': 'page', 'id': match['id'], 'properties': body.get('properties') or {}}
+
+    def _confluence_create(self, match, params: dict, body: dict) -> tuple[int, dict]:
+        state = self.server.state
+        with state.lock:
+            content_id = str(100000 + len(state.contents))
+            content = dict(body, id=content_id, version={'number': 1})
+            state.contents[content_id] = content
+        return 200, content
+
+    def _confluence_search(self, match, params: dict, body: dict) -> tuple[int, dict]:
+        title = params.get('title', [None])[0]
+        space = params.get('spaceKey', [None])[0]
+        results = [content for content in self.server.state.contents.values()
+            if (title is None or content.get('title') == title) and (space is None or content.get('space', {}).get('key') == space)]
+        return 200, {'results': results, 'start': 0, 'limit': len(results), 'size': len(results)}
+
+    def _confluence_get(self, match, params: dict, body: dict) -> tuple[int, dict]:
+        content = self.server.state.contents.get(match['id'])
+        if (content is None):
+            return 404, {'statusCode': 404, 'message': 'No content with id ' + match['id']}
+        return 200, content
+
+    def _confluence_update(self, match, params: dict, body: dict) -> tuple[int, dict]:
+        state = self.server.state
+        with state.lock:
+            content = state.contents.get(match['id'])
+            if (content is None):
+                return 404, {'statusCode': 404, 'message': 'No content with id ' + match['id']}
+            number = content['version']['number'] + 1
+            content = dict(content)
+            content.update(body)
+            content['id'] = match['id']
+            content['version'] = {'number': number}
+            state.contents[match['id']] = content
+        return 200, content
+
+    def _confluence_property_get(self, match, params: dict, body: dict) -> tuple[int, dict]:
+        property = self.server.state.properties.get((match['id'], match['key']))
+        if (property is None):
+            return 404, {'statusCode': 404, 'message': 'No property {} of content {}'.format(match['key'], match['id'])}
+        return 200, property
+
+    def _confluence_property_create(self, match, params: dict, body: dict) -> tuple[int, dict]:
+        state = self.server.state
+        with state.lock:
+            if (match['id'] not in state.contents):
+                return 404, {'statusCode': 404, 'message': 'No content with id ' + match['id']}
+            if ((match['id'], body['key']) in state.properties):
+                return 400, {'statusCode': 400, 'message': 'Property {} already exists'.format(body['key'])}
+            property = {'key': body['key'], 'value': body.get('value'), 'version': {'number': 1}}
+            state.properties[(match['id'], body['key'])] = property
+        return 200, property
+
+    def _confluence_property_update(self, match, params: dict, body: dict) -> tuple[int, dict]:
+        state = self.server.state
+        with state.lock:
+            property = state.properties.get((match['id'], match['key']))
+            if (property is None):
+                return 404, {'statusCode': 404, 'message': 'No property {} of content {}'.format(match['key'], match['id'])}
+            number = (body.get('version') or {}).get('number')
+            if (number != property['version']['number'] + 1):
+                return 409, {'statusCode': 409, 'message': 'Version {} does not follow {}'.format(number, property['version']['number'])}
+            property = {'key': match['key'], 'value': body.get('value'), 'version': {'number': number}}
+            state.properties[(match['id'], match['key'])] = property
+        return 200, property
+
+    def _medium_post(self, match, params: dict, body: dict) -> tuple[int, dict]:
+        state = self.server.state
+        with state.lock:
+            state.posts += 1
+            post_id = 'post-{}'.format(state.posts)
+        return 201, {'data': {'id': post_id, 'title': body.get('title'), 'publishStatus': body.get('publishStatus')}}
+
+    def _article(self, match, params: dict, body: dict) -> tuple:
+        index = int(match['index'])
+        if (index % 25 == 7):
+            return 404, '<html><head><title>Not found</title></head><body>No article {}</body></html>'.format(index)
+        if (index % 25 == 13 and not match['moved']):
+            return 301, '', {'Location': '/articles/{}/{}/moved'.format(index, match['slug'])}
+        if (index % 25 == 19):
+            return 503, '<html><head><title>Unavailable</title></head><body>Try later</body></html>'
+        title = match['slug'].replace('-', ' ').capitalize()
+        return 200, ('<!DOCTYPE html><html><head><meta charset="utf-8"><title>{0} | Stand-in</title>'
+            '<meta property="og:title" content="{0}"/><meta property="og:description" content="Article {1} about {2}"/>'
+            '</head><body><h1>{0}</h1>{3}</body></html>').format(html.escape(title), index, html.escape(match['slug'].replace('-', ', ')),
+            '<p>Lorem ipsum</p>' * 200)
+
+    def _stats(self, match, params: dict, body: dict) -> tuple[int, dict]:
+        state = self.server.state
+        with state.lock:
+            return 200, {'requests': state.stats, 'published': len(state.published),
+                'contents': len(state.contents), 'posts': state.posts}
+
+class StandInServer:
+    """
+    Stand-in serving database of page_count synthetic pages, port 0 picks a free one
+    """
+
+    def __init__(self, page_count: int = 1000, seed: int = 0, profile: Profile = None, port: int = 0, local_links: bool = False):
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), _StandInHandler)
+        self._server.daemon_threads = True
+        self._server.state = _StandInState(page_count, seed, profile if profile else PROFILES['fast'])
+        if (local_links):
+            # article links of pages point at stand-in article pages
+            self._server.state.link_base = self.url
+
+    @property
+    def url(self) -> str:
+        return 'http://127.0.0.1:{}'.format(self._server.server_address[1])
+
+    @property
+    def stats(self) -> dict:
+        return self._server.state.stats
+
+    def start(self) -> 'StandInServer':
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def serve_forever(self) -> None:
+        self._server.serve_forever()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+def config_urls(url: str) -> dict:
+    """
+    Urls to set in config.local.yml sections so publisher talks to stand-in
+    """
+    return {
+        'notion': {'api': {'url': url + '/v1'}},
+        'confluence': {'url': url},
+        'medium': {'api': {'url': url + '/v1/users/{}/posts'}},
+    }
+
+def run():
+    parser = argparse.ArgumentParser(description='Local stand-in of Notion, Confluence and Medium APIs')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--pages', type=int, default=1000, help='Synthetic database size')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--profile', choices=sorted(PROFILES), default='fast')
+    parser.add_argument('--latency', type=float, help='Overrides profile latency, seconds')
+    parser.add_argument('--rate', type=float, help='Overrides profile requests per second, 0 is unlimited')
+    parser.add_argument('--throttle-rate', type=float, help='Overrides profile fraction of random 429 responses')
+    parser.add_argument('--error-rate', type=float, help='Overrides profile fraction of random 5xx responses')
+    parser.add_argument('--local-links', action='store_true', help='Article links point at stand-in article pages, for links enrichment')
+    args = parser.parse_args()
+
+    base = PROFILES[args.profile]
+    profile = Profile(
+        latency=base.latency if args.latency is None else args.latency,
+        jitter=base.jitter,
+        rate=base.rate if args.rate is None else args.rate,
+        throttle_rate=base.throttle_rate if args.throttle_rate is None else args.throttle_rate,
+        error_rate=base.error_rate if args.error_rate is None else args.error_rate,
+        retry_after=base.retry_after)
+    server = StandInServer(args.pages, args.seed, profile, args.port, args.local_links)
+    print('Stand-in serving {} pages with {} profile on {}'.format(args.pages, args.profile, server.url))
+    print('Urls to set in config.local.yml:')
+    yaml.safe_dump(config_urls(server.url), sys.stdout)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,61 @@
+# Peak memory of in memory digest (ArticleBatch, whole rendered strings) against streaming
+# pipeline of --output (spill buckets, chapters rendered straight into file) on synthetic pages
+# Streaming peak stays flat with growing backlog, in memory one grows with it
+#
+# Run from repository root:
+#   python bench/stream_benchmark.py
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dataset
+from lib.digest import Digest
+from lib.formats import FORMAT_MARKDOWN, FORMAT_HTML
+from lib.notion import Article, ArticleBatch
+from lib.service import render_digest, write_digest
+from lib.spill import CategoryBuckets
+
+SIZES = [1_000, 10_000, 100_000]
+THRESHOLD = 1_000 # articles kept in memory per category
+FORMATS = [FORMAT_MARKDOWN, FORMAT_HTML]
+
+def _articles(size: int):
+    for page in dataset.iter_pages(size):
+        yield Article.from_json(page)
+
+def in_memory(size: int) -> None:
+    batch = ArticleBatch.from_articles(_articles(size))
+    contents = render_digest(Digest.build(batch, 'Benchmark digest', 'Benchmark preface'), FORMATS)
+    with open(os.devnull, 'w') as output:
+        for content in contents.values():
+            output.write(content)
+
+def streaming(size: int) -> None:
+    with CategoryBuckets(THRESHOLD) as buckets:
+        buckets.extend(_articles(size))
+        digest = Digest.from_buckets(buckets, 'Benchmark digest', 'Benchmark preface')
+        for format in FORMATS:
+            with open(os.devnull, 'w') as output:
+                write_digest(digest, format, output)
+
+def _measure(function, size: int) -> tuple[float, float]:
+    tracemalloc.start()
+    start = time.perf_counter()
+    function(size)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 1024 / 1024
+
+def run():
+    print('{:>10} {:>9} {:>10} {:>10}'.format('pipeline', 'articles', 'time[s]', 'peak[MB]'))
+    for size in SIZES:
+        for name, function in (('in_memory', in_memory), ('streaming', streaming)):
+            elapsed, peak = _measure(function, size)
+            print('{:>10} {:>9} {:>10.2f} {:>10.1f}'.format(name, size, elapsed, peak))
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,238 @@
+# Benchmark suite of digest pipeline stages on synthetic Notion datasets (see dataset.py)
+# In process stages, best of repeats:
+#   from_json - Article.from_json of every page
+#   batch     - ArticleBatch.from_articles
+#   group     - grouping batch by category
+#   markdown  - MarkdownDigestRenderer.render of whole digest
+#   html      - HtmlDigestRenderer.render of whole digest
+# and e2e - single newsPublisher.py -e run against local stand-in (fetch, parse, render, post),
+# followed by e2e_replay - the same run with Notion responses replayed from the recorded session
+# Startup stages run fresh interpreter with -X importtime and report time spent importing
+# modules (sum of self times) per run, with the slowest modules listed in results:
+#   startup_help      - newsPublisher.py --help, nothing but argument parsing should be loaded
+#   import_medium     - publisher of -e channel with its dependencies (requests)
+#   import_confluence - publisher of -c channel with its dependencies (atlassian)
+# Results are written as JSON with time per page. A stage slower than its limit in
+# thresholds.json, or than baseline results by more than tolerance, is a regression
+# and the suite exits with code 1.
+#
+# Run from repository root:
+#   python bench/suite.py
+#   python bench/suite.py --sizes 1000,10000,100000,1000000 --e2e-sizes 1000 --output bench_results.json
+#   python bench/suite.py --baseline bench_results.json --tolerance 0.25
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import yaml
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT_DIR)
+
+import dataset
+from standin import StandInServer
+from lib.digest import Digest, map_articles_by_category
+from lib.notion import Article, ArticleBatch
+from lib.service import MarkdownDigestRenderer, HtmlDigestRenderer
+
+THRESHOLDS_FILE = os.path.join(BENCH_DIR, 'thresholds.json')
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+DEFAULT_E2E_SIZES = [1_000, 10_000]
+CHUNK_SIZE = 10_000 # pages generated and parsed at once, keeps 1M pages dataset out of memory
+REPEATS = 3
+STARTUP_COMMANDS = {
+    'startup_help': [os.path.join(ROOT_DIR, 'newsPublisher.py'), '--help'],
+    'import_medium': ['-c', 'import lib.publishers.medium'],
+    'import_confluence': ['-c', 'import lib.publishers.confluence'],
+}
+TOP_IMPORTS = 10
+
+def _best_of(function, repeats: int) -> float:
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def _result(stage: str, pages: int, seconds: float) -> dict:
+    return {'stage': stage, 'pages': pages, 'seconds': round(seconds, 6), 'us_per_page': round(seconds / pages * 1e6, 3)}
+
+def bench_stages(size: int, repeats: int) -> list[dict]:
+    """
+    Pages are generated chunk by chunk outside of timing, parsing is timed once per chunk
+    """
+    parse_time = 0.0
+    batch_time = 0.0
+    batch = ArticleBatch()
+    for start in range(0, size, CHUNK_SIZE):
+        pages = list(dataset.iter_pages(min(CHUNK_SIZE, size - start), start))
+        begin = time.perf_counter()
+        articles = [Article.from_json(page) for page in pages]
+        parse_time += time.perf_counter() - begin
+        del pages
+        begin = time.perf_counter()
+        batch.extend(articles)
+        batch_time += time.perf_counter() - begin
+    results = [_result('from_json', size, parse_time), _result('batch', size, batch_time)]
+    results.append(_result('group', size, _best_of(lambda: map_articles_by_category(batch), repeats)))
+    digest = Digest.build(batch, 'Benchmark digest', 'Benchmark preface')
+    for stage, renderer in (('markdown', MarkdownDigestRenderer()), ('html', HtmlDigestRenderer())):
+        results.append(_result(stage, size, _best_of(lambda: renderer.render(digest), repeats)))
+    return results
+
+def _e2e_config(standin_url: str, work_dir: str) -> dict:
+    return {
+        'notion': {
+            'auth': {'token': 'bench'},
+            'database': {'id': dataset.DATABASE_ID},
+            'api': {'url': standin_url + '/v1', 'rate': 1000},
+            'responses': {'directory': os.path.join(work_dir, 'notion_responses')},
+        },
+        'medium': {
+            'api': {'userid': 'bench', 'url': standin_url + '/v1/users/{}/posts'},
+            'auth': {'token': 'bench'},
+        },
+        'issue': {'number': {'file': os.path.join(work_dir, 'issue.txt')}},
+        'digest': {'render': {'workers': 1}},
+    }
+
+def bench_e2e(size: int) -> list[dict]:
+    """
+    newsPublisher.py -e in scratch directory with config.local.yml pointing to stand-in,
+    first run records Notion responses, second one replays them
+    """
+    standin = StandInServer(size).start()
+    work_dir = tempfile.mkdtemp(prefix='bench-e2e-')
+    try:
+        for name in ('config.yml', 'logging.yml'):
+            shutil.copy(os.path.join(ROOT_DIR, name), work_dir)
+        with open(os.path.join(work_dir, 'config.local.yml'), 'w') as f:
+            yaml.safe_dump(_e2e_config(standin.url, work_dir), f)
+        results = []
+        for stage, options in (('e2e', ['-e']), ('e2e_replay', ['-e', '-r'])):
+            start = time.perf_counter()
+            completed = subprocess.run(
+                [sys.executable, os.path.join(ROOT_DIR, 'newsPublisher.py')] + options,
+                cwd=work_dir, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+            elapsed = time.perf_counter() - start
+            if (completed.returncode != 0):
+                raise RuntimeError('newsPublisher run failed:\n' + completed.stderr)
+            results.append(_result(stage, size, elapsed))
+        return results
+    finally:
+        standin.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def _import_times(command: list[str]) -> dict[str, int]:
+    """
+    Module -> self import time in microseconds, parsed from -X importtime report
+    """
+    completed = subprocess.run([sys.executable, '-X', 'importtime'] + command,
+        cwd=ROOT_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    if (completed.returncode != 0):
+        raise RuntimeError('{} failed:\n{}'.format(command, completed.stderr))
+    times = {}
+    for line in completed.stderr.splitlines():
+        if (not line.startswith('import time:') or 'self [us]' in line):
+            continue
+        self_time, _, module = line[len('import time:'):].split('|')
+        times[module.strip()] = int(self_time)
+    return times
+
+def bench_startup(repeats: int) -> list[dict]:
+    """
+    Run with the lowest total import time is reported, pages is 1 so us_per_page is time per run
+    """
+    results = []
+    for stage, command in STARTUP_COMMANDS.items():
+        best = min((_import_times(command) for _ in range(repeats)), key=lambda times: sum(times.values()))
+        result = _result(stage, 1, sum(best.values()) / 1e6)
+        result['modules'] = len(best)
+        result['top_imports'] = sorted(best.items(), key=lambda item: item[1], reverse=True)[:TOP_IMPORTS]
+        results.append(result)
+    return results
+
+def find_regressions(results: list[dict], thresholds: dict, baseline: dict = None, tolerance: float = 0.25) -> list[dict]:
+    """
+    thresholds: stage -> {"max_us_per_page": limit}
+    baseline: previous results document, stage is compared with the same stage and size
+    """
+    regressions = []
+    previous = {(result['stage'], result['pages']): result for result in (baseline or {}).get('results', [])}
+    for result in results:
+        limit = (thresholds.get(result['stage']) or {}).get('max_us_per_page')
+        if (limit is not None and result['us_per_page'] > limit):
+            regressions.append(dict(result, reason='above threshold {} us/page'.format(limit)))
+        before = previous.get((result['stage'], result['pages']))
+        if (before and result['us_per_page'] > before['us_per_page'] * (1 + tolerance)):
+            regressions.append(dict(result, reason='{:.0%} slower than baseline {} us/page'.format(
+                result['us_per_page'] / before['us_per_page'] - 1, before['us_per_page'])))
+    return regressions
+
+def _sizes(value: str) -> list[int]:
+    return [int(size) for size in value.split(',') if size]
+
+def run():
+    parser = argparse.ArgumentParser(description='Digest pipeline benchmark suite')
+    parser.add_argument('--sizes', type=_sizes, default=DEFAULT_SIZES, help='Dataset sizes of in process stages, comma separated')
+    parser.add_argument('--e2e-sizes', type=_sizes, default=DEFAULT_E2E_SIZES, help='Dataset sizes of end to end runs, empty to skip')
+    parser.add_argument('--repeats', type=int, default=REPEATS)
+    parser.add_argument('--no-startup', dest='startup', action='store_false', help='Skip import time stages')
+    parser.add_argument('--output', default='bench_results.json', help='Results JSON file')
+    parser.add_argument('--thresholds', default=THRESHOLDS_FILE)
+    parser.add_argument('--baseline', help='Results JSON of previous run to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed slowdown against baseline, 0.25 = 25%%')
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    results = []
+    print('{:>17} {:>9} {:>10} {:>12}'.format('stage', 'pages', 'time[s]', 'per page[us]'))
+    def report(result: dict) -> None:
+        results.append(result)
+        print('{:>17} {:>9} {:>10.3f} {:>12.2f}'.format(result['stage'], result['pages'], result['seconds'], result['us_per_page']))
+    for size in args.sizes:
+        for result in bench_stages(size, args.repeats):
+            report(result)
+    for size in args.e2e_sizes:
+        for result in bench_e2e(size):
+            report(result)
+    if (args.startup):
+        for result in bench_startup(args.repeats):
+            report(result)
+
+    with open(args.thresholds) as f:
+        thresholds = json.load(f)
+    baseline = None
+    if (args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    regressions = find_regressions(results, thresholds, baseline, args.tolerance)
+    document = {
+        'created': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+        'thresholds': thresholds,
+        'regressions': regressions,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(document, f, indent=2)
+    print('Results written to ' + args.output)
+    for regression in regressions:
+        print('REGRESSION {} at {} pages: {} us/page, {}'.format(
+            regression['stage'], regression['pages'], regression['us_per_page'], regression['reason']))
+    sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,360 @@
+import json
+import logging
+import signal
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Iterable
+
+from .metrics import Metrics, NULL_METRICS
+from .notion import Article, ArticleBatch, NotionDbClient
+
+class CronSchedule:
+    """
+    Cron expression of five fields: minute hour day-of-month month day-of-week (0 or 7 is Sunday)
+    Fields accept *, values, ranges, lists and steps (*/15, 1-5, 0,30). As in cron, when both
+    day fields are restricted a day matching either of them matches.
+    """
+    _FIELDS = (('minute', 0, 59), ('hour', 0, 23), ('day', 1, 31), ('month', 1, 12), ('weekday', 0, 7))
+
+    def __init__(self, expression: str):
+        fields = expression.split()
+        if (len(fields) != len(self._FIELDS)):
+            raise ValueError('Cron expression needs {} fields: {}'.format(len(self._FIELDS), expression))
+        self.expression = expression
+        self._minutes, self._hours, self._days, self._months, weekdays = (
+            self._parse(field, name, low, high) for field, (name, low, high) in zip(fields, self._FIELDS))
+        self._weekdays = {weekday % 7 for weekday in weekdays}
+        self._any_day = fields[2] == '*'
+        self._any_weekday = fields[4] == '*'
+
+    @staticmethod
+    def _parse(field: str, name: str, low: int, high: int) -> set[int]:
+        values = set()
+        for part in field.split(','):
+            value_range, _, step = part.partition('/')
+            if (value_range == '*'):
+                start, end = low, high
+            elif ('-' in value_range):
+                start, end = (int(value) for value in value_range.split('-', 1))
+            else:
+                start = end = int(value_range)
+            if (start < low or end > high or start > end or (step and int(step) < 1)):
+                raise ValueError('Invalid cron {} field: {}'.format(name, field))
+            values.update(range(start, end + 1, int(step) if step else 1))
+        return values
+
+    def _day_matches(self, moment: datetime) -> bool:
+        day = moment.day in self._days
+        weekday = (moment.weekday() + 1) % 7 in self._weekdays
+        if (self._any_day or self._any_weekday):
+            return day and weekday
+        return day or weekday
+
+    def next_after(self, moment: datetime) -> datetime:
+        """
+        First matching minute strictly after moment
+        """
+        candidate = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = candidate + timedelta(days=366 * 5)
+        while candidate < limit:
+            if (candidate.month not in self._months):
+                candidate = (candidate.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif (not self._day_matches(candidate)):
+                candidate = candidate.replace(hour=0, minute=0) + timedelta(days=1)
+            elif (candidate.hour not in self._hours):
+                candidate = candidate.replace(minute=0) + timedelta(hours=1)
+            elif (candidate.minute not in self._minutes):
+                candidate += timedelta(minutes=1)
+            else:
+                return candidate
+        raise ValueError('Cron expression never matches: ' + self.expression)
+
+class ArticlePool:
+    """
+    In memory set of unpublished articles kept up to date by incremental polls
+    Watermark is the newest last_edited_time seen, articles published in the meantime are dropped
+    Pages deleted or archived in Notion are not returned by any query, only reconcile drops them
+    """
+
+    def __init__(self):
+        self._articles = {}
+        self.watermark = None
+
+    def apply(self, articles: Iterable[Article]) -> int:
+        """
+        Returns number of polled articles
+        """
+        count = 0
+        for article in articles:
+            count += 1
+            if (article.published_time):
+                self._articles.pop(article.id, None)
+            else:
+                self._articles[article.id] = article
+            self._advance(article)
+        return count
+
+    def reconcile(self, articles: Iterable[Article]) -> int:
+        """
+        Replaces pool with whole unpublished set, returns number of dropped articles
+        """
+        articles = {article.id: article for article in articles if not article.published_time}
+        dropped = len(set(self._articles) - set(articles))
+        self._articles = articles
+        for article in articles.values():
+            self._advance(article)
+        return dropped
+
+    def _advance(self, article: Article) -> None:
+        if (article.last_edited_time and (self.watermark is None or article.last_edited_time > self.watermark)):
+            self.watermark = article.last_edited_time
+
+    def remove(self, ids: Iterable[str]) -> None:
+        for id in ids:
+            self._articles.pop(id, None)
+
+    def batch(self) -> ArticleBatch:
+        # same order as unpublished query
+        return ArticleBatch.from_articles(sorted(self._articles.values(), key=lambda article: article.created_time or ''))
+
+    def __len__(self):
+        return len(self._articles)
+
+class PublisherDaemon:
+    """
+    Long running publisher keeping articles, connections and rendered fragments warm between issues
+    Notion is polled every poll_interval seconds for pages edited since last poll, issue is published
+    on cron schedule or as soon as threshold articles wait, whichever comes first.
+    publish: publishes given articles as an issue, returns True when issue completed
+    Failed publish is retried not sooner than after poll_interval, scheduled issue stays due until it completes.
+    Every reconcile_interval seconds whole unpublished set is fetched again, dropping deleted and archived pages.
+    """
+    _logger = logging.getLogger(__name__ + '.PublisherDaemon')
+
+    def __init__(self, client: NotionDbClient, publish: Callable[[ArticleBatch], bool], poll_interval: float = 300.0,
+            schedule: CronSchedule = None, threshold: int = None, metrics: Metrics = None, reconcile_interval: float = 3600.0):
+        if (schedule is None and not threshold):
+            raise ValueError('Daemon needs publish schedule, threshold or both')
+        self._client = client
+        self._publish = publish
+        self._poll_interval = poll_interval
+        self._schedule = schedule
+        self._threshold = threshold
+        self._reconcile_interval = reconcile_interval
+        self._metrics = metrics if metrics else NULL_METRICS
+        self._stopped = threading.Event()
+        self.pool = ArticlePool()
+        self.started = time.time()
+        self.last_poll = None
+        self.last_publish = None
+        self.failures = {}
+        self.polls = 0
+        self.issues = 0
+        self.errors = 0
+
+    @staticmethod
+    def from_config(config: dict, client: NotionDbClient, publish: Callable[[ArticleBatch], bool],
+            metrics: Metrics = None) -> 'PublisherDaemon':
+        """
+        config: daemon section
+        """
+        schedule = config.get('schedule')
+        return PublisherDaemon(client, publish, config.get('poll_interval', 300.0),
+            CronSchedule(schedule) if schedule else None, config.get('threshold'), metrics, config.get('reconcile_interval', 3600.0))
+
+    def run(self) -> None:
+        """
+        Runs until stop, SIGTERM or SIGINT
+        """
+        if (threading.current_thread() is threading.main_thread()):
+            for signum in (signal.SIGTERM, signal.SIGINT):
+                signal.signal(signum, lambda signum, frame: self.stop())
+        self._logger.info('Daemon started [poll_interval:{}s, schedule:{}, threshold:{}]'.format(
+            self._poll_interval, self._schedule.expression if self._schedule else None, self._threshold))
+        next_poll = time.time()
+        # first poll loads whole unpublished set, no need to reconcile it
+        next_reconcile = next_poll + self._reconcile_interval if self._reconcile_interval else None
+        next_issue = self._next_issue()
+        next_attempt = 0.0
+        issue_due = False
+        while not self._stopped.is_set():
+            now = time.time()
+            if (next_reconcile is not None and now >= next_reconcile):
+                self._run_step('reconcile', self.reconcile)
+                next_reconcile = now + self._reconcile_interval
+                next_poll = now + self._poll_interval
+            elif (now >= next_poll):
+                self._run_step('poll', self.poll)
+                next_poll = now + self._poll_interval
+            if (next_issue is not None and now >= next_issue):
+                # scheduled issue waits for retry delay of failed one
+                issue_due = True
+                next_issue = self._next_issue()
+            if ((issue_due or self._threshold_reached()) and now >= next_attempt):
+                if (len(self.pool) == 0):
+                    self._logger.info('No articles to publish')
+                    issue_due = False
+                elif (self._run_step('issue', self.publish)):
+                    issue_due = False
+                else:
+                    # due issue is retried even when threshold is not reached
+                    next_attempt = now + self._poll_interval
+            wakes = [next_poll]
+            if (next_reconcile is not None):
+                wakes.append(next_reconcile)
+            if (next_issue is not None):
+                wakes.append(next_issue)
+            if (issue_due or self._threshold_reached()):
+                wakes.append(next_attempt)
+            self._stopped.wait(max(0.0, min(wakes) - time.time()))
+        self._logger.info('Daemon stopped')
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+    def poll(self) -> bool:
+        with self._metrics.stage('poll') as stage:
+            count = self.pool.apply(self._client.iter_edited_articles(self.pool.watermark))
+            stage.add(articles=count)
+        self.polls += 1
+        self.last_poll = time.time()
+        self._logger.info('Polled {} edited articles, {} waiting [watermark:{}]'.format(count, len(self.pool), self.pool.watermark))
+        return True
+
+    def reconcile(self) -> bool:
+        with self._metrics.stage('reconcile') as stage:
+            # without watermark whole unpublished set is fetched
+            articles = list(self._client.iter_edited_articles())
+            dropped = self.pool.reconcile(articles)
+            stage.add(articles=len(articles))
+        self.polls += 1
+        self.last_poll = time.time()
+        self._logger.info('Reconciled {} unpublished articles, dropped {} deleted, archived or published [watermark:{}]'.format(
+            len(self.pool), dropped, self.pool.watermark))
+        return True
+
+    def publish(self) -> bool:
+        batch = self.pool.batch()
+        self._logger.info('Publishing issue of {} articles'.format(len(batch)))
+        completed = self._publish(batch)
+        if (completed):
+            # published pages come back with next poll, until then they must not be published again
+            self.pool.remove(batch.ids)
+            self.issues += 1
+            self.last_publish = time.time()
+        return completed
+
+    def status(self) -> dict:
+        return {
+            'status': 'degraded' if self.failures else 'ok',
+            'uptime': round(time.time() - self.started, 3),
+            'articles': len(self.pool),
+            'watermark': self.pool.watermark,
+            'polls': self.polls,
+            'last_poll': self.last_poll,
+            'issues': self.issues,
+            'last_publish': self.last_publish,
+            'errors': self.errors,
+            'failures': dict(self.failures),
+        }
+
+    def _threshold_reached(self) -> bool:
+        return bool(self._threshold) and len(self.pool) >= self._threshold
+
+    def _next_issue(self) -> float|None:
+        if (self._schedule is None):
+            return None
+        return self._schedule.next_after(datetime.now()).timestamp()
+
+    def _run_step(self, name: str, step: Callable[[], bool]) -> bool:
+        # daemon outlives failures of single poll or issue, they are reported by health endpoint
+        # until the same step succeeds again
+        try:
+            succeeded = step()
+        except Exception as e:
+            self._logger.exception('Daemon {} failed'.format(name))
+            succeeded = False
+            self.failures[name] = repr(e)
+        else:
+            if (succeeded):
+                self.failures.pop(name, None)
+            else:
+                self.failures[name] = 'not completed'
+        if (not succeeded):
+            self.errors += 1
+        return succeeded
+
+class HealthServer:
+    """
+    Local http endpoint of running daemon
+      /health  - json status, 503 while last poll or issue failed
+      /metrics - Prometheus text of daemon metrics
+    """
+    _logger = logging.getLogger(__name__ + '.HealthServer')
+
+    def __init__(self, daemon: PublisherDaemon, metrics: Metrics, host: str = '127.0.0.1', port: int = 8787):
+        self._daemon = daemon
+        self._metrics = metrics
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if (self.path == '/health'):
+                    status = server._daemon.status()
+                    self._send(503 if status['failures'] else 200, 'application/json', json.dumps(status))
+                elif (self.path == '/metrics'):
+                    self._send(200, 'text/plain; version=0.0.4', server._prometheus_text())
+                else:
+                    self._send(404, 'text/plain', 'Not found\n')
+
+            def _send(self, status: int, content_type: str, body: str):
+                data = body.encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                server._logger.debug(format % args)
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self.url = 'http://{}:{}'.format(host, self._server.server_address[1])
+
+    @staticmethod
+    def from_config(config: dict, daemon: PublisherDaemon, metrics: Metrics) -> 'HealthServer|None':
+        """
+        config: daemon.health section, endpoint is disabled without port
+        """
+        if (not config or not config.get('port')):
+            return None
+        return HealthServer(daemon, metrics, config.get('host', '127.0.0.1'), config['port'])
+
+    def start(self) -> 'HealthServer':
+        threading.Thread(target=self._server.serve_forever, name='health-server', daemon=True).start()
+        self._logger.info('Health endpoint listening on ' + self.url)
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _prometheus_text(self) -> str:
+        status = self._daemon.status()
+        lines = []
+        for name, help, value in (
+                ('daemon_articles_waiting', 'Unpublished articles kept by daemon', status['articles']),
+                ('daemon_polls', 'Notion polls since start', status['polls']),
+                ('daemon_issues', 'Issues published since start', status['issues']),
+                ('daemon_errors', 'Failed polls and issues since start', status['errors']),
+                ('daemon_last_poll_timestamp_seconds', 'Time of last successful poll', status['last_poll'] or 0),
+                ('daemon_last_publish_timestamp_seconds', 'Time of last published issue', status['last_publish'] or 0)):
+            lines.append('# HELP newspublisher_{} {}'.format(name, help))
+            lines.append('# TYPE newspublisher_{} gauge'.format(name))
+            lines.append('newspublisher_{} {}'.format(name, value))
+        text = '\n'.join(lines) + '\n'
+        if (self._metrics.enabled):
+            text += self._metrics.prometheus_text()
+        return text
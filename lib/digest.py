@@ -0,0 +1,123 @@
+import logging
+from typing import TYPE_CHECKING, Iterable, Iterator
+
+from .notion import Article, ArticleBatch
+
+if TYPE_CHECKING:
+    from .links import LinkInfo
+    from .spill import CategoryBuckets
+
+ARTICLE_CATEGORIES = [
+    'DEV', 'OPS', 'DB', 'SEC', 'TOOLS', 'SOFT', 'TRIVIA'
+]
+
+_logger = logging.getLogger(__name__)
+
+class DigestRow:
+    """
+    Format independent content of single article entry
+    summary_lines are set only for meetings
+    id and last_edited_time identify the article version, rows without them are not cached
+    link_info: result of link check when links are enriched
+    """
+    __slots__ = ('name', 'link', 'type', 'source', 'credit', 'summary_lines', 'id', 'last_edited_time', 'link_info')
+
+    def __init__(self, name: str, link: str, type: str, source: str, credit: str = None, summary_lines: list[str] = None,
+            id: str = None, last_edited_time: str = None, link_info: 'LinkInfo' = None):
+        self.name = name
+        self.link = link
+        self.type = type
+        self.source = source
+        self.credit = credit
+        self.summary_lines = summary_lines
+        self.id = id
+        self.last_edited_time = last_edited_time
+        self.link_info = link_info
+
+    @staticmethod
+    def from_article(article: Article, link_info: 'LinkInfo' = None) -> 'DigestRow':
+        summary_lines = None
+        if article.type == 'Meeting' and article.summary:
+            # notion keeps escaped newlines in summary
+            summary_lines = article.summary.split('\\n')
+        return DigestRow(article.name, article.link, article.type, article.source, article.credit, summary_lines,
+            article.id, article.last_edited_time, link_info)
+
+class DigestChapter:
+    """
+    Articles of one category, rows are created while iterating
+    links: url -> LinkInfo of enriched links
+    """
+
+    def __init__(self, category: str, articles: Iterable[Article], links: dict[str, 'LinkInfo'] = None):
+        self.category = category
+        self.articles = articles
+        self.links = links
+
+    @property
+    def rows(self) -> Iterator[DigestRow]:
+        links = self.links or {}
+        for article in self.articles:
+            yield DigestRow.from_article(article, links.get(article.link))
+
+    @property
+    def versions(self) -> Iterator[tuple[str, str, str|None]]:
+        """
+        (id, last_edited_time, link info key) of chapter articles, identifies chapter content without building rows
+        """
+        links = self.links or {}
+        for article in self.articles:
+            link_info = links.get(article.link)
+            yield (article.id, article.last_edited_time, link_info.key if link_info else None)
+
+    def __len__(self):
+        return len(self.articles)
+
+class Digest:
+    """
+    Intermediate digest model built once from articles and rendered into any format
+    """
+
+    def __init__(self, title: str, preface: str, chapters: list[DigestChapter]):
+        self.title = title
+        self.preface = preface
+        self.chapters = chapters
+
+    @property
+    def preface_lines(self) -> list[str]:
+        return self.preface.split('\n') if self.preface else []
+
+    @staticmethod
+    def build(articles_list: list[Article]|ArticleBatch, title: str = None, preface: str = None,
+            categories: list[str] = None, links: dict[str, 'LinkInfo'] = None) -> 'Digest':
+        """
+        Groups articles into chapters ordered by categories, articles of other categories are left out
+        links: url -> LinkInfo shown by renderers, see LinkEnricher
+        """
+        if (not articles_list):
+            raise ValueError('Articles list is not of expected type')
+        categories = categories if categories else ARTICLE_CATEGORIES
+        _logger.info('Building digest with title: {} and preface: {}'.format(title, preface))
+        articles_map = map_articles_by_category(articles_list)
+        _logger.info("Used categories: " + str(articles_map.keys()))
+        chapters = [DigestChapter(category, articles_map[category], links) for category in categories if category in articles_map]
+        return Digest(title, preface, chapters)
+
+    @staticmethod
+    def from_buckets(buckets: 'CategoryBuckets', title: str = None, preface: str = None, categories: list[str] = None) -> 'Digest':
+        """
+        Chapters read articles from spill buckets as they are rendered, digest holds no articles itself
+        """
+        categories = categories if categories else ARTICLE_CATEGORIES
+        return Digest(title, preface, [DigestChapter(category, buckets[category]) for category in categories if category in buckets])
+
+def map_articles_by_category(articles_list: list[Article]|ArticleBatch) -> dict[str, list[Article]]:
+    if (isinstance(articles_list, ArticleBatch)):
+        return articles_list.group_by_category()
+    articles_categories_dict = {}
+    for article in articles_list:
+        category = article.category.upper() if article.category else None # grouped like ArticleBatch and spill buckets
+        if (category not in articles_categories_dict):
+            articles_categories_dict[category] = []
+        articles_categories_dict[category].append(article)
+    return articles_categories_dict
@@ -0,0 +1,9 @@
+# Digest format names, kept apart from renderers so that choosing formats imports nothing heavy
+FORMAT_MARKDOWN = 'markdown'
+FORMAT_HTML = 'html'
+
+# format -> file extension of written digest
+FORMAT_EXTENSIONS = {
+    FORMAT_MARKDOWN: '.md',
+    FORMAT_HTML: '.html',
+}
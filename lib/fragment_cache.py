@@ -0,0 +1,114 @@
+import hashlib
+import logging
+import sqlite3
+import time
+from typing import Iterable
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS fragments (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS fragments_accessed ON fragments (accessed);
+"""
+
+def content_key(parts: Iterable) -> str:
+    """
+    Stable hash of given parts, None is distinguished from empty string
+    """
+    digest = hashlib.sha1()
+    for part in parts:
+        digest.update(b'\x00' if part is None else str(part).encode('utf-8'))
+        digest.update(b'\x1f')
+    return digest.hexdigest()
+
+class FragmentCache:
+    """
+    Persistent sqlite cache of rendered content fragments with least recently used eviction
+    Reads touch entries in memory, new fragments and access times are written on flush
+    which also evicts least recently used fragments until total size fits max_size (characters).
+    """
+    _logger = logging.getLogger(__name__ + '.FragmentCache')
+
+    _max_size: int = 64 * 1024 * 1024
+
+    def __init__(self, path: str, max_size: int = None):
+        self._path = path
+        if (max_size):
+            self._max_size = max_size
+        self._connection = sqlite3.connect(path, timeout=30)
+        self._connection.executescript(_SCHEMA)
+        self._pending = {}
+        self._touched = {}
+        self.hits = 0
+        self.misses = 0
+        self._logger.debug('Fragment cache opened: {}'.format(path))
+
+    @staticmethod
+    def from_config(config: dict) -> 'FragmentCache|None':
+        """
+        config: digest.cache section, cache is disabled without file
+        """
+        if (not config or not config.get('file')):
+            return None
+        return FragmentCache(config['file'], config.get('max_size'))
+
+    def get(self, key: str) -> str|None:
+        value = self._pending.get(key)
+        if (value is None):
+            row = self._connection.execute('SELECT value FROM fragments WHERE key = ?', (key,)).fetchone()
+            value = row[0] if row else None
+        if (value is None):
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._touched[key] = time.time()
+        return value
+
+    def put(self, key: str, value: str) -> None:
+        if (len(value) > self._max_size):
+            return
+        self._pending[key] = value
+        self._touched.pop(key, None)
+
+    def flush(self) -> None:
+        now = time.time()
+        with self._connection:
+            self._connection.executemany(
+                'INSERT OR REPLACE INTO fragments (key, value, size, accessed) VALUES (?, ?, ?, ?)',
+                [(key, value, len(value), now) for key, value in self._pending.items()])
+            self._connection.executemany(
+                'UPDATE fragments SET accessed = ? WHERE key = ?',
+                [(accessed, key) for key, accessed in self._touched.items()])
+            evicted = self._evict()
+        self._logger.debug('Fragment cache flushed {} fragments, evicted {}, hits: {}, misses: {}'.format(
+            len(self._pending), evicted, self.hits, self.misses))
+        self._pending = {}
+        self._touched = {}
+
+    def _evict(self) -> int:
+        total = self._connection.execute('SELECT COALESCE(SUM(size), 0) FROM fragments').fetchone()[0]
+        if (total <= self._max_size):
+            return 0
+        evicted = 0
+        keys = []
+        cursor = self._connection.execute('SELECT key, size FROM fragments ORDER BY accessed ASC')
+        for key, size in cursor:
+            if (total <= self._max_size):
+                break
+            keys.append((key,))
+            total -= size
+            evicted += 1
+        cursor.close()
+        self._connection.executemany('DELETE FROM fragments WHERE key = ?', keys)
+        return evicted
+
+    def size(self) -> int:
+        return self._connection.execute('SELECT COALESCE(SUM(size), 0) FROM fragments').fetchone()[0]
+
+    def close(self) -> None:
+        if (self._pending or self._touched):
+            self.flush()
+        self._connection.close()
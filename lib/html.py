@@ -1,53 +1,116 @@
 import html
+import string
+from functools import lru_cache
+from typing import TextIO
+
+@lru_cache(maxsize=1024)
+def _escape_cached(data, quote: bool = True) -> str:
+    return html.escape(str(data), quote)
+
+class HtmlTemplate:
+    """
+    Html fragment with named {placeholders}, parsed once on creation into fields
+    Values are inserted as they are, escape them before rendering
+    """
+
+    def __init__(self, template: str):
+        self._template = template
+        self._format = template.format
+        self.fields = tuple(field for _, field, _, _ in string.Formatter().parse(template) if field)
+
+    def render(self, **values) -> str:
+        return self._format(**values)
 
 class HtmlCreator:
     """
     Not so sophisticated html content creator.
     Use methods to create content inside of creator and then use get_content to retrieve it
     It's soo bad that it might be substitued with a html template with dict format argument
+    Content is collected as list of chunks and joined once, so building is linear in output size.
+    With writer given chunks go straight to text file-like object in pieces of about flush_size characters.
     """
-    _content: str = ''
     _formatter = None
+    _flush_size: int = 64 * 1024
+
+    def __init__(self, writer: TextIO = None, flush_size: int = None):
+        self._chunks = []
+        self._chunks_size = 0
+        self._writer = writer
+        if (flush_size):
+            self._flush_size = flush_size
 
     def get_content(self):
-        return self._content
+        if (self._writer):
+            raise ValueError('Content was written to writer')
+        content = ''.join(self._chunks)
+        self._chunks = [content]
+        return content
+
+    def flush(self):
+        """
+        Writes pending chunks to writer, has no effect without one
+        """
+        if (self._writer and self._chunks):
+            self._writer.write(''.join(self._chunks))
+            self._chunks = []
+            self._chunks_size = 0
+        return self
+
+    def _append(self, data: str) -> None:
+        self._chunks.append(data)
+        if (self._writer):
+            self._chunks_size += len(data)
+            if (self._chunks_size >= self._flush_size):
+                self.flush()
 
     def push_list(self):
-        self._content += '<ol>'
+        self._append('<ol>')
         return self
 
     def pop_list(self):
-        self._content += '</ol>'
+        self._append('</ol>')
         return self
 
     def push_paragraph(self):
-        self._content += '<p>'
+        self._append('<p>')
         return self
 
     def pop_paragraph(self):
-        self._content += '</p>'
+        self._append('</p>')
         return self
 
     def push_list_item(self):
-        self._content += '<li>'
+        self._append('<li>')
         return self
 
     def pop_list_item(self):
-        self._content += '</li>'
+        self._append('</li>')
         return self
 
     def insert(self, data: str):
         """
         Adds to content *unescaped* data
         """
-        self._content += data
+        self._append(data)
         return self
 
+    def escape(self, data: str, quote: bool = True) -> str:
+        """
+        quote: escape quotes as well, needed only inside attribute values
+        """
+        return html.escape(data, quote)
+
+    def escape_cached(self, data, quote: bool = True) -> str:
+        """
+        Escape for low cardinality values (sources, types, categories), memoized in bounded LRU cache
+        """
+        return _escape_cached(data, quote)
+
     def h1(self, data: str):
         return '<h1>{}</h1>'.format(html.escape(data))
 
     def h2(self, data: str):
-        return '<h2>{}</h2>'.format(html.escape(data))
+        return '<h2>{}</h2>'.format(_escape_cached(data))
 
     def h3(self, data: str):
         return '<h3>{}</h3>'.format(html.escape(data))
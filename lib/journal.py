@@ -0,0 +1,142 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+_JOURNAL_FILE = re.compile(r'^issue-(\d+)\.jsonl$')
+
+def content_hash(content: str) -> str:
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+class PublishJournal:
+    """
+    Write-ahead journal of a single issue run, one json event per line
+    Every step is appended (and synced) as soon as it is done, so run interrupted at any point
+    can be resumed doing only unfinished steps:
+      started   - title, preface and channels of the issue
+      articles  - ids of fetched articles
+      rendered  - hash of content rendered for format
+      publishing, published - intent and result (page/post id) of channel publish with content hash
+      patched   - Notion page marked as published
+      completed - nothing left to do
+    Torn last line of a killed run is ignored on load.
+    """
+    _logger = logging.getLogger(__name__ + '.PublishJournal')
+
+    def __init__(self, path: str, issue: str):
+        self.path = path
+        self.issue = issue
+        self.title = None
+        self.preface = None
+        self.channels = []
+        self.article_ids = None
+        self.content_hashes = {}
+        self.published = {}
+        self.pending = {}
+        self.patched = set()
+        self.completed = False
+        self._lock = threading.Lock()
+        if (os.path.exists(path)):
+            self._load()
+
+    @staticmethod
+    def open(directory: str, issue: str) -> 'PublishJournal':
+        os.makedirs(directory, exist_ok=True)
+        return PublishJournal(os.path.join(directory, 'issue-{}.jsonl'.format(issue)), issue)
+
+    @staticmethod
+    def latest_unfinished(directory: str) -> 'PublishJournal|None':
+        """
+        Journal of the highest issue number that is not completed
+        """
+        if (not os.path.isdir(directory)):
+            return None
+        issues = sorted((int(match.group(1)) for match in map(_JOURNAL_FILE.match, os.listdir(directory)) if match), reverse=True)
+        for issue in issues:
+            journal = PublishJournal.open(directory, str(issue))
+            if (not journal.completed):
+                return journal
+        return None
+
+    @property
+    def started(self) -> bool:
+        return self.title is not None
+
+    def start(self, title: str, preface: str, channels: list[str]) -> None:
+        self._append({'event': 'started', 'title': title, 'preface': preface, 'channels': channels})
+
+    def record_articles(self, article_ids: list[str]) -> None:
+        self._append({'event': 'articles', 'ids': article_ids})
+
+    def record_rendered(self, format: str, content: str) -> str:
+        hash = content_hash(content)
+        if (self.content_hashes.get(format) != hash):
+            self._append({'event': 'rendered', 'format': format, 'hash': hash})
+        return hash
+
+    def record_publishing(self, channel: str, hash: str) -> None:
+        self._append({'event': 'publishing', 'channel': channel, 'hash': hash})
+
+    def record_published(self, channel: str, hash: str, success: bool, value: object = None, error: str = None) -> None:
+        self._append({'event': 'published', 'channel': channel, 'hash': hash, 'success': success, 'value': value, 'error': error})
+
+    def record_patched(self, article_id: str) -> None:
+        self._append({'event': 'patched', 'id': article_id})
+
+    def complete(self) -> None:
+        self._append({'event': 'completed'})
+
+    def unpatched_ids(self) -> list[str]:
+        return [id for id in (self.article_ids or ()) if id not in self.patched]
+
+    def _append(self, event: dict) -> None:
+        event['time'] = time.time()
+        line = json.dumps(event) + '\n'
+        with self._lock:
+            self._apply(event)
+            with open(self.path, 'a') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _load(self) -> None:
+        with open(self.path) as f:
+            lines = f.readlines()
+        for number, line in enumerate(lines, 1):
+            try:
+                event = json.loads(line)
+            except ValueError:
+                if (number == len(lines)):
+                    self._logger.warning('Ignoring torn last line of journal {}'.format(self.path))
+                    break
+                raise ValueError('Corrupted journal {} at line {}'.format(self.path, number))
+            self._apply(event)
+
+    def _apply(self, event: dict) -> None:
+        kind = event['event']
+        if (kind == 'started'):
+            self.title = event['title']
+            self.preface = event['preface']
+            self.channels = event['channels']
+        elif (kind == 'articles'):
+            self.article_ids = event['ids']
+        elif (kind == 'rendered'):
+            self.content_hashes[event['format']] = event['hash']
+        elif (kind == 'publishing'):
+            self.pending[event['channel']] = event['hash']
+        elif (kind == 'published'):
+            self.pending.pop(event['channel'], None)
+            if (event['success']):
+                self.published[event['channel']] = {'hash': event['hash'], 'value': event['value']}
+        elif (kind == 'patched'):
+            self.patched.add(event['id'])
+        elif (kind == 'completed'):
+            self.completed = True
+
+    def __str__(self):
+        return "PublishJournal [issue:{}, articles:{}, published:{}, pending:{}, patched:{}, completed:{}]".format(
+            self.issue, None if self.article_ids is None else len(self.article_ids), list(self.published),
+            list(self.pending), len(self.patched), self.completed)
@@ -0,0 +1,293 @@
+import asyncio
+import codecs
+import logging
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
+from typing import Iterable
+from urllib.parse import urlsplit
+
+import requests
+
+from .fragment_cache import content_key
+from .metrics import Metrics, NULL_METRICS
+from .transport import HttpTransport
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS links (
+    url TEXT PRIMARY KEY,
+    final_url TEXT,
+    status INTEGER,
+    title TEXT,
+    description TEXT,
+    checked REAL NOT NULL
+);
+"""
+
+_LINK_COLUMNS = ('url', 'final_url', 'status', 'title', 'description', 'checked')
+
+# error statuses meaning the page is gone, other 4xx (403 of bot protection, 408, 429) may pass next time
+_GONE_STATUSES = (404, 410)
+
+class LinkInfo:
+    """
+    Result of checking article link: final url after redirects, http status and OpenGraph metadata
+    error is set when no response was received (timeout, connection, invalid url)
+    """
+    __slots__ = ('url', 'final_url', 'status', 'title', 'description', 'error', 'checked')
+
+    def __init__(self, url: str, final_url: str = None, status: int = None, title: str = None, description: str = None,
+            error: str = None, checked: float = None):
+        self.url = url
+        self.final_url = final_url
+        self.status = status
+        self.title = title
+        self.description = description
+        self.error = error
+        self.checked = checked if checked else time.time()
+
+    @property
+    def dead(self) -> bool:
+        return self.status is None or self.status >= 400
+
+    @property
+    def gone(self) -> bool:
+        """
+        Page is missing for sure (404, 410), other dead links may answer next time
+        """
+        return self.status in _GONE_STATUSES
+
+    @property
+    def redirected(self) -> bool:
+        return bool(self.final_url) and self.final_url != self.url
+
+    @property
+    def key(self) -> str:
+        """
+        Identifies rendered enrichment, part of fragment cache keys of rows and chapters
+        """
+        return content_key(('link', self.status, self.final_url, self.title, self.description))
+
+    def as_dict(self) -> dict:
+        return {'url': self.url, 'final_url': self.final_url, 'status': self.status, 'title': self.title,
+            'description': self.description, 'error': self.error}
+
+    def __str__(self):
+        return 'LinkInfo [url:{}, status:{}, final_url:{}, error:{}]'.format(self.url, self.status, self.final_url, self.error)
+
+class _OpenGraphParser(HTMLParser):
+    """
+    Collects og:title and og:description (title element and description meta as fallback) from document head
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.meta = {}
+        self.title = None
+        self.done = False
+        self._in_title = False
+
+    def handle_starttag(self, tag, attrs):
+        if (tag == 'meta'):
+            attrs = dict(attrs)
+            name = attrs.get('property') or attrs.get('name')
+            if (name and attrs.get('content') is not None):
+                self.meta.setdefault(name.lower(), attrs['content'].strip())
+        elif (tag == 'title'):
+            self._in_title = True
+        elif (tag == 'body'):
+            self.done = True
+
+    def handle_endtag(self, tag):
+        if (tag == 'title'):
+            self._in_title = False
+        elif (tag == 'head'):
+            self.done = True
+
+    def handle_data(self, data):
+        if (self._in_title):
+            self.title = (self.title or '') + data
+
+    def og_title(self) -> str|None:
+        title = ' '.join((self.meta.get('og:title') or self.title or '').split())
+        return title if title else None
+
+    def og_description(self, max_length: int = 300) -> str|None:
+        description = ' '.join((self.meta.get('og:description') or self.meta.get('description') or '').split())
+        if (len(description) > max_length):
+            description = description[:max_length - 3].rstrip() + '...'
+        return description if description else None
+
+class LinkCache:
+    """
+    Persistent sqlite cache of link checks, entries older than ttl seconds are checked again
+    Only definitive answers are kept (2xx, 3xx, 404 and 410): failed requests, 5xx and other 4xx responses
+    are checked again by next run
+    """
+    _logger = logging.getLogger(__name__ + '.LinkCache')
+
+    _ttl: float = 7 * 24 * 3600
+
+    def __init__(self, path: str, ttl: float = None):
+        self._path = path
+        if (ttl):
+            self._ttl = ttl
+        self._connection = sqlite3.connect(path, timeout=30)
+        self._connection.executescript(_SCHEMA)
+        self.hits = 0
+        self.misses = 0
+        self._logger.debug('Link cache opened: {}'.format(path))
+
+    @staticmethod
+    def from_config(config: dict) -> 'LinkCache|None':
+        """
+        config: links.cache section, cache is disabled without file
+        """
+        if (not config or not config.get('file')):
+            return None
+        return LinkCache(config['file'], config.get('ttl'))
+
+    def get_many(self, urls: Iterable[str]) -> dict[str, LinkInfo]:
+        oldest = time.time() - self._ttl
+        found = {}
+        for url in urls:
+            row = self._connection.execute(
+                'SELECT {} FROM links WHERE url = ? AND checked >= ?'.format(', '.join(_LINK_COLUMNS)), (url, oldest)).fetchone()
+            if (row):
+                url, final_url, status, title, description, checked = row
+                found[url] = LinkInfo(url, final_url, status, title, description, checked=checked)
+                self.hits += 1
+            else:
+                self.misses += 1
+        return found
+
+    def put_many(self, infos: Iterable[LinkInfo]) -> int:
+        rows = [(info.url, info.final_url, info.status, info.title, info.description, info.checked)
+            for info in infos if self.definitive(info)]
+        with self._connection:
+            self._connection.executemany('INSERT OR REPLACE INTO links ({}) VALUES ({})'.format(
+                ', '.join(_LINK_COLUMNS), ', '.join('?' * len(_LINK_COLUMNS))), rows)
+        return len(rows)
+
+    @staticmethod
+    def definitive(info: LinkInfo) -> bool:
+        return info.error is None and info.status is not None and (info.status < 400 or info.status in _GONE_STATUSES)
+
+    def close(self) -> None:
+        self._connection.close()
+
+class LinkEnricher:
+    """
+    Checks article links concurrently: asyncio schedules checks, blocking requests run in worker threads
+    over one pooled session of the enricher (closed with it, connections of every site are not kept by shared
+    transport). At most concurrency links are checked at once and at most per_host of them on the same host,
+    so single site is not hammered. Redirects are followed, body is read
+    only up to max_bytes of html head for OpenGraph metadata.
+    """
+    _logger = logging.getLogger(__name__ + '.LinkEnricher')
+
+    _concurrency = 16
+    _per_host = 4
+    _timeout = (5.0, 10.0)
+    _max_bytes = 64 * 1024
+    _user_agent = 'pyNewsPublisher link checker'
+
+    def __init__(self, transport: HttpTransport, cache: LinkCache = None, concurrency: int = None, per_host: int = None,
+            timeout: tuple[float, float] = None, max_bytes: int = None, metrics: Metrics = None):
+        self._transport = transport
+        self._cache = cache
+        self._concurrency = concurrency if concurrency else self._concurrency
+        self._per_host = per_host if per_host else self._per_host
+        self._timeout = timeout if timeout else self._timeout
+        self._max_bytes = max_bytes if max_bytes else self._max_bytes
+        self._metrics = metrics if metrics else NULL_METRICS
+        self._session = None
+
+    @staticmethod
+    def from_config(config: dict, transport: HttpTransport, metrics: Metrics = None) -> 'LinkEnricher':
+        """
+        config: links section
+        """
+        timeout_config = config.get('timeout') or {}
+        return LinkEnricher(transport, LinkCache.from_config(config.get('cache')), config.get('concurrency'),
+            config.get('per_host'), (timeout_config.get('connect', 5.0), timeout_config.get('read', 10.0)),
+            config.get('max_bytes'), metrics)
+
+    def enrich(self, urls: Iterable[str]) -> dict[str, LinkInfo]:
+        """
+        url -> LinkInfo of every distinct url, cached ones are not requested
+        """
+        urls = list(dict.fromkeys(url for url in urls if url))
+        with self._metrics.stage('enrich') as stage:
+            infos = self._cache.get_many(urls) if self._cache else {}
+            missing = [url for url in urls if url not in infos]
+            if (missing):
+                if (self._session is None):
+                    self._session = self._transport.detached_session(self._concurrency, self._per_host)
+                checked = asyncio.run(self._check_all(missing))
+                if (self._cache):
+                    self._cache.put_many(checked)
+                infos.update((info.url, info) for info in checked)
+            dead = [info for info in infos.values() if info.dead]
+            # requests of worker threads are not attributed to stage, see Metrics
+            stage.add(links=len(urls), checked=len(missing), dead=len(dead))
+        self._logger.info('Checked {} links, {} from cache, {} dead'.format(len(urls), len(urls) - len(missing), len(dead)))
+        for info in dead:
+            self._logger.warning('Dead link {} [status:{}, error:{}]'.format(info.url, info.status, info.error))
+        return infos
+
+    def close(self) -> None:
+        if (self._session):
+            self._session.close()
+            self._session = None
+        if (self._cache):
+            self._cache.close()
+
+    async def _check_all(self, urls: list[str]) -> list[LinkInfo]:
+        # default executor bounds threads to concurrency, asyncio.run shuts it down
+        asyncio.get_running_loop().set_default_executor(
+            ThreadPoolExecutor(max_workers=self._concurrency, thread_name_prefix='link-check'))
+        limit = asyncio.Semaphore(self._concurrency)
+        host_limits = {}
+        async def check(url: str) -> LinkInfo:
+            host = urlsplit(url).netloc.lower()
+            host_limit = host_limits.get(host)
+            if (host_limit is None):
+                host_limit = host_limits[host] = asyncio.Semaphore(self._per_host)
+            async with host_limit, limit:
+                return await asyncio.to_thread(self._check, url)
+        return await asyncio.gather(*(check(url) for url in urls))
+
+    def _check(self, url: str) -> LinkInfo:
+        try:
+            response = self._session.get(url, timeout=self._timeout, stream=True, allow_redirects=True,
+                headers={'User-Agent': self._user_agent, 'Accept': 'text/html,application/xhtml+xml;q=0.9,*/*;q=0.5'})
+        except (requests.RequestException, ValueError) as e:
+            return LinkInfo(url, error=repr(e))
+        with response:
+            title, description = None, None
+            if (response.status_code < 400 and 'html' in response.headers.get('Content-Type', '')):
+                title, description = self._read_metadata(response)
+            return LinkInfo(url, response.url, response.status_code, title, description)
+
+    def _read_metadata(self, response: requests.Response) -> tuple[str|None, str|None]:
+        parser = _OpenGraphParser()
+        # requests defaults text/* without charset to latin-1, pages are mostly utf-8
+        encoding = response.encoding if 'charset' in response.headers.get('Content-Type', '') else 'utf-8'
+        try:
+            decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+        except LookupError:
+            decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        size = 0
+        try:
+            for chunk in self._transport.iter_content(response, chunk_size=16 * 1024):
+                if (not parser.done):
+                    parser.feed(decoder.decode(chunk))
+                size += len(chunk)
+                # page smaller than max_bytes is read to the end so its connection goes back to the pool
+                if (size >= self._max_bytes):
+                    break
+        except requests.RequestException as e:
+            self._logger.debug('Reading {} failed: {}'.format(response.url, repr(e)))
+        return parser.og_title(), parser.og_description()
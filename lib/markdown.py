@@ -1,5 +1,6 @@
 
 import logging
+from typing import TextIO
 
 """
     High priority: Markdown format has to work in Confluence and Teams chat.
@@ -21,10 +22,7 @@ class _MarkdownFormatter:
             level = 6
         if (level < 1):
             level = 1
-        prefix = ''
-        for i in range(level):
-            prefix += "#"
-        return '\n' + prefix + ' ' + data + '\n\n'
+        return '\n' + '#' * level + ' ' + data + '\n\n'
 
     def do_link(self, label, address):
         return '[' + label + '](' + address + ') '
@@ -53,20 +51,49 @@ class MarkdownCreator:
     Not so sophisticated markdown content creator.
     Use methods to create content inside of creator and then use get_content to retrieve it
     Most methods just adds to the content but not every like #Link for example
+    Content is collected as list of chunks and joined once, so building is linear in output size.
+    With writer given chunks go straight to text file-like object (file, socket, gzip stream)
+    in pieces of about flush_size characters and get_content is not available.
     """
-    _content: str = ''
     _indent: str = ''
     _indent_size: str = '  '
     _formatter: _MarkdownFormatter = None
+    _flush_size: int = 64 * 1024
 
-    def __init__(self):
+    def __init__(self, writer: TextIO = None, flush_size: int = None):
         self._formatter = _MarkdownFormatter()
+        self._chunks = []
+        self._chunks_size = 0
+        self._writer = writer
+        if (flush_size):
+            self._flush_size = flush_size
 
     def get_content(self):
-        return self._content
+        if (self._writer):
+            raise ValueError('Content was written to writer')
+        content = ''.join(self._chunks)
+        self._chunks = [content]
+        return content
+
+    def flush(self):
+        """
+        Writes pending chunks to writer, has no effect without one
+        """
+        if (self._writer and self._chunks):
+            self._writer.write(''.join(self._chunks))
+            self._chunks = []
+            self._chunks_size = 0
+        return self
+
+    def _append(self, data: str) -> None:
+        self._chunks.append(data)
+        if (self._writer):
+            self._chunks_size += len(data)
+            if (self._chunks_size >= self._flush_size):
+                self.flush()
 
     def create_header(self, data, level):
-        self._content += self._formatter.do_header(data, level)
+        self._append(self._formatter.do_header(data, level))
         return self
 
     def push_list(self):
@@ -92,19 +119,27 @@ class MarkdownCreator:
         return self
 
     def end_paragraph(self):
-        self._content += self._formatter.end_paragraph()
+        self._append(self._formatter.end_paragraph())
+        return self
+
+    def insert(self, data: str):
+        """
+        Adds already formatted markdown as it is
+        """
+        self._append(data)
         return self
 
     def insert_line(self, data: str):
-        self._content += self._indent + data + self._formatter.line_break()
+        self._append(self._indent + data + self._formatter.line_break())
         return self
 
     def insert_list_item(self, data: str):
-        self._content += self._indent + self._formatter.unordered_list_item() + data + self._formatter.line_break()
+        self._append(self._indent + self._formatter.unordered_list_item() + data + self._formatter.line_break())
         return self
 
     def insert_quote(self, data: str):
-        self._content += self._formatter.quote() + data + self._formatter.line_break()
+        self._append(self._formatter.quote() + data + self._formatter.line_break())
+        return self
 
 
     def create_link(self, label: str, url: str) -> str:
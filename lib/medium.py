@@ -1,6 +1,8 @@
 import requests
 import logging
 
+from .transport import HttpTransport
+
 class MediumBlog:
 
     _secret: str
@@ -10,7 +12,8 @@ class MediumBlog:
 
     _logger: logging.Logger = logging.getLogger(__name__ + '.MediumBlog')
 
-    def __init__(self, config):
+    def __init__(self, config, transport: HttpTransport = None):
+        self._transport = transport if transport else HttpTransport()
         self._secret = config['auth']['token']
         self._user_id = config['api']['userid']
         self._url = config['api']['url'].format(self._user_id)
@@ -31,7 +34,13 @@ class MediumBlog:
             'license': 'cc-40-by-nc-nd',
             'tags': ['Digest', 'Web Development', 'Newsletter']
         }
-        response = requests.post(url=self._url, json=json_content, headers = self._headers)
+        # creating post is not idempotent, only 429 is retried
+        response = self._transport.request(
+            method='post',
+            url=self._url,
+            json_body=json_content,
+            headers=self._headers,
+            retry_server_errors=False)
         # if (response.status_code != 200):
         #     self._logger.error('Medium post failed with http code:{} and data:\n{}', response.status_code, response.text)
         #     raise ValueError(response.text)
@@ -0,0 +1,292 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Callable, Iterable, Iterator
+
+class _Aggregate:
+    """
+    Totals of one stage and label set
+    """
+    __slots__ = ('name', 'labels', 'calls', 'duration', 'counters', '_lock')
+
+    def __init__(self, name: str, labels: dict):
+        self.name = name
+        self.labels = labels
+        self.calls = 0
+        self.duration = 0.0
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def record(self, duration: float = 0.0, calls: int = 0, counters: dict = None) -> None:
+        with self._lock:
+            self.calls += calls
+            self.duration += duration
+            for counter, value in (counters or {}).items():
+                self.counters[counter] = self.counters.get(counter, 0) + value
+
+    def as_dict(self) -> dict:
+        return {
+            'stage': self.name,
+            'labels': self.labels,
+            'calls': self.calls,
+            'duration': round(self.duration, 6),
+            'counters': dict(self.counters),
+        }
+
+class _Stage:
+    """
+    Single execution of a stage, use as context manager
+    While it runs http traffic of the same thread is added to stage counters
+    """
+    __slots__ = ('_metrics', '_aggregate', '_start')
+
+    def __init__(self, metrics: 'Metrics', aggregate: _Aggregate):
+        self._metrics = metrics
+        self._aggregate = aggregate
+        self._start = None
+
+    def __enter__(self) -> '_Stage':
+        self._aggregate.record(calls=1)
+        self._resume()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._suspend()
+        if (exc_type is not None):
+            self._aggregate.record(counters={'failures': 1})
+        return False
+
+    def add(self, **counters) -> None:
+        self._aggregate.record(counters=counters)
+
+    def iterate(self, iterable: Iterable) -> Iterator:
+        """
+        Time spent producing items (e.g. receiving streamed body) is added to this stage,
+        time spent by consumer between items is not
+        """
+        iterator = iter(iterable)
+        while True:
+            self._resume()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self._suspend()
+            yield item
+
+    def _resume(self) -> None:
+        self._metrics._push(self._aggregate)
+        self._start = time.perf_counter()
+
+    def _suspend(self) -> None:
+        self._aggregate.record(time.perf_counter() - self._start)
+        self._metrics._pop()
+
+class Metrics:
+    """
+    Per stage durations and counters of a single run
+    Stage is identified by name and labels (e.g. render with format=html), every execution
+    adds to its calls, duration and counters. Http traffic reported by TransportStats is added to
+    the stage currently running on the calling thread, so stages running in parallel threads
+    get their own requests, bytes and retries.
+    """
+    _logger = logging.getLogger(__name__ + '.Metrics')
+
+    enabled = True
+
+    def __init__(self):
+        self._aggregates = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._started = time.time()
+
+    @staticmethod
+    def from_config(config: dict) -> 'Metrics|NullMetrics':
+        """
+        config: metrics section, disabled metrics cost a no-op method call per stage
+        """
+        if (not config or not config.get('enabled')):
+            return NULL_METRICS
+        return Metrics()
+
+    def stage(self, name: str, **labels) -> _Stage:
+        return _Stage(self, self._aggregate(name, labels))
+
+    def observe(self, name: str, duration: float, labels: dict = None, **counters) -> None:
+        """
+        Records execution measured elsewhere, e.g. in worker process
+        """
+        self._aggregate(name, labels or {}).record(duration, 1, counters)
+
+    def timed(self, name: str, function: Callable, **labels) -> Callable:
+        """
+        Wraps function so that every call is recorded as stage execution, without traffic attribution
+        """
+        aggregate = self._aggregate(name, labels)
+        perf_counter = time.perf_counter
+
+        def timed_function(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                aggregate.record(perf_counter() - start, 1)
+        return timed_function
+
+    # traffic reported by TransportStats, added to stage running on current thread
+    def request_sent(self, bytes_sent: int) -> None:
+        self._add_current({'requests': 1, 'bytes_sent': bytes_sent})
+
+    def response_received(self, bytes_received: int) -> None:
+        self._add_current({'bytes_received': bytes_received})
+
+    def retried(self) -> None:
+        self._add_current({'retries': 1})
+
+    def connection_opened(self) -> None:
+        self._add_current({'connections': 1})
+
+    def summary(self, extra: dict = None) -> dict:
+        with self._lock:
+            aggregates = list(self._aggregates.values())
+        summary = {
+            'started': self._started,
+            'duration': round(time.time() - self._started, 6),
+            'stages': [aggregate.as_dict() for aggregate in aggregates],
+        }
+        summary.update(extra or {})
+        return summary
+
+    def write_json(self, path: str, extra: dict = None) -> None:
+        _write_atomic(path, json.dumps(self.summary(extra), indent=2))
+        self._logger.debug('Metrics summary written to {}'.format(path))
+
+    def write_prometheus(self, path: str, prefix: str = 'newspublisher') -> None:
+        """
+        Prometheus text format for node exporter textfile collector, values describe the last run
+        """
+        _write_atomic(path, self.prometheus_text(prefix))
+        self._logger.debug('Metrics textfile written to {}'.format(path))
+
+    def prometheus_text(self, prefix: str = 'newspublisher') -> str:
+        with self._lock:
+            aggregates = list(self._aggregates.values())
+        lines = []
+
+        def gauge(name: str, help: str, samples: list[tuple[dict, float]]) -> None:
+            lines.append('# HELP {}_{} {}'.format(prefix, name, help))
+            lines.append('# TYPE {}_{} gauge'.format(prefix, name))
+            for labels, value in samples:
+                lines.append('{}_{}{} {}'.format(prefix, name, _format_labels(labels), _format_value(value)))
+
+        stage_labels = [dict(aggregate.labels, stage=aggregate.name) for aggregate in aggregates]
+        gauge('run_timestamp_seconds', 'Start of the last run', [({}, self._started)])
+        gauge('run_duration_seconds', 'Duration of the last run', [({}, time.time() - self._started)])
+        gauge('stage_calls', 'Executions of stage in the last run',
+            [(labels, aggregate.calls) for labels, aggregate in zip(stage_labels, aggregates)])
+        gauge('stage_duration_seconds', 'Time spent in stage in the last run',
+            [(labels, aggregate.duration) for labels, aggregate in zip(stage_labels, aggregates)])
+        counters = sorted({counter for aggregate in aggregates for counter in aggregate.counters})
+        for counter in counters:
+            gauge('stage_' + counter, 'Stage {} in the last run'.format(counter.replace('_', ' ')),
+                [(labels, aggregate.counters[counter]) for labels, aggregate in zip(stage_labels, aggregates)
+                    if counter in aggregate.counters])
+        return '\n'.join(lines) + '\n'
+
+    def _aggregate(self, name: str, labels: dict) -> _Aggregate:
+        key = (name, tuple(sorted(labels.items())))
+        aggregate = self._aggregates.get(key)
+        if (aggregate is None):
+            with self._lock:
+                aggregate = self._aggregates.setdefault(key, _Aggregate(name, labels))
+        return aggregate
+
+    def _push(self, aggregate: _Aggregate) -> None:
+        stack = getattr(self._local, 'stack', None)
+        if (stack is None):
+            stack = self._local.stack = []
+        stack.append(aggregate)
+
+    def _pop(self) -> None:
+        self._local.stack.pop()
+
+    def _add_current(self, counters: dict) -> None:
+        stack = getattr(self._local, 'stack', None)
+        if (stack):
+            stack[-1].record(counters=counters)
+
+class _NullStage:
+    """
+    Stage of disabled metrics, does nothing
+    """
+
+    def __enter__(self) -> '_NullStage':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+    def add(self, **counters) -> None:
+        pass
+
+    def iterate(self, iterable: Iterable) -> Iterable:
+        return iterable
+
+class NullMetrics:
+    """
+    Disabled metrics with the same interface as Metrics
+    """
+    enabled = False
+    _stage = _NullStage()
+
+    def stage(self, name: str, **labels) -> _NullStage:
+        return self._stage
+
+    def observe(self, name: str, duration: float, labels: dict = None, **counters) -> None:
+        pass
+
+    def timed(self, name: str, function: Callable, **labels) -> Callable:
+        return function
+
+    def request_sent(self, bytes_sent: int) -> None:
+        pass
+
+    def response_received(self, bytes_received: int) -> None:
+        pass
+
+    def retried(self) -> None:
+        pass
+
+    def connection_opened(self) -> None:
+        pass
+
+NULL_METRICS = NullMetrics()
+
+def _format_labels(labels: dict) -> str:
+    if (not labels):
+        return ''
+    values = ('{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in sorted(labels.items()))
+    return '{' + ','.join(values) + '}'
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if isinstance(value, int) else '{:.6f}'.format(value)
+
+def _write_atomic(path: str, content: str) -> None:
+    # textfile collector may read the file any time, never let it see a partial one,
+    # unique temp file per writer so concurrent runs (daemon, parallel digests) do not interleave
+    directory = os.path.dirname(path) or '.'
+    descriptor, temp_path = tempfile.mkstemp(prefix=os.path.basename(path) + '.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(descriptor, 'w') as f:
+            f.write(content)
+        # mkstemp creates owner only file, collector may run as another user
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, path)
+    finally:
+        if (os.path.exists(temp_path)):
+            os.remove(temp_path)
@@ -1,2 +1,7 @@
 from .client import NotionDbClient
-from .client import Article
\ No newline at end of file
+from .client import Article
+from .client import PublishReport
+from .client import PublishResult
+from .schema import ArticleSchema
+from .batch import ArticleBatch
+from .query import NotionQuery
\ No newline at end of file
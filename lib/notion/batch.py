@@ -0,0 +1,149 @@
+from array import array
+from typing import Iterable, Iterator
+
+from .client import Article
+
+_TEXT_FIELDS = ('id', 'object', 'name', 'link', 'summary', 'credit', 'created_time', 'published_time', 'last_edited_time')
+_CATEGORICAL_FIELDS = ('category', 'type', 'source')
+_TECH_CATEGORY = 'tech_category'
+_NONE_CODE = 0
+_MAX_SHORT_CODE = 0xFFFF
+
+def _append_code(codes: array, code: int) -> array:
+    """
+    Appends code, 'H' codes are widened to 'I' once vocabulary outgrows them
+    """
+    if (code > _MAX_SHORT_CODE and codes.typecode == 'H'):
+        codes = array('I', codes)
+    codes.append(code)
+    return codes
+
+class _Vocabulary:
+    """
+    Two way mapping of categorical value and its code, code 0 stands for None
+    """
+
+    def __init__(self):
+        self.values = [None]
+        self._codes = {None: _NONE_CODE}
+
+    def encode(self, value: str|None) -> int:
+        code = self._codes.get(value)
+        if (code is None):
+            code = len(self.values)
+            self._codes[value] = code
+            self.values.append(value)
+        return code
+
+class ArticleBatchView:
+    """
+    Subset of batch rows, articles are created only while iterating
+    """
+
+    def __init__(self, batch: 'ArticleBatch', indices: list[int]):
+        self._batch = batch
+        self._indices = indices
+
+    def __len__(self):
+        return len(self._indices)
+
+    def __iter__(self) -> Iterator[Article]:
+        article = self._batch.article
+        for index in self._indices:
+            yield article(index)
+
+class ArticleBatch:
+    """
+    Columnar container of articles for large archives
+    Text fields are kept in parallel lists, category, type, source and tech categories
+    as small integer codes into per field vocabularies (16 bit, widened when vocabulary outgrows them).
+    Grouping works on codes only, articles are materialised one at a time while iterating.
+    """
+
+    def __init__(self):
+        self._text = {field: [] for field in _TEXT_FIELDS}
+        self._codes = {field: array('H') for field in _CATEGORICAL_FIELDS}
+        self._vocabularies = {field: _Vocabulary() for field in _CATEGORICAL_FIELDS + (_TECH_CATEGORY,)}
+        # tech categories of row i are _tech_codes[_tech_offsets[i]:_tech_offsets[i + 1]]
+        self._tech_codes = array('H')
+        self._tech_offsets = array('I', [0])
+
+    @staticmethod
+    def from_articles(articles: Iterable[Article]) -> 'ArticleBatch':
+        batch = ArticleBatch()
+        batch.extend(articles)
+        return batch
+
+    def append(self, article: Article) -> None:
+        for field in _TEXT_FIELDS:
+            self._text[field].append(getattr(article, field))
+        for field in _CATEGORICAL_FIELDS:
+            self._codes[field] = _append_code(self._codes[field], self._vocabularies[field].encode(getattr(article, field)))
+        tech_vocabulary = self._vocabularies[_TECH_CATEGORY]
+        for tech in article.tech_category or ():
+            self._tech_codes = _append_code(self._tech_codes, tech_vocabulary.encode(tech))
+        self._tech_offsets.append(len(self._tech_codes))
+
+    def extend(self, articles: Iterable[Article]) -> None:
+        for article in articles:
+            self.append(article)
+
+    def __len__(self):
+        return len(self._text['id'])
+
+    @property
+    def ids(self) -> list[str]:
+        return list(self._text['id'])
+
+    def __iter__(self) -> Iterator[Article]:
+        for index in range(len(self)):
+            yield self.article(index)
+
+    def article(self, index: int) -> Article:
+        text = self._text
+        codes = self._codes
+        vocabularies = self._vocabularies
+        tech_values = vocabularies[_TECH_CATEGORY].values
+        tech_codes = self._tech_codes[self._tech_offsets[index]:self._tech_offsets[index + 1]]
+        return Article(
+            text['id'][index], text['object'][index],
+            name=text['name'][index],
+            link=text['link'][index],
+            summary=text['summary'][index],
+            credit=text['credit'][index],
+            category=vocabularies['category'].values[codes['category'][index]],
+            type=vocabularies['type'].values[codes['type'][index]],
+            source=vocabularies['source'].values[codes['source'][index]],
+            technical_category=[tech_values[code] for code in tech_codes],
+            created_time=text['created_time'][index],
+            published_time=text['published_time'][index],
+            last_edited_time=text['last_edited_time'][index])
+
+    def categories(self, field: str = 'category') -> list[str]:
+        """
+        Distinct values of categorical field in order of first appearance
+        """
+        return self._vocabularies[field].values[1:]
+
+    def group_by_category(self) -> dict[str, ArticleBatchView]:
+        """
+        Rows grouped by upper cased category, keeping original order within group
+        Rows without category are grouped under None
+        """
+        indices_by_code = {}
+        for index, code in enumerate(self._codes['category']):
+            indices = indices_by_code.get(code)
+            if (indices is None):
+                indices = indices_by_code[code] = []
+            indices.append(index)
+
+        values = self._vocabularies['category'].values
+        indices_by_category = {}
+        for code, indices in indices_by_code.items():
+            category = values[code].upper() if values[code] is not None else None
+            if (category in indices_by_category):
+                # 'Dev' and 'DEV' land in the same chapter, keep row order
+                indices_by_category[category] = sorted(indices_by_category[category] + indices)
+            else:
+                indices_by_category[category] = indices
+        return {category: ArticleBatchView(self, indices) for category, indices in indices_by_category.items()}
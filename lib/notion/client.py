@@ -1,38 +1,33 @@
 import requests
 import json
 import logging
-import os
-from datetime import datetime
-
-NOTION_PROPERTY_TYPE_RICH_TEXT = 'rich_text'
-NOTION_PROPERTY_TYPE_SELECT = 'select'
-NOTION_PROPERTY_TYPE_MULTI_SELECT = 'multi_select'
-NOTION_PROPERTY_TYPE_DATE = 'date'
-NOTION_PROPERTY_TYPE_CREATED_TIME = 'created_time'
-NOTION_PROPERTY_TYPE_LAST_EDITED_TIME = 'last_edited_time'
-NOTION_PROPERTY_TYPE_URL = 'url'
-NOTION_PROPERTY_TYPE_TITLE = 'title'
-
-_query_unpublished_pages = ('query_unpublished_pages', {
-    "filter": {
-        "property": "Published time",
-        "date": {
-            "is_empty": True,
-        }
-    },
-    "sorts": [
-        {
-            "property": "Created time",
-            "direction": "ascending",
-        }
-    ],
-    #"page_size": 1,
-})
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Callable
+
+from .query import NotionQuery, window_bounds
+from .schema import ArticleSchema, intern_optional, DEFAULT_PROPERTY_MAPPING, NOTION_PROPERTY_TYPE_DATE
+from .stream import JsonListStream, iter_decoded
+from ..metrics import Metrics
+from ..ratelimit import TokenBucket
+from ..response_store import ResponseStore, MODE_RECORD, MODE_REPLAY
+from ..transport import HttpTransport
+
+if TYPE_CHECKING:
+    from ..store import ArticleStore
 
 class Article:
     """
     Article instance represents a Page object in Notion
+    Slotted and with interned categorical values as large archives hold thousands of them
     """
+    __slots__ = (
+        'id', 'object', 'name', 'link', 'summary', 'type', 'source', 'category',
+        'tech_category', 'credit', 'created_time', 'published_time', 'last_edited_time'
+    )
     _logger = logging.getLogger(__name__ + '.Article')
 
     id: str         # object id
@@ -57,120 +52,71 @@ class Article:
         self.name = name
         self.link = link
         self.summary = summary
-        self.category = category
-        self.type = type
-        self.source = source
-        self.tech_category = technical_category
+        self.category = intern_optional(category)
+        self.type = intern_optional(type)
+        self.source = intern_optional(source)
+        self.tech_category = [intern_optional(tech) for tech in technical_category] if technical_category else technical_category
         self.credit = credit
         self.created_time = created_time
         self.last_edited_time = last_edited_time
         self.published_time = published_time
 
     @staticmethod
-    def from_json(json: dict):
-        article = Article(json['id'], json['object'])
-
-        props_dict = {}
-        for prop_name, prop_value in json['properties'].items():
-            if (prop_value['type'] == NOTION_PROPERTY_TYPE_RICH_TEXT):
-                    props_dict[prop_name] = Article._parse_rich_text(prop_value)
-            elif (prop_value['type'] == NOTION_PROPERTY_TYPE_CREATED_TIME):
-                props_dict[prop_name] = Article._parse_created_time(prop_value)
-            elif (prop_value['type'] == NOTION_PROPERTY_TYPE_LAST_EDITED_TIME):
-                props_dict[prop_name] = Article._parse_last_edited_time(prop_value)
-            elif (prop_value['type'] == NOTION_PROPERTY_TYPE_SELECT):
-                props_dict[prop_name] = Article._parse_select(prop_value)
-            elif (prop_value['type'] == NOTION_PROPERTY_TYPE_MULTI_SELECT):
-                props_dict[prop_name] = Article._parse_multi_select(prop_value)
-            elif (prop_value['type'] == NOTION_PROPERTY_TYPE_DATE):
-                props_dict[prop_name] = Article._parse_date(prop_value)
-            elif (prop_value['type'] == NOTION_PROPERTY_TYPE_URL):
-                props_dict[prop_name] = Article._parse_url(prop_value)
-            elif (prop_value['type'] == NOTION_PROPERTY_TYPE_TITLE):
-                props_dict[prop_name] = Article._parse_title(prop_value)
-        # Could use some dict, constants or smth?
-        article.name = props_dict['Name']
-        article.link = props_dict['Link']
-        article.type = props_dict['Type']
-        article.source = props_dict['Source']
-        article.summary = props_dict['Summary']
-        article.credit = props_dict['Credit']
-        article.category = props_dict['Category']
-        article.tech_category = props_dict['Technical Category']
-        article.created_time = props_dict['Created time']
-        article.last_edited_time = props_dict['Last edited time']
-        article.published_time = props_dict['Published time']
-        return article
+    def from_json(json: dict, schema: ArticleSchema = None):
+        """
+        Parses single page, use compiled schema directly when parsing many pages
+        """
+        schema = schema if schema else _default_schema
+        return schema.compile(json)(json)
 
+    def __str__(self):
+        return "Article [id:{}, object:{}, name:{}, type:{}, source:{}, category:{}, tech_category:{},credit:{}, summary:{}, created_time:{}, last_edited_time:{}, published_time:{}]".format(
+            self.id, self.object, self.name, self.type, self.source, self.category, self.tech_category, self.credit, self.summary,
+            self.created_time, self.last_edited_time, self.published_time
+        )
 
-    @staticmethod
-    def _parse_title(json):
-        if (json['type'] != NOTION_PROPERTY_TYPE_TITLE):
-            raise ValueError('Expected ' + NOTION_PROPERTY_TYPE_TITLE + ' object but received ' + json['type'])
-        if (len(json['title']) == 0):
-            return None
-        result = []
-        for rich_text in json['title']: # and hope nothing else will pop up
-            result.append(rich_text['plain_text'])
-        return " ".join(result)
+_default_schema = ArticleSchema(Article)
 
-    @staticmethod
-    def _parse_rich_text(json):
-        if (json['type'] != NOTION_PROPERTY_TYPE_RICH_TEXT):
-            raise ValueError('Expected ' + NOTION_PROPERTY_TYPE_RICH_TEXT + ' object but received ' + json['type'])
-        if (len(json['rich_text']) == 0):
-            return None
-        result = []
-        for rich_text in json['rich_text']: # and hope nothing else will pop up
-            # Take newline characters into account
-            result.append(rich_text['plain_text'])
-        return " ".join(result)
+class PublishResult:
+    """
+    Outcome of marking single article as published
+    """
+    article_id: str
+    success: bool
+    error: str|None
 
-    @staticmethod
-    def _parse_date(json):
-        return Article._parse_generic_property(json, NOTION_PROPERTY_TYPE_DATE)
+    def __init__(self, article_id: str, success: bool, error: str = None):
+        self.article_id = article_id
+        self.success = success
+        self.error = error
 
-    @staticmethod
-    def _parse_last_edited_time(json):
-        return Article._parse_generic_property(json, NOTION_PROPERTY_TYPE_LAST_EDITED_TIME)
+    def __str__(self):
+        return "PublishResult [article_id:{}, success:{}, error:{}]".format(
+            self.article_id, self.success, self.error)
 
-    @staticmethod
-    def _parse_created_time(json):
-        return Article._parse_generic_property(json, NOTION_PROPERTY_TYPE_CREATED_TIME)
+class PublishReport:
+    """
+    Per article results of bulk publish
+    """
+    results: list[PublishResult]
 
-    @staticmethod
-    def _parse_url(json):
-        return Article._parse_generic_property(json, NOTION_PROPERTY_TYPE_URL)
+    def __init__(self, results: list[PublishResult] = None):
+        self.results = results if results else []
 
-    @staticmethod
-    def _parse_generic_property(json, key):
-        if (json['type'] != key):
-            raise ValueError('Expected ' + key + ' object but received ' + json['type'])
-        return json[key]
+    @property
+    def succeeded(self) -> list[PublishResult]:
+        return [result for result in self.results if result.success]
 
-    @staticmethod
-    def _parse_select(json):
-        if (json['type'] != NOTION_PROPERTY_TYPE_SELECT):
-            raise ValueError('Expected ' + NOTION_PROPERTY_TYPE_SELECT + ' object but received ' + json['type'])
-        if (json['select']):
-            return json['select']['name']
-        return None
+    @property
+    def failed(self) -> list[PublishResult]:
+        return [result for result in self.results if not result.success]
 
-    @staticmethod
-    def _parse_multi_select(json):
-        if (json['type'] != NOTION_PROPERTY_TYPE_MULTI_SELECT):
-            raise ValueError('Expected ' + NOTION_PROPERTY_TYPE_MULTI_SELECT + ' object but received ' + json['type'])
-        result = []
-        if (json['multi_select']):
-            for select in json['multi_select']:
-                result.append(select['name'])
-        return result
+    def __len__(self):
+        return len(self.results)
 
     def __str__(self):
-        return "Article [id:{}, object:{}, name:{}, type:{}, source:{}, category:{}, tech_category:{},credit:{}, summary:{}, created_time:{}, last_edited_time:{}, published_time:{}]".format(
-            self.id, self.object, self.name, self.type, self.source, self.category, self.tech_category, self.credit, self.summary,
-            self.created_time, self.last_edited_time, self.published_time
-        )
+        return "PublishReport [total:{}, succeeded:{}, failed:{}]".format(
+            len(self.results), len(self.succeeded), len(self.failed))
 
 class NotionDbClient:
 
@@ -180,12 +126,36 @@ class NotionDbClient:
     _database_id = None
     _url_api_database = None
     _headers = None
-    _notion_saved_file_path = 'notion_saved_data.json'
+    _responses_directory = 'notion_responses'
+    _publish_workers = 4
 
-    def __init__(self, config):
+    def __init__(self, config, rate_limiter: TokenBucket = None, transport: HttpTransport = None, store: 'ArticleStore' = None,
+            metrics: Metrics = None, responses: ResponseStore = None):
         self._secret = config['auth']['token']
         self._database_id = config['database']['id']
-        self._url_api = 'https://api.notion.com/v1'
+        self._schema = ArticleSchema(Article, config['database'].get('properties'))
+        api_config = config.get('api') or {}
+        self._url_api = api_config.get('url', 'https://api.notion.com/v1')
+        self._transport = transport if transport else HttpTransport()
+        # notion allows average of 3 requests per second, limit is shared by clients of the same transport
+        self._rate_limiter = rate_limiter if rate_limiter else self._transport.rate_limiter(self._url_api, api_config.get('rate', 3))
+        self._metrics = metrics if metrics else self._transport.metrics
+        self._store = store
+        # seconds between full sweeps of unpublished set removing deleted and archived pages from store
+        self._reconcile_interval = (config.get('store') or {}).get('reconcile_interval', 86400)
+        # recorded query responses, see iter_unpublished_articles
+        self._responses = responses if responses else ResponseStore.from_config(config.get('responses'))
+        self._stream = api_config.get('stream', False)
+        # projection and filters pushed down into every database query
+        self._query_config = config.get('query') or {}
+        self._database_properties = None
+        fetch_config = config.get('fetch') or {}
+        self._shards = fetch_config.get('shards', 1)
+        self._shard_boundaries = fetch_config.get('boundaries')
+        # pages each window keeps fetched ahead of the consumer, its cursor chain waits when they are not consumed
+        self._shard_buffer = fetch_config.get('buffer', 4)
+        publish_config = config.get('publish') or {}
+        self._publish_workers = publish_config.get('workers', self._publish_workers)
         self._url_api_database = "{}/databases".format(self._url_api)
         self._url_api_page = '{}/pages'.format(self._url_api)
         self._headers = {
@@ -195,42 +165,108 @@ class NotionDbClient:
             "Authorization":  "Bearer " + self._secret
         }
 
-    def _request_database(self, method: str, query: tuple, do_save: bool = False) -> list:
+    def query(self, name: str, responses: ResponseStore = None, page_size: int = None) -> NotionQuery:
         """
-        Assumes requesting only hardcoded database
+        Query builder of the database with notion.query configuration applied:
+          projection - only mapped properties are returned (filter_properties)
+          filters - article attribute: accepted values, pushed down as property conditions
+          created - window of page created time: after, before (ISO dates) or days back from now
+        Database properties are retrieved once, when projection or filters need their ids and types
         """
-        database_query_url = self._url_api_database + '/{}/query'.format(self._database_id)
-        return self._request_api(
-            method=method,
-            url=database_query_url,
-            query=query,
-            do_save=do_save)
+        query = NotionQuery(name, page_size)
+        config = self._query_config
+        if (config.get('projection') or config.get('filters')):
+            properties = self._get_database_properties(responses)
+            if (config.get('projection')):
+                query.project([properties[property_name]['id'] for property_name in self._schema.property_names if property_name in properties])
+            for attribute, values in (config.get('filters') or {}).items():
+                property_name = self._property_name(attribute)
+                if (property_name not in properties):
+                    raise ValueError('Cannot filter by {}, property {} is missing in database'.format(attribute, property_name))
+                query.where_in(property_name, properties[property_name]['type'], values if isinstance(values, list) else [values])
+        on_or_after, before = window_bounds(config.get('created'))
+        return query.where_timestamp('created_time', on_or_after, before)
+
+    def _unpublished_query(self, responses: ResponseStore = None, direction: str = 'ascending') -> NotionQuery:
+        return (self.query('query_unpublished_pages', responses, page_size=100)
+            .where_empty(self._property_name('published_time'), NOTION_PROPERTY_TYPE_DATE)
+            .sort_by_property(self._property_name('created_time'), direction))
+
+    def _edited_query(self, watermark: str) -> NotionQuery:
+        """
+        All pages (published or not) changed on or after watermark
+        Notion last_edited_time has minute precision so the watermark minute is fetched again
+        """
+        return (self.query('query_pages_edited_since', page_size=100)
+            .where_timestamp('last_edited_time', on_or_after=watermark)
+            .sort_by_timestamp('last_edited_time'))
 
-    def _request_page(self, page_id: str, method: str, query: tuple, do_save: bool = False) -> list:
+    def _property_name(self, attribute: str) -> str:
+        return self._schema.property_name(attribute) or DEFAULT_PROPERTY_MAPPING[attribute]
+
+    def _get_database_properties(self, responses: ResponseStore = None) -> dict[str, dict]:
+        """
+        Property name -> {id, type} of the database, replayed and recorded with query responses
+        """
+        if (self._database_properties is None):
+            database_url = self._url_api_database + '/' + self._database_id
+            database = self._request_api(method='get', url=database_url, query=('retrieve_database', None), responses=responses)
+            self._database_properties = {name: {'id': prop['id'], 'type': prop['type']} for name, prop in database['properties'].items()}
+        return self._database_properties
+
+    def _database_query_url(self, query: NotionQuery) -> str:
+        return query.url(self._url_api_database + '/{}/query'.format(self._database_id))
+
+    def _request_database(self, method: str, query: tuple, responses: ResponseStore = None, url: str = None) -> list:
+        """
+        Assumes requesting only hardcoded database
+        url: query url with parameters, plain database query url by default
+        """
+        database_query_url = url if url else self._url_api_database + '/{}/query'.format(self._database_id)
+        with self._metrics.stage('fetch') as stage:
+            json_data = self._request_api(
+                method=method,
+                url=database_query_url,
+                query=query,
+                responses=responses)
+            stage.add(pages=1, articles=len(json_data.get('results') or ()))
+        return json_data
+
+    def _request_page(self, page_id: str, method: str, query: tuple) -> list:
         page_url = self._url_api_page + '/' + page_id
         return self._request_api(
             method=method,
             url=page_url,
-            query=query,
-            do_save=do_save)
+            query=query)
 
-    def _request_api(self, method: str, url: str, query: tuple, do_save: bool = False) -> list:
+    def _request_api(self, method: str, url: str, query: tuple, responses: ResponseStore = None) -> list:
         """
         method: str get|post|patch|delete
         query: tuple - [0 - name, 1 - query json dict]
-        do_save: boolean
+        responses: store response is replayed from and/or recorded to, according to its mode
 
         Make more generic with method of choice
         Returns json response parsed by json module
         """
+        key = responses.key(method, self._endpoint(url), query[1]) if responses else None
+        if (responses and responses.replays):
+            body = responses.get(key)
+            if (body is not None):
+                self._logger.debug('Replaying notion response [url:{}, query:{}, key:{}]'.format(url, query[0], key))
+                return json.loads(body)
+            if (not responses.records):
+                raise FileNotFoundError('No recorded response of query {} [url:{}, key:{}] in {}'.format(query[0], url, key, responses.directory))
         self._logger.debug('Querying notion database [url:{}, query:{}]'.format(url, query[0]))
-        response = requests.request(method = method, url = url, json = query[1], headers = self._headers)
+        response = self._transport.request(
+            method=method,
+            url=url,
+            json_body=query[1],
+            headers=self._headers,
+            rate_limiter=self._rate_limiter)
         if (response.status_code == 200):
             json_response = response.text
-            if (do_save):
-                self._logger.debug("Saving query response to: {}".format(self._notion_saved_file_path))
-                with open(self._notion_saved_file_path, 'w') as f:
-                    f.write(json_response)
+            if (responses):
+                responses.put(key, response.content)
             # Returned object:
             # {
             #   "object": list
@@ -241,38 +277,281 @@ class NotionDbClient:
             # }
             return json.loads(json_response)
         else:
-            raise requests.HTTPError(response.text)
+            raise requests.HTTPError(response.text, response=response)
 
-    def get_unpublished_articles(self, load_saved: bool = False, save_response: bool = False):
+    def _iter_database_pages(self, method: str, query: NotionQuery, responses: ResponseStore = None):
+        """
+        Follows database query cursors until has_more is false
+        Next page is requested in background while current one is being consumed
+        Yields json responses, one per page
+        responses: every page is replayed from and/or recorded to store
+        """
+        url = self._database_query_url(query)
+        query = query.build()
+        query_name, query_json = query
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix='notion-prefetch') as executor:
+            pending = executor.submit(self._request_database, method, query, responses, url)
+            page_number = 0
+            while pending:
+                json_data = pending.result()
+                pending = None
+                page_number += 1
+                next_cursor = json_data.get('next_cursor')
+                if (json_data.get('has_more') and next_cursor):
+                    next_query = (query_name, dict(query_json, start_cursor=next_cursor))
+                    pending = executor.submit(self._request_database, method, next_query, responses, url)
+                self._logger.debug('Fetched page #{} with {} results'.format(page_number, len(json_data['results'])))
+                yield json_data
+
+    def _iter_unpublished_pages(self, responses: ResponseStore = None):
+        """
+        Json responses of unpublished query in created time order
+        With notion.fetch configured the query is split into disjoint created time windows whose cursor
+        chains are walked at the same time (under the same rate limiter), windows are yielded in order
+        as their pages arrive, at most notion.fetch.buffer pages per window are held ahead of the consumer
+        """
+        windows = self._shard_windows(responses)
+        if (len(windows) == 1):
+            yield from self._iter_database_pages(method='post', query=self._unpublished_query(responses), responses=responses)
+            return
+        self._logger.info('Fetching unpublished pages in {} created time windows: {}'.format(len(windows), windows))
+        queries = [self._unpublished_query(responses).where_timestamp('created_time', on_or_after, before) for on_or_after, before in windows]
+        buffers = [queue.Queue(maxsize=self._shard_buffer) for _ in queries]
+        stopped = threading.Event()
+        def fetch(query: NotionQuery, buffer: queue.Queue) -> None:
+            def put(item) -> bool:
+                while not stopped.is_set():
+                    try:
+                        buffer.put(item, timeout=0.1)
+                        return True
+                    except queue.Full:
+                        pass
+                return False
+            try:
+                for json_data in self._iter_database_pages('post', query, responses):
+                    if (not put(json_data)):
+                        return
+            except Exception as e:
+                put(e)
+                return
+            put(None)
+        with ThreadPoolExecutor(max_workers=len(queries), thread_name_prefix='notion-shard') as executor:
+            for query, buffer in zip(queries, buffers):
+                executor.submit(fetch, query, buffer)
+            try:
+                for buffer in buffers:
+                    json_data = buffer.get()
+                    while json_data is not None:
+                        if (isinstance(json_data, Exception)):
+                            raise json_data
+                        yield json_data
+                        json_data = buffer.get()
+            finally:
+                # abandoned or failed iteration releases windows waiting for buffer space
+                stopped.set()
+
+    def _shard_windows(self, responses: ResponseStore = None) -> list[tuple[str|None, str|None]]:
+        """
+        (on_or_after, before) created time windows, configured boundaries or found by probing
+        first and last unpublished page. Outer windows are open so pages created meanwhile are not missed.
+        """
+        if (self._shard_boundaries):
+            boundaries = sorted(str(boundary) for boundary in self._shard_boundaries)
+        elif (self._shards > 1):
+            boundaries = self._probe_boundaries(self._shards, responses)
+        else:
+            boundaries = []
+        edges = [None] + boundaries + [None]
+        return list(zip(edges, edges[1:]))
+
+    def _probe_boundaries(self, shards: int, responses: ResponseStore = None) -> list[str]:
+        """
+        Created times splitting span between first and last unpublished page into equal windows
+        """
+        first, last = (self._probe_created_time(direction, responses) for direction in ('ascending', 'descending'))
+        if (first is None or first == last):
+            return []
+        first, last = (datetime.fromisoformat(created.replace('Z', '+00:00')) for created in (first, last))
+        step = (last - first) / shards
+        return [(first + step * shard).astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.000Z') for shard in range(1, shards)]
+
+    def _probe_created_time(self, direction: str, responses: ResponseStore = None) -> str|None:
+        query = self._unpublished_query(responses, direction)
+        query.name = 'probe_created_time'
+        query.page_size = 1
+        results = self._request_database('post', query.build(), responses, self._database_query_url(query)).get('results')
+        return results[0]['created_time'] if results else None
+
+    def _stream_database_results(self, query: NotionQuery, responses: ResponseStore = None):
+        """
+        Streams query results page object by page object, following cursors
+        Response body is parsed while it is being received so memory holds a single page object,
+        not whole response. Cursor is at the end of response so next page is not prefetched.
+        responses: replayed bodies are streamed from store, received ones are teed into it
+        """
+        database_query_url = self._database_query_url(query)
+        query_name, query_json = query.build()
+        endpoint = self._endpoint(database_query_url)
+        while True:
+            key = responses.key('post', endpoint, query_json) if responses else None
+            chunks = responses.iter_chunks(key) if (responses and responses.replays) else None
+            fetch_stage = self._metrics.stage('fetch')
+            if (chunks is not None):
+                self._logger.debug('Replaying notion database [url:{}, query:{}, key:{}]'.format(database_query_url, query_name, key))
+                with fetch_stage:
+                    fetch_stage.add(pages=1)
+                results = JsonListStream(iter_decoded(fetch_stage.iterate(chunks), 'utf-8'))
+                yield from results
+            else:
+                if (responses and not responses.records):
+                    raise FileNotFoundError('No recorded response of query {} [url:{}, key:{}] in {}'.format(
+                        query_name, database_query_url, key, responses.directory))
+                self._logger.debug('Streaming notion database [url:{}, query:{}]'.format(database_query_url, query_name))
+                with fetch_stage:
+                    response = self._transport.request(
+                        method='post',
+                        url=database_query_url,
+                        json_body=query_json,
+                        headers=self._headers,
+                        rate_limiter=self._rate_limiter,
+                        stream=True)
+                    if (response.status_code != 200):
+                        raise requests.HTTPError(response.text, response=response)
+                    fetch_stage.add(pages=1)
+                with response:
+                    # receiving body counts to fetch, parsing results to their consumer
+                    chunks = fetch_stage.iterate(self._transport.iter_content(response))
+                    if (responses):
+                        chunks = responses.record(key, chunks)
+                    results = JsonListStream(iter_decoded(chunks, response.encoding or 'utf-8'))
+                    yield from results
+            next_cursor = results.metadata.get('next_cursor')
+            if (not (results.metadata.get('has_more') and next_cursor)):
+                break
+            query_json = dict(query_json, start_cursor=next_cursor)
+
+    def _endpoint(self, url: str) -> str:
+        """
+        Url without api base, recorded responses replay against any api host
+        """
+        return url[len(self._url_api):] if url.startswith(self._url_api) else url
+
+    def _session_responses(self, load_saved: bool, save_response: bool) -> ResponseStore|None:
+        """
+        load_saved replays and save_response records the session, configured store is used
+        in its own mode otherwise
+        """
+        if (not (load_saved or save_response)):
+            return self._responses
+        mode = MODE_REPLAY if load_saved else MODE_RECORD
+        if (self._responses):
+            return self._responses.with_mode(mode)
+        return ResponseStore(self._responses_directory, mode)
+
+    def iter_unpublished_articles(self, load_saved: bool = False, save_response: bool = False, stream: bool = None):
+        """
+        Generator of unpublished articles following all pages of the query
+        With article store configured store is synchronized first and articles are served from it
+        load_saved: replay recorded session, every page has to be recorded
+        save_response: record session, pages are fetched and stored
+        Without them configured notion.responses store is used in its mode (record, replay or auto)
+        stream: parse responses incrementally, defaults to notion.api.stream configuration
+        """
         self._logger.debug('Loading articles from Notion')
-        if (load_saved):
-            if (not os.path.isfile(self._notion_saved_file_path)):
-                raise FileNotFoundError('No saved notion file')
-            with open(self._notion_saved_file_path) as f:
-                json_data = json.load(f)
+        if (self._store and not load_saved):
+            self.sync_articles()
+            yield from self._store.iter_unpublished()
+            return
+        responses = self._session_responses(load_saved, save_response)
+        if (responses and responses.records):
+            responses.prune()
+        if (self._stream if stream is None else stream):
+            yield from self._parse_pages(self._stream_database_results(query=self._unpublished_query(responses), responses=responses))
         else:
-            json_data = self._request_database(method='post', query=_query_unpublished_pages, do_save=save_response)
+            for json_data in self._iter_unpublished_pages(responses):
+                yield from self._parse_pages(json_data['results'])
+        if (responses):
+            self._logger.debug('Responses {} [mode:{}, replayed:{}, missed:{}]'.format(
+                responses.directory, responses.mode, responses.hits, responses.misses))
 
-        article_list = []
-        for page in json_data['results']:
-            article_list.append(Article.from_json(page))
+    def _parse_pages(self, pages):
+        """
+        Schema is compiled on first page of the batch and reused for the rest
+        """
+        parse = None
+        for page in pages:
+            if (parse is None):
+                parse = self._metrics.timed('parse', self._schema.compile(page))
+            yield parse(page)
+
+    def sync_articles(self) -> int:
+        """
+        Fetches pages edited since store watermark and upserts them
+        First sync (no watermark) loads whole unpublished set, so does every sync reconcile_interval seconds
+        after previous full load and removes stored articles missing in it (deleted or archived in Notion)
+        Returns number of synchronized articles
+        """
+        if (not self._store):
+            raise ValueError('Article store is not configured')
+        watermark = self._store.get_watermark()
+        reconciled = self._store.get_reconciled()
+        now = time.time()
+        if (watermark and self._reconcile_interval and (reconciled is None or now - reconciled >= self._reconcile_interval)):
+            return self._reconcile_articles(now)
+        self._logger.info('Synchronizing articles edited since: {}'.format(watermark))
+        count = self._store.upsert(self.iter_edited_articles(watermark))
+        if (watermark is None):
+            self._store.set_reconciled(now)
+        self._logger.info('Synchronized {} articles'.format(count))
+        return count
+
+    def _reconcile_articles(self, now: float) -> int:
+        self._logger.info('Reconciling article store with whole unpublished set')
+        ids = []
+        def collect(articles):
+            for article in articles:
+                ids.append(article.id)
+                yield article
+        count = self._store.upsert(collect(self.iter_edited_articles()))
+        removed = self._store.retain_unpublished(ids)
+        self._store.set_reconciled(now)
+        self._logger.info('Synchronized {} articles, removed {} deleted, archived or published in Notion'.format(count, removed))
+        return count
+
+    def iter_edited_articles(self, watermark: str = None):
+        """
+        Articles of pages edited on or after watermark, published ones included
+        Without watermark whole unpublished set is loaded
+        """
+        json_pages = self._iter_database_pages(method='post', query=self._edited_query(watermark)) if watermark else self._iter_unpublished_pages()
+        for json_data in json_pages:
+            yield from self._parse_pages(json_data['results'])
+
+    def get_unpublished_articles(self, load_saved: bool = False, save_response: bool = False):
+        article_list = list(self.iter_unpublished_articles(load_saved=load_saved, save_response=save_response))
         self._logger.debug('Articles loaded')
         return article_list
 
-    def publish_articles(self, article_list: list[Article]):
+    def publish_articles(self, article_list: list[Article], workers: int = None,
+            on_result: Callable[[PublishResult], None] = None) -> PublishReport:
         """
-        Published article is a article with set "Published time" property
+        Published article is a article with set published_time property (mapped by schema, "Published time" by default)
+        Updates are sent concurrently by a bounded pool of workers sharing rate limiter
+        Failures do not stop remaining updates, check returned report instead
+        on_result: called from worker with result of every update as soon as it is done
         """
         if (len(article_list) == 0):
             self._logger.debug('No articles to publish')
-            return
-        self._logger.info('Publishing articles #{}'.format(len(article_list)))
+            return PublishReport()
+        workers = workers if workers else self._publish_workers
+        self._logger.info('Publishing articles #{} [workers:{}, rate:{}/s]'.format(len(article_list), workers, self._rate_limiter.rate))
 
         publishing_date = datetime.today()
+        # same property the unpublished filter checks, Notion resolves it by name
+        published_property = self._property_name('published_time')
         publish_json = {
             "properties" : {
-                "Published time": {
-                    "id": "n%3Cw%5D",
+                published_property: {
                     "type": "date",
                     "date": {
                         "start": publishing_date.strftime('%Y-%m-%dT%H:%M:%S') + '+0100' # tz cause f python timezones
@@ -281,13 +560,40 @@ class NotionDbClient:
             }
         }
 
-        for article in article_list:
-            update_result = self._request_page(
-                page_id=article.id,
-                method='patch',
-                query=('update_page', publish_json),
-                do_save=False)
-            self._logger.info(update_result)
-
-    # TODO update articles with published date
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='notion-publish') as executor:
+            results = list(executor.map(lambda article: self._publish_article(article, publish_json, on_result), article_list))
+        report = PublishReport(results)
+        if (self._store):
+            self._store.mark_published(
+                [result.article_id for result in report.succeeded],
+                publish_json['properties'][published_property]['date'])
+        self._logger.info(report)
+        for result in report.failed:
+            self._logger.error(result)
+        return report
+
+    def _publish_article(self, article: Article, publish_json: dict, on_result: Callable[[PublishResult], None] = None) -> PublishResult:
+        """
+        Rate limiting and retries on 429 (Retry-After) are handled by transport
+        """
+        result = self._update_article(article, publish_json)
+        if (on_result):
+            on_result(result)
+        return result
 
+    def _update_article(self, article: Article, publish_json: dict) -> PublishResult:
+        with self._metrics.stage('notion_update') as stage:
+            try:
+                update_result = self._request_page(
+                    page_id=article.id,
+                    method='patch',
+                    query=('update_page', publish_json))
+                self._logger.debug(update_result)
+                stage.add(articles=1)
+                return PublishResult(article.id, True)
+            except requests.HTTPError as e:
+                stage.add(failures=1)
+                return PublishResult(article.id, False, str(e))
+            except requests.RequestException as e:
+                stage.add(failures=1)
+                return PublishResult(article.id, False, repr(e))
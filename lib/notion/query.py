@@ -0,0 +1,103 @@
+from datetime import datetime, timedelta, timezone
+
+from .schema import (NOTION_PROPERTY_TYPE_SELECT, NOTION_PROPERTY_TYPE_MULTI_SELECT, NOTION_PROPERTY_TYPE_RICH_TEXT,
+    NOTION_PROPERTY_TYPE_TITLE, NOTION_PROPERTY_TYPE_URL)
+
+# property type -> condition of property value being one of filter values
+_VALUE_CONDITIONS = {
+    NOTION_PROPERTY_TYPE_SELECT: 'equals',
+    NOTION_PROPERTY_TYPE_MULTI_SELECT: 'contains',
+    NOTION_PROPERTY_TYPE_RICH_TEXT: 'equals',
+    NOTION_PROPERTY_TYPE_TITLE: 'equals',
+    NOTION_PROPERTY_TYPE_URL: 'equals',
+}
+
+class NotionQuery:
+    """
+    Builder of database query, conditions are and-ed into single Notion filter
+    and projected properties are sent as filter_properties url parameters
+    build returns (name, body) query tuple of NotionDbClient requests
+    """
+
+    def __init__(self, name: str, page_size: int = None):
+        self.name = name
+        self.page_size = page_size # notion maximum is 100, notion default without it
+        self.filter_properties = []
+        self._conditions = []
+        self._sorts = []
+
+    def where(self, condition: dict) -> 'NotionQuery':
+        self._conditions.append(condition)
+        return self
+
+    def where_empty(self, property_name: str, property_type: str) -> 'NotionQuery':
+        return self.where({'property': property_name, property_type: {'is_empty': True}})
+
+    def where_in(self, property_name: str, property_type: str, values: list[str]) -> 'NotionQuery':
+        """
+        Property value is one of values, multi select contains one of them
+        """
+        if (property_type not in _VALUE_CONDITIONS):
+            raise ValueError('Property {} of type {} cannot be filtered by value'.format(property_name, property_type))
+        if (not values):
+            raise ValueError('No values to filter property {} by'.format(property_name))
+        operator = _VALUE_CONDITIONS[property_type]
+        conditions = [{'property': property_name, property_type: {operator: value}} for value in values]
+        return self.where(conditions[0] if len(conditions) == 1 else {'or': conditions})
+
+    def where_timestamp(self, timestamp: str, on_or_after: str = None, before: str = None) -> 'NotionQuery':
+        """
+        timestamp: created_time|last_edited_time of the page, window bounds are ISO 8601 dates or times
+        """
+        for operator, value in (('on_or_after', on_or_after), ('before', before)):
+            if (value):
+                self.where({'timestamp': timestamp, timestamp: {operator: value}})
+        return self
+
+    def sort_by_property(self, property_name: str, direction: str = 'ascending') -> 'NotionQuery':
+        self._sorts.append({'property': property_name, 'direction': direction})
+        return self
+
+    def sort_by_timestamp(self, timestamp: str, direction: str = 'ascending') -> 'NotionQuery':
+        self._sorts.append({'timestamp': timestamp, 'direction': direction})
+        return self
+
+    def project(self, property_ids: list[str]) -> 'NotionQuery':
+        """
+        Only given properties are returned in page objects
+        property_ids: ids as returned by database object, they are already url encoded
+        """
+        self.filter_properties = list(property_ids)
+        return self
+
+    def url(self, query_url: str) -> str:
+        if (not self.filter_properties):
+            return query_url
+        return query_url + '?' + '&'.join('filter_properties=' + property_id for property_id in self.filter_properties)
+
+    def build(self) -> tuple[str, dict]:
+        body = {}
+        if (len(self._conditions) == 1):
+            body['filter'] = self._conditions[0]
+        elif (self._conditions):
+            body['filter'] = {'and': list(self._conditions)}
+        if (self._sorts):
+            body['sorts'] = list(self._sorts)
+        if (self.page_size):
+            body['page_size'] = self.page_size
+        return (self.name, body)
+
+def window_bounds(config: dict, now: datetime = None) -> tuple[str|None, str|None]:
+    """
+    (on_or_after, before) of window config: after and before dates, or days back from today
+    Relative window starts at midnight so query (and its recorded response) stays the same all day
+    """
+    if (not config):
+        return None, None
+    after = config.get('after')
+    if (config.get('days')):
+        now = now if now else datetime.now(timezone.utc)
+        after = (now - timedelta(days=config['days'])).date().isoformat()
+    before = config.get('before')
+    # yaml parses plain dates into date objects
+    return (str(after) if after else None), (str(before) if before else None)
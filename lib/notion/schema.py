@@ -0,0 +1,106 @@
+import logging
+import sys
+from operator import itemgetter
+from typing import Callable
+
+NOTION_PROPERTY_TYPE_RICH_TEXT = 'rich_text'
+NOTION_PROPERTY_TYPE_SELECT = 'select'
+NOTION_PROPERTY_TYPE_MULTI_SELECT = 'multi_select'
+NOTION_PROPERTY_TYPE_DATE = 'date'
+NOTION_PROPERTY_TYPE_CREATED_TIME = 'created_time'
+NOTION_PROPERTY_TYPE_LAST_EDITED_TIME = 'last_edited_time'
+NOTION_PROPERTY_TYPE_URL = 'url'
+NOTION_PROPERTY_TYPE_TITLE = 'title'
+
+# Article attribute -> Notion database property name
+DEFAULT_PROPERTY_MAPPING = {
+    'name': 'Name',
+    'link': 'Link',
+    'type': 'Type',
+    'source': 'Source',
+    'summary': 'Summary',
+    'credit': 'Credit',
+    'category': 'Category',
+    'tech_category': 'Technical Category',
+    'created_time': 'Created time',
+    'last_edited_time': 'Last edited time',
+    'published_time': 'Published time',
+}
+
+def intern_optional(value: str|None) -> str|None:
+    """
+    Categorical values (select names) repeat thousands of times, keep one copy of each
+    """
+    return sys.intern(value) if value else value
+
+def _extract_title(prop: dict):
+    texts = prop[NOTION_PROPERTY_TYPE_TITLE]
+    return " ".join([text['plain_text'] for text in texts]) if texts else None
+
+def _extract_rich_text(prop: dict):
+    texts = prop[NOTION_PROPERTY_TYPE_RICH_TEXT]
+    return " ".join([text['plain_text'] for text in texts]) if texts else None
+
+def _extract_select(prop: dict):
+    select = prop[NOTION_PROPERTY_TYPE_SELECT]
+    return sys.intern(select['name']) if select else None
+
+def _extract_multi_select(prop: dict):
+    selects = prop[NOTION_PROPERTY_TYPE_MULTI_SELECT]
+    return [sys.intern(select['name']) for select in selects] if selects else []
+
+_EXTRACTORS = {
+    NOTION_PROPERTY_TYPE_TITLE: _extract_title,
+    NOTION_PROPERTY_TYPE_RICH_TEXT: _extract_rich_text,
+    NOTION_PROPERTY_TYPE_SELECT: _extract_select,
+    NOTION_PROPERTY_TYPE_MULTI_SELECT: _extract_multi_select,
+}
+
+class ArticleSchema:
+    """
+    Maps Notion database properties onto article attributes
+    compile inspects property types of a sample page once and returns parser
+    calling only extractors of mapped properties, remaining properties are skipped
+    Attributes of properties missing in database are left to factory defaults
+    """
+    _logger = logging.getLogger(__name__ + '.ArticleSchema')
+
+    def __init__(self, factory: Callable[[str, str], object], mapping: dict[str, str] = None):
+        """
+        factory: creates article from page id and object type
+        mapping: article attribute -> notion property name, defaults to DEFAULT_PROPERTY_MAPPING
+            attributes left out of mapping are not parsed at all
+        """
+        self._factory = factory
+        self._mapping = dict(mapping if mapping else DEFAULT_PROPERTY_MAPPING)
+
+    @property
+    def property_names(self) -> list[str]:
+        return list(self._mapping.values())
+
+    def property_name(self, attribute: str) -> str|None:
+        return self._mapping.get(attribute)
+
+    def compile(self, sample_page: dict) -> Callable[[dict], object]:
+        """
+        Property types are fixed per database so one page is enough to pick extractors
+        """
+        sample_properties = sample_page['properties']
+        extractors = []
+        for attribute, property_name in self._mapping.items():
+            prop = sample_properties.get(property_name)
+            if (prop is None):
+                self._logger.warning('Property {} mapped to {} is missing in database'.format(property_name, attribute))
+                continue
+            property_type = prop['type']
+            extractors.append((attribute, property_name, _EXTRACTORS.get(property_type) or itemgetter(property_type)))
+        extractors = tuple(extractors)
+        factory = self._factory
+
+        def parse(page: dict):
+            article = factory(page['id'], page['object'])
+            properties = page['properties']
+            for attribute, property_name, extract in extractors:
+                setattr(article, attribute, extract(properties[property_name]))
+            return article
+        return parse
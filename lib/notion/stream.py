@@ -0,0 +1,109 @@
+import codecs
+import json
+from typing import Iterable, Iterator
+
+_WHITESPACE = ' \t\n\r'
+_DELIMITERS = ',:]}' + _WHITESPACE
+
+class JsonListStream:
+    """
+    Incremental parser of a json object holding one big list, like Notion query response:
+    { "object": "list", "results": [<page obj>,...], "next_cursor": "<id>", "has_more": true }
+
+    Iterating yields list items one by one while text chunks are being read,
+    so only a single item and a chunk are kept in memory.
+    Remaining members land in metadata, complete once iteration finishes.
+    """
+
+    def __init__(self, chunks: Iterable[str], list_key: str = 'results'):
+        self._chunks = iter(chunks)
+        self._list_key = list_key
+        self._decoder = json.JSONDecoder()
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+        self.metadata = {}
+
+    def __iter__(self) -> Iterator:
+        self._expect('{')
+        while True:
+            char = self._peek()
+            if (char == '}'):
+                self._pos += 1
+                # read trailing whitespace to the end, so chunk source (e.g. response recording) completes
+                while (self._load_more()):
+                    pass
+                return
+            if (char == ','):
+                self._pos += 1
+                continue
+            key = self._decode_value()
+            self._expect(':')
+            if (key == self._list_key):
+                self._expect('[')
+                while True:
+                    char = self._peek()
+                    if (char == ']'):
+                        self._pos += 1
+                        break
+                    if (char == ','):
+                        self._pos += 1
+                        continue
+                    yield self._decode_value()
+            else:
+                self.metadata[key] = self._decode_value()
+
+    def _load_more(self) -> bool:
+        if (self._eof):
+            return False
+        for chunk in self._chunks:
+            if (chunk):
+                # drop consumed part so buffer stays around one item in size
+                self._buffer = self._buffer[self._pos:] + chunk
+                self._pos = 0
+                return True
+        self._eof = True
+        return False
+
+    def _peek(self) -> str:
+        while True:
+            while (self._pos < len(self._buffer) and self._buffer[self._pos] in _WHITESPACE):
+                self._pos += 1
+            if (self._pos < len(self._buffer)):
+                return self._buffer[self._pos]
+            if (not self._load_more()):
+                raise ValueError('Unexpected end of json stream')
+
+    def _expect(self, char: str) -> None:
+        found = self._peek()
+        if (found != char):
+            raise ValueError('Expected {} but found {} in json stream'.format(char, found))
+        self._pos += 1
+
+    def _decode_value(self):
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+                # number cut by chunk boundary (12|34, 1|.5) parses fine, so value has to be followed by delimiter
+                if (self._eof or (end < len(self._buffer) and self._buffer[end] in _DELIMITERS)):
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError:
+                if (self._eof):
+                    raise
+            # at the end of stream last decode attempt either returns or raises
+            self._load_more()
+
+def iter_decoded(chunks: Iterable[bytes], encoding: str = 'utf-8') -> Iterator[str]:
+    """
+    Decodes byte chunks into text, multi byte characters may span chunks
+    """
+    decoder = codecs.getincrementaldecoder(encoding)()
+    for chunk in chunks:
+        text = decoder.decode(chunk)
+        if (text):
+            yield text
+    text = decoder.decode(b'', final=True)
+    if (text):
+        yield text
@@ -0,0 +1,207 @@
+import logging
+import threading
+import time
+from typing import Callable
+
+from .metrics import Metrics, NULL_METRICS
+
+class ChannelResult:
+    """
+    Outcome of publishing to a single channel
+    value: whatever publisher returned, e.g. created page or post id
+    """
+    channel: str
+    success: bool
+    value: object
+    error: str|None
+    attempts: int
+    duration: float
+    required: bool
+
+    def __init__(self, channel: str, success: bool, value: object = None, error: str = None,
+            attempts: int = 0, duration: float = 0.0, required: bool = True):
+        self.channel = channel
+        self.success = success
+        self.value = value
+        self.error = error
+        self.attempts = attempts
+        self.duration = duration
+        self.required = required
+
+    def __str__(self):
+        return "ChannelResult [channel:{}, success:{}, value:{}, error:{}, attempts:{}, duration:{:.2f}s, required:{}]".format(
+            self.channel, self.success, self.value, self.error, self.attempts, self.duration, self.required)
+
+class PublishChannel:
+    """
+    Single publishing channel with its own timeout and retry policy
+    publish: callable without arguments, returns published object id and raises on failure
+    timeout: seconds for each attempt
+    retries: additional attempts after failure, keep 0 for non idempotent channels
+    required: failure of required channel blocks marking Notion articles as published
+    on_attempt: called by dispatcher with (success, value, error) of every attempt finished within timeout,
+        outcome of abandoned attempt is never reported
+    """
+
+    def __init__(self, name: str, publish: Callable[[], object], timeout: float = 120.0, retries: int = 0,
+            backoff: float = 1.0, required: bool = True, on_attempt: Callable[[bool, object, str|None], None] = None):
+        self.name = name
+        self.publish = publish
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.required = required
+        self.on_attempt = on_attempt
+
+    @staticmethod
+    def from_config(name: str, publish: Callable[[], object], config: dict = None,
+            on_attempt: Callable[[bool, object, str|None], None] = None) -> 'PublishChannel':
+        config = config or {}
+        return PublishChannel(
+            name,
+            publish,
+            timeout=config.get('timeout', 120.0),
+            retries=config.get('retries', 0),
+            backoff=config.get('backoff', 1.0),
+            required=config.get('required', True),
+            on_attempt=on_attempt)
+
+class DispatchReport:
+    """
+    Per channel results of dispatch
+    """
+
+    def __init__(self, results: dict[str, ChannelResult]):
+        self.results = results
+
+    @property
+    def required_succeeded(self) -> bool:
+        return all(result.success for result in self.results.values() if result.required)
+
+    @property
+    def failed(self) -> list[ChannelResult]:
+        return [result for result in self.results.values() if not result.success]
+
+    def __str__(self):
+        return "DispatchReport [channels:{}, failed:{}, required_succeeded:{}]".format(
+            len(self.results), [result.channel for result in self.failed], self.required_succeeded)
+
+class IssueReport:
+    """
+    Outcome of single issue of a digest
+    dispatch: channel results, None when no channel had to be published (e.g. resumed issue)
+    marked: all articles of the issue are marked as published in Notion
+    error: exception that stopped the issue
+    """
+
+    def __init__(self, digest: str = None, issue: str = None, articles: int = 0, dispatch: DispatchReport = None,
+            marked: bool = False, completed: bool = False, duration: float = 0.0, error: str = None):
+        self.digest = digest
+        self.issue = issue
+        self.articles = articles
+        self.dispatch = dispatch
+        self.marked = marked
+        self.completed = completed
+        self.duration = duration
+        self.error = error
+
+    def as_dict(self) -> dict:
+        channels = {}
+        for result in (self.dispatch.results.values() if self.dispatch else ()):
+            channels[result.channel] = {
+                'success': result.success,
+                'value': result.value,
+                'error': result.error,
+                'attempts': result.attempts,
+                'duration': round(result.duration, 6),
+            }
+        return {
+            'digest': self.digest,
+            'issue': self.issue,
+            'articles': self.articles,
+            'channels': channels,
+            'marked': self.marked,
+            'completed': self.completed,
+            'duration': round(self.duration, 6),
+            'error': self.error,
+        }
+
+    def __str__(self):
+        return "IssueReport [digest:{}, issue:{}, articles:{}, failed_channels:{}, marked:{}, completed:{}, duration:{:.2f}s, error:{}]".format(
+            self.digest, self.issue, self.articles, [result.channel for result in self.dispatch.failed] if self.dispatch else [],
+            self.marked, self.completed, self.duration, self.error)
+
+class PublishDispatcher:
+    """
+    Publishes to all channels at the same time so total time is the slowest channel, not a sum of them
+    Every channel runs in its own daemon thread, an attempt exceeding timeout is abandoned
+    (daemon thread does not block process exit) and counted as failure. Abandoned attempt may still
+    publish, so it is not retried and its late outcome is dropped.
+    """
+    _logger = logging.getLogger(__name__ + '.PublishDispatcher')
+
+    def __init__(self, metrics: Metrics = None):
+        self._metrics = metrics if metrics else NULL_METRICS
+
+    def dispatch(self, channels: list[PublishChannel]) -> DispatchReport:
+        results = {}
+        threads = []
+
+        def run(channel: PublishChannel):
+            results[channel.name] = self._run_channel(channel)
+
+        for channel in channels:
+            thread = threading.Thread(target=run, args=(channel,), name='publish-' + channel.name, daemon=True)
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            thread.join()
+        report = DispatchReport({channel.name: results[channel.name] for channel in channels})
+        for result in report.results.values():
+            if (result.success):
+                self._logger.info(result)
+            else:
+                self._logger.error(result)
+        return report
+
+    def _run_channel(self, channel: PublishChannel) -> ChannelResult:
+        start = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            finished, success, value, error = self._attempt(channel)
+            if (finished and channel.on_attempt):
+                try:
+                    channel.on_attempt(success, value, error)
+                except Exception as e:
+                    self._logger.error('Recording attempt of {} failed: {}'.format(channel.name, repr(e)))
+            if (not finished):
+                error += ', attempt is still running and may publish, not retried'
+            if (success or not finished or attempt > channel.retries):
+                return ChannelResult(channel.name, success, value, error, attempt, time.monotonic() - start, channel.required)
+            delay = channel.backoff * (2 ** (attempt - 1))
+            self._logger.warning('Publishing to {} failed ({}), retrying in {:.2f}s'.format(channel.name, error, delay))
+            time.sleep(delay)
+
+    def _attempt(self, channel: PublishChannel) -> tuple[bool, bool, object, str|None]:
+        """
+        (finished, success, value, error), outcome of attempt exceeding timeout is not read
+        """
+        outcome = {}
+
+        def run():
+            with self._metrics.stage('publish', channel=channel.name) as stage:
+                try:
+                    outcome['value'] = channel.publish()
+                except Exception as e:
+                    outcome['error'] = repr(e)
+                    stage.add(failures=1)
+
+        worker = threading.Thread(target=run, name='publish-{}-attempt'.format(channel.name), daemon=True)
+        worker.start()
+        worker.join(channel.timeout)
+        if (worker.is_alive()):
+            return (False, False, None, 'Timed out after {}s'.format(channel.timeout))
+        if ('error' in outcome):
+            return (True, False, None, outcome['error'])
+        return (True, True, outcome.get('value'), None)
@@ -0,0 +1,40 @@
+import importlib
+from typing import Callable
+
+from ..formats import FORMAT_MARKDOWN, FORMAT_HTML
+
+class PublisherSpec:
+    """
+    Publishing channel selected by command line flag
+    Module is imported only when channel is selected, so clients of unused channels
+    (atlassian for Confluence) are never loaded. It has to provide
+    publish(config, title, content, transport) returning published object id.
+    format: digest format channel publishes
+    marks_published: successful publish lets articles be marked as published in Notion
+    """
+
+    def __init__(self, name: str, flags: tuple[str, ...], help: str, format: str, module: str, marks_published: bool = True):
+        self.name = name
+        self.flags = flags
+        self.help = help
+        self.format = format
+        self.module = module
+        self.marks_published = marks_published
+
+    def load(self) -> Callable:
+        return importlib.import_module(self.module).publish
+
+# flag destination -> publisher, in order of command line options
+PUBLISHERS = {
+    'confluence': PublisherSpec('confluence', ('-c', '--confluence'), 'Publish to confluence', FORMAT_HTML, __name__ + '.confluence'),
+    'msteams': PublisherSpec('msteams', ('-t', '--msteams'), 'publish to Microsoft Teams', FORMAT_MARKDOWN, __name__ + '.msteams',
+        marks_published=False),
+    'medium': PublisherSpec('medium', ('-e', '--medium'), 'publish to Medium', FORMAT_MARKDOWN, __name__ + '.medium'),
+}
+
+def add_publisher_arguments(parser) -> None:
+    for name, spec in PUBLISHERS.items():
+        parser.add_argument(*spec.flags, dest=name, action="store_true", help=spec.help)
+
+def selected_publishers(args) -> list[PublisherSpec]:
+    return [spec for name, spec in PUBLISHERS.items() if getattr(args, name, False)]
@@ -0,0 +1,161 @@
+import html
+import logging
+import re
+
+import requests
+from atlassian import Confluence
+
+from ..journal import content_hash
+from ..transport import HttpTransport
+
+_logger = logging.getLogger(__name__)
+
+# chapter heading written by HtmlDigestRenderer
+_CHAPTER_HEADING = re.compile(r'<h2>\[\[ (?P<category>.+?) \]\]</h2>')
+# content property with hashes of published content, compared by next update
+_HASHES_PROPERTY = 'newspublisher'
+
+def split_chapters(content: str) -> tuple[str, list[tuple[str, str]], str]:
+    """
+    Digest html split into head (toc, title, preface), (category, chapter html) pairs and tail
+    """
+    headings = list(_CHAPTER_HEADING.finditer(content))
+    if (not headings):
+        return content, [], ''
+    chapters = []
+    for heading, next_heading in zip(headings, headings[1:] + [None]):
+        chapters.append((heading['category'], content[heading.start():next_heading.start() if next_heading else None]))
+    category, last = chapters[-1]
+    end = last.rfind('</ol>')
+    tail = ''
+    if (end >= 0):
+        end += len('</ol>')
+        last, tail = last[:end], last[end:]
+        chapters[-1] = (category, last)
+    return content[:headings[0].start()], chapters, tail
+
+class ConfluencePage:
+    """
+    Blogpost or page to publish with hash of its body, so update can tell whether it changed
+    """
+
+    def __init__(self, title: str, type: str, body: str):
+        self.title = title
+        self.type = type
+        self.body = body
+        self.hash = content_hash(body)
+
+    def data(self, space: str, parent_id: str = None) -> dict:
+        data = {
+            'type': self.type,
+            'title': self.title,
+            'status': 'current',
+            'space': {'key': space},
+            'body': {'storage': {'value': self.body, 'representation': 'storage'}},
+            'metadata': {'properties': {
+                'content-appearance-draft': {'value': 'fixed-width'},
+                'content-appearance-published': {'value': 'fixed-width'},
+            }},
+        }
+        if (parent_id):
+            data['ancestors'] = [{'type': 'page', 'id': parent_id}]
+        return data
+
+    def hashes(self) -> dict:
+        return {'hash': self.hash}
+
+def layout_pages(title: str, content: str, max_size: int = None) -> list[ConfluencePage]:
+    """
+    Blogpost of the issue first, digest bigger than max_size characters is split into blogpost
+    with chapter index and a page per chapter, so changed chapter updates only its own page
+    """
+    head, chapters, tail = split_chapters(content)
+    if (not max_size or len(content) <= max_size or not chapters):
+        return [ConfluencePage(title, 'blogpost', content)]
+    parts = [ConfluencePage('{} - {}'.format(title, category), 'page', chapter) for category, chapter in chapters]
+    index = ''.join('<h2>[[ {} ]]</h2><p><ac:link><ri:page ri:content-title="{}" /></ac:link></p>'.format(
+        category, html.escape(part.title)) for (category, _), part in zip(chapters, parts))
+    return [ConfluencePage(title, 'blogpost', head + index + tail)] + parts
+
+def publish(config: dict, title: str, content: str, transport: HttpTransport) -> str:
+    _logger.info('Publishing to Confluence')
+    confluence_url = config['confluence']['url']
+    blog_config = config['confluence']['blog']
+    # atlassian backoff_and_retry would mount its own adapter over the pooled one,
+    # throttled and unavailable responses are retried by transport session instead
+    confluence = Confluence(
+        url=confluence_url,
+        token=config['confluence']['auth']['token'],
+        session=transport.session(confluence_url, retry_statuses=(413, 429, 503)),
+        timeout=int(transport.timeout[1])) # atlassian accepts single read timeout
+    blogpost, *parts = layout_pages(title, content, blog_config.get('max_size'))
+    space = blog_config['space']
+    update = blog_config.get('update', False)
+    # chapter pages go first so links of blogpost index resolve
+    for part in parts:
+        _publish_page(confluence, space, part, update, blog_config.get('parent'))
+    page_id = _publish_page(confluence, space, blogpost, update)
+    _logger.info('Confluence published article: id:' + page_id)
+    return page_id
+
+def _publish_page(confluence: Confluence, space: str, page: ConfluencePage, update: bool, parent_id: str = None) -> str:
+    existing = _find_page(confluence, space, page) if update else None
+    if (existing is None):
+        response = confluence.post('rest/api/content/', data=page.data(space, parent_id))
+        if type(response) is not dict:
+            raise ValueError('Communication with Confluence somewhat failed and response isnt a json.\nResponse:' + repr(response))
+        _logger.info('Created {} {} [id:{}, size:{}]'.format(page.type, page.title, response['id'], len(page.body)))
+        if (update):
+            _store_hashes(confluence, response['id'], page, None)
+        return response['id']
+    property = _get_hashes_property(confluence, existing['id'])
+    stored = _stored_hashes(existing, property)
+    if (stored.get('hash') == page.hash):
+        _logger.info('{} {} is up to date [id:{}]'.format(page.type, page.title, existing['id']))
+        return existing['id']
+    # storage format has no partial update, whole body of this page is sent,
+    # with split layout only pages of changed chapters get here
+    data = page.data(space, parent_id)
+    data['id'] = existing['id']
+    data['version'] = {'number': existing['version']['number'] + 1, 'minorEdit': True}
+    response = confluence.put('rest/api/content/{}'.format(existing['id']), data=data)
+    if type(response) is not dict:
+        raise ValueError('Communication with Confluence somewhat failed and response isnt a json.\nResponse:' + repr(response))
+    _logger.info('Updated {} {} [id:{}, size:{}]'.format(page.type, page.title, existing['id'], len(page.body)))
+    _store_hashes(confluence, existing['id'], page, property)
+    return existing['id']
+
+def _find_page(confluence: Confluence, space: str, page: ConfluencePage) -> dict|None:
+    # issue title carries issue number, so blogpost of the issue is found whatever day it was posted
+    response = confluence.get('rest/api/content', params={
+        'spaceKey': space, 'title': page.title, 'type': page.type, 'expand': 'version,body.storage'})
+    results = (response or {}).get('results') or []
+    return results[0] if results else None
+
+def _get_hashes_property(confluence: Confluence, content_id: str) -> dict|None:
+    try:
+        response = confluence.get('rest/api/content/{}/property/{}'.format(content_id, _HASHES_PROPERTY))
+    except requests.HTTPError as e:
+        if (e.response is not None and e.response.status_code == 404):
+            return None
+        raise
+    return response if type(response) is dict else None
+
+def _store_hashes(confluence: Confluence, content_id: str, page: ConfluencePage, property: dict|None) -> None:
+    """
+    Hashes are kept in content property, created on first update and versioned afterwards
+    """
+    if (property is None):
+        confluence.post('rest/api/content/{}/property'.format(content_id), data={'key': _HASHES_PROPERTY, 'value': page.hashes()})
+        return
+    confluence.put('rest/api/content/{}/property/{}'.format(content_id, _HASHES_PROPERTY), data={
+        'key': _HASHES_PROPERTY, 'value': page.hashes(), 'version': {'number': property['version']['number'] + 1}})
+
+def _stored_hashes(existing: dict, property: dict|None) -> dict:
+    # hashes published with the page, computed from stored body for pages published without them
+    if (property and property.get('value')):
+        return property['value']
+    body = ((existing.get('body') or {}).get('storage') or {}).get('value')
+    if (body is None):
+        return {}
+    return {'hash': content_hash(body)}
@@ -0,0 +1,15 @@
+import logging
+
+from ..medium import MediumBlog
+from ..transport import HttpTransport
+
+_logger = logging.getLogger(__name__)
+
+def publish(config: dict, title: str, content: str, transport: HttpTransport) -> str:
+    _logger.info('Publishing to medium')
+    medium = MediumBlog(config=config['medium'], transport=transport)
+    response = medium.post(title=title, content=content)
+    _logger.debug('Medium response[http_code:{}]:\n{}'.format(response.status_code, response.text))
+    response.raise_for_status()
+    _logger.info('Mediums publish is successful')
+    return response.json().get('data', {}).get('id')
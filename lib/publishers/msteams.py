@@ -0,0 +1,11 @@
+import logging
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from ..transport import HttpTransport
+
+_logger = logging.getLogger(__name__)
+
+def publish(config: dict, title: str, content: str, transport: 'HttpTransport'):
+    _logger.info('Publishing to MsTeams')
+    # do msteams stuff
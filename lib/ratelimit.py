@@ -0,0 +1,58 @@
+import logging
+import threading
+import time
+
+class TokenBucket:
+    """
+    Thread safe token bucket rate limiter
+    rate: tokens refilled per second
+    capacity: maximum burst, defaults to rate
+    Use acquire before each request and pause when server asks to slow down (Retry-After)
+    """
+    _logger = logging.getLogger(__name__ + '.TokenBucket')
+
+    def __init__(self, rate: float, capacity: float = None):
+        if (rate <= 0):
+            raise ValueError('Rate has to be positive but was ' + str(rate))
+        self._rate = float(rate)
+        self._capacity = float(capacity if capacity else max(rate, 1))
+        self._tokens = self._capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self) -> float:
+        return self._rate
+
+    def acquire(self, tokens: float = 1) -> float:
+        """
+        Blocks until tokens are available
+        Returns time spent waiting in seconds
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if (now < self._paused_until):
+                    delay = self._paused_until - now
+                else:
+                    self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._rate)
+                    self._updated = now
+                    if (self._tokens >= tokens):
+                        self._tokens -= tokens
+                        return waited
+                    delay = (tokens - self._tokens) / self._rate
+            time.sleep(delay)
+            waited += delay
+
+    def pause(self, seconds: float) -> None:
+        """
+        Stops handing out tokens for given seconds, drains the bucket
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._paused_until = max(self._paused_until, now + seconds)
+            self._tokens = 0.0
+            self._updated = self._paused_until
+        self._logger.debug('Rate limiter paused for {:.2f}s'.format(seconds))
@@ -0,0 +1,203 @@
+import json
+import logging
+import mmap
+import os
+import tempfile
+import time
+import zlib
+from typing import Iterable, Iterator
+
+from .fragment_cache import content_key
+
+MODE_RECORD = 'record'   # every response is fetched and stored
+MODE_REPLAY = 'replay'   # responses are served from store only, missing or expired one is an error
+MODE_AUTO = 'auto'       # stored response is served while fresh, otherwise fetched and stored
+MODES = (MODE_RECORD, MODE_REPLAY, MODE_AUTO)
+
+class _Identity:
+    """
+    Pass-through codec of uncompressed entries, same interface as zlib (de)compress objects
+    """
+
+    def compress(self, data: bytes) -> bytes:
+        return bytes(data)
+
+    def decompress(self, data: bytes) -> bytes:
+        return bytes(data)
+
+    def flush(self) -> bytes:
+        return b''
+
+def _zstd():
+    import zstandard
+    return zstandard
+
+# compression -> (file extension, compress object factory, decompress object factory)
+_CODECS = {
+    'zstd': ('.zst', lambda: _zstd().ZstdCompressor(level=10).compressobj(), lambda: _zstd().ZstdDecompressor().decompressobj()),
+    'gzip': ('.gz', lambda: zlib.compressobj(6, zlib.DEFLATED, 31), lambda: zlib.decompressobj(31)),
+    'none': ('', _Identity, _Identity),
+}
+
+class ResponseStore:
+    """
+    Content addressed store of api responses for recording sessions and replaying them offline
+    Entry key is a hash of method, endpoint (url path without api host) and canonical json body,
+    so every page of cursor paginated query (start_cursor is in body) is its own entry and replay
+    follows cursors exactly as recorded session did. Entries are compressed files written atomically,
+    file modification time is the recording time checked against ttl. Reads memory map the file
+    and decompress it in chunks.
+    compression: zstd (requires zstandard package, falls back to gzip), gzip or none
+    ttl: seconds entry is fresh, None never expires
+    """
+    _logger = logging.getLogger(__name__ + '.ResponseStore')
+
+    _chunk_size = 64 * 1024
+    _zstd_missing_logged = False
+
+    def __init__(self, directory: str, mode: str = MODE_RECORD, ttl: float = None, compression: str = 'zstd'):
+        if (mode not in MODES):
+            raise ValueError('Unknown response store mode: {}, expected one of {}'.format(mode, MODES))
+        if (compression not in _CODECS):
+            raise ValueError('Unknown response store compression: {}, expected one of {}'.format(compression, tuple(_CODECS)))
+        if (compression == 'zstd'):
+            try:
+                _zstd()
+            except ImportError:
+                if (not ResponseStore._zstd_missing_logged):
+                    self._logger.warning('zstandard package is not installed, responses are compressed with gzip')
+                    ResponseStore._zstd_missing_logged = True
+                compression = 'gzip'
+        self.directory = directory
+        self.mode = mode
+        self.ttl = ttl
+        self.compression = compression
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def from_config(config: dict, mode: str = None) -> 'ResponseStore|None':
+        """
+        config: responses section, store is not used without directory
+        mode: overrides configured mode
+        """
+        if (not config or not config.get('directory')):
+            return None
+        return ResponseStore(config['directory'], mode or config.get('mode', MODE_RECORD),
+            config.get('ttl'), config.get('compression', 'zstd'))
+
+    def with_mode(self, mode: str) -> 'ResponseStore':
+        return ResponseStore(self.directory, mode, self.ttl, self.compression)
+
+    @staticmethod
+    def key(method: str, endpoint: str, body: dict = None) -> str:
+        canonical_body = json.dumps(body, sort_keys=True, separators=(',', ':')) if body is not None else None
+        return content_key((method.upper(), endpoint, canonical_body))
+
+    @property
+    def replays(self) -> bool:
+        return self.mode != MODE_RECORD
+
+    @property
+    def records(self) -> bool:
+        return self.mode != MODE_REPLAY
+
+    def get(self, key: str) -> bytes|None:
+        """
+        Whole response body or None when entry is missing or expired
+        """
+        chunks = self.iter_chunks(key)
+        return None if chunks is None else b''.join(chunks)
+
+    def iter_chunks(self, key: str) -> Iterator[bytes]|None:
+        """
+        Decompressed body chunks of fresh entry, None when entry is missing or expired
+        """
+        found = self._find(key)
+        if (found is None):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return self._read(*found)
+
+    def put(self, key: str, body: bytes) -> None:
+        for _ in self.record(key, (body,)):
+            pass
+
+    def record(self, key: str, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        """
+        Passes chunks through while writing them to entry, entry is stored only
+        when chunks are exhausted so interrupted response never replaces recorded one
+        """
+        extension, compressor_factory, _ = _CODECS[self.compression]
+        path = self._path(key, extension)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # unique temp file per writer, threads and processes recording the same key do not collide
+        # and the last one to finish replaces the entry
+        descriptor, temp_path = tempfile.mkstemp(prefix=os.path.basename(path) + '.', suffix='.tmp', dir=os.path.dirname(path))
+        compressor = compressor_factory()
+        try:
+            with os.fdopen(descriptor, 'wb') as f:
+                for chunk in chunks:
+                    f.write(compressor.compress(chunk))
+                    yield chunk
+                f.write(compressor.flush())
+            for other_extension, _, _ in _CODECS.values():
+                if (other_extension != extension):
+                    try:
+                        os.remove(self._path(key, other_extension))
+                    except FileNotFoundError:
+                        pass
+            os.replace(temp_path, path)
+        finally:
+            if (os.path.exists(temp_path)):
+                os.remove(temp_path)
+
+    def prune(self) -> int:
+        """
+        Removes expired entries, returns number of removed files
+        """
+        if (self.ttl is None or not os.path.isdir(self.directory)):
+            return 0
+        oldest = time.time() - self.ttl
+        removed = 0
+        for entry in os.scandir(self.directory):
+            if (not entry.is_dir()):
+                continue
+            for file in os.scandir(entry.path):
+                if (file.stat().st_mtime < oldest):
+                    os.remove(file.path)
+                    removed += 1
+        if (removed):
+            self._logger.debug('Pruned {} expired responses from {}'.format(removed, self.directory))
+        return removed
+
+    def _path(self, key: str, extension: str) -> str:
+        return os.path.join(self.directory, key[:2], key + '.json' + extension)
+
+    def _find(self, key: str) -> tuple[str, str]|None:
+        # entry may have been recorded with other compression than current one
+        for compression, (extension, _, _) in _CODECS.items():
+            path = self._path(key, extension)
+            try:
+                modified = os.stat(path).st_mtime
+            except FileNotFoundError:
+                continue
+            if (self.ttl is None or time.time() - modified <= self.ttl):
+                return path, compression
+            self._logger.debug('Response {} expired'.format(key))
+        return None
+
+    def _read(self, path: str, compression: str) -> Iterator[bytes]:
+        decompressor = _CODECS[compression][2]()
+        with open(path, 'rb') as f:
+            if (os.fstat(f.fileno()).st_size == 0):
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                for start in range(0, len(mapped), self._chunk_size):
+                    chunk = decompressor.decompress(mapped[start:start + self._chunk_size])
+                    if (chunk):
+                        yield chunk
+                chunk = decompressor.flush()
+                if (chunk):
+                    yield chunk
@@ -1,69 +1,307 @@
 import logging
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import TextIO
 
+from .digest import Digest, DigestChapter, DigestRow, ARTICLE_CATEGORIES
+from .formats import FORMAT_MARKDOWN, FORMAT_HTML
+from .fragment_cache import FragmentCache, content_key
 from .markdown import MarkdownCreator
-from .html import HtmlCreator
-from .notion import Article
+from .html import HtmlCreator, HtmlTemplate
+from .links import LinkInfo
+from .metrics import Metrics, NULL_METRICS
+from .notion import Article, ArticleBatch
+
+class _DigestRenderer:
+    """
+    Common rendering flow of digest renderers with optional fragment cache
+    Rows are cached by article id and last_edited_time, chapters and whole digests by hash of their
+    article versions, so unchanged parts of a digest are not rendered again.
+    Bump version whenever renderer output changes to stop reusing cached fragments.
+    """
+    format: str = None
+    version: int = 1
+
+    def __init__(self, cache: FragmentCache = None):
+        self._cache = cache
+
+    def render(self, digest: Digest) -> str:
+        chapter_keys = self._chapter_keys(digest)
+        key = self._digest_key(digest, chapter_keys)
+        if (key):
+            content = self._cache.get(key)
+            if (content is not None):
+                return content
+        creator = self._creator()
+        self._render(digest, creator, chapter_keys)
+        content = creator.get_content()
+        if (key):
+            self._cache.put(key, content)
+        return content
+
+    def write(self, digest: Digest, output: TextIO) -> None:
+        """
+        Renders straight into text file-like output without building whole string
+        Cached digest is reused but not stored, chapters are
+        """
+        chapter_keys = self._chapter_keys(digest)
+        key = self._digest_key(digest, chapter_keys)
+        content = self._cache.get(key) if key else None
+        if (content is not None):
+            output.write(content)
+            return
+        creator = self._creator(writer=output)
+        self._render(digest, creator, chapter_keys)
+        creator.flush()
+
+    def _creator(self, writer: TextIO = None):
+        raise NotImplementedError()
+
+    def _render(self, digest: Digest, creator, chapter_keys: list[str|None]) -> None:
+        raise NotImplementedError()
+
+    def _write_chapter(self, chapter: DigestChapter, creator, render_row) -> None:
+        raise NotImplementedError()
+
+    def _render_row(self, row: DigestRow) -> str:
+        raise NotImplementedError()
+
+    @staticmethod
+    def _dead_link(row: DigestRow) -> str|None:
+        """
+        Flag of enriched link which did not answer or answered with error status
+        """
+        if (not row.link_info or not row.link_info.dead):
+            return None
+        return 'dead link: {}'.format(row.link_info.status if row.link_info.status else 'unreachable')
+
+    def _add_chapters(self, digest: Digest, creator, chapter_keys: list[str|None]) -> None:
+        render_row = self._cached_row if self._cache else self._render_row
+        for chapter, key in zip(digest.chapters, chapter_keys):
+            content = self._cache.get(key) if key else None
+            if (content is not None):
+                creator.insert(content)
+            elif (key):
+                chapter_creator = self._creator()
+                self._write_chapter(chapter, chapter_creator, render_row)
+                content = chapter_creator.get_content()
+                self._cache.put(key, content)
+                creator.insert(content)
+            else:
+                self._write_chapter(chapter, creator, render_row)
+
+    def _cached_row(self, row: DigestRow) -> str:
+        if (not row.id or not row.last_edited_time):
+            return self._render_row(row)
+        parts = (self.format, self.version, 'row', row.id, row.last_edited_time)
+        key = content_key(parts + (row.link_info.key,) if row.link_info else parts)
+        content = self._cache.get(key)
+        if (content is None):
+            content = self._render_row(row)
+            self._cache.put(key, content)
+        return content
+
+    def _chapter_keys(self, digest: Digest) -> list[str|None]:
+        """
+        Chapter with any article lacking id or last_edited_time has no key and is always rendered
+        """
+        if (not self._cache):
+            return [None] * len(digest.chapters)
+        keys = []
+        for chapter in digest.chapters:
+            parts = [self.format, self.version, 'chapter', chapter.category]
+            for id, last_edited_time, link_key in chapter.versions:
+                if (not id or not last_edited_time):
+                    parts = None
+                    break
+                parts.append(id)
+                parts.append(last_edited_time)
+                # keys of digests without enriched links stay as they were
+                if (link_key):
+                    parts.append(link_key)
+            keys.append(content_key(parts) if parts else None)
+        return keys
+
+    def _digest_key(self, digest: Digest, chapter_keys: list[str|None]) -> str|None:
+        if (not self._cache or not all(chapter_keys)):
+            return None
+        return content_key([self.format, self.version, 'digest', digest.title, digest.preface] + chapter_keys)
+
+class MarkdownDigestRenderer(_DigestRenderer):
+    """
+    Renders digest model into markdown
+    """
+    format = FORMAT_MARKDOWN
+
+    def _creator(self, writer: TextIO = None) -> MarkdownCreator:
+        return MarkdownCreator(writer=writer)
+
+    def _render(self, digest: Digest, markdown: MarkdownCreator, chapter_keys: list[str|None]) -> None:
+        if (digest.title):
+            markdown.create_header(digest.title, 1)
+        for line in digest.preface_lines:
+            markdown.insert_line(line)
+        self._add_chapters(digest, markdown, chapter_keys)
+
+    def _write_chapter(self, chapter: DigestChapter, markdown: MarkdownCreator, render_row) -> None:
+        markdown.create_header("\\[\\[ %s ]]" % chapter.category, 2)
+        for row in chapter.rows:
+            markdown.insert(render_row(row))
+
+    def _render_row(self, row: DigestRow) -> str:
+        markdown = MarkdownCreator().push_list()
+        link_info = row.link_info
+        link = markdown.create_link(row.name or (link_info and link_info.title) or row.link, row.link)
+        dead_link = self._dead_link(row)
+        markdown.insert_list_item(link + markdown.bold('\\[{}]'.format(dead_link)) if dead_link else link)
+        markdown.insert_line('\\[{}] Source: {}'.format(row.type, row.source) + ('; Credits:%s' % row.credit if row.credit else ''))
+        if (link_info and link_info.description and not dead_link):
+            markdown.insert_line(markdown.italic(link_info.description))
+        for line in row.summary_lines or ():
+            markdown.insert_line(line)
+        return markdown.get_content()
+
+class HtmlDigestRenderer(_DigestRenderer):
+    """
+    Renders digest model into html (Confluence storage format)
+    """
+    format = FORMAT_HTML
+    _article_row = HtmlTemplate('<li><div><a href="{link}">{name}</a>{dead_link}</div><div>[{type}] Source: {source}{credit}</div>{description}{summary}</li>')
+    _html = HtmlCreator()
+
+    def _creator(self, writer: TextIO = None) -> HtmlCreator:
+        return HtmlCreator(writer=writer)
+
+    def _render(self, digest: Digest, html: HtmlCreator, chapter_keys: list[str|None]) -> None:
+        html.push_paragraph()
+        self._add_toc(html)
+        if digest.title:
+            html.insert(html.h1(digest.title))
+        if digest.preface:
+            html.push_paragraph()
+            for line in digest.preface_lines:
+                html.insert(html.text(line) + html.br())
+            html.pop_paragraph()
+        self._add_chapters(digest, html, chapter_keys)
+        html.pop_paragraph()
+
+    def _write_chapter(self, chapter: DigestChapter, html: HtmlCreator, render_row) -> None:
+        html.insert(html.h2("[[ %s ]]" % chapter.category))
+        html.push_list()
+        for row in chapter.rows:
+            html.insert(render_row(row))
+        html.pop_list()
+
+    def _render_row(self, row: DigestRow) -> str:
+        html = self._html
+        summary = ''
+        if row.summary_lines:
+            summary = html.div(html.br().join([html.escape(line, quote=False) for line in row.summary_lines]))
+        link_info = row.link_info
+        dead_link = self._dead_link(row)
+        description = ''
+        if (link_info and link_info.description and not dead_link):
+            description = html.div(html.i(link_info.description))
+        return self._article_row.render(
+            link=html.escape(row.link),
+            name=html.escape(row.name or (link_info and link_info.title) or row.link),
+            dead_link=' ' + html.b('[{}]'.format(dead_link)) if dead_link else '',
+            type=html.escape_cached(row.type, quote=False),
+            source=html.escape_cached(row.source, quote=False),
+            credit='; Credits:%s' % html.escape(row.credit, quote=False) if row.credit else '',
+            description=description,
+            summary=summary)
+
+    def _add_toc(self, html: HtmlCreator):
+        html.insert("""
+<div class="toc-macro client-side-toc-macro conf-macro output-block"
+    data-headerelements="H1,H2,H3,H4,H5,H6,H7\"
+    data-hasbody="false"
+    data-macro-name="toc"></div>
+        """)
+
+# format name -> renderer class, register new formats here
+DIGEST_RENDERERS = {
+    FORMAT_MARKDOWN: MarkdownDigestRenderer,
+    FORMAT_HTML: HtmlDigestRenderer,
+}
+
+def _render_format(digest: Digest, format: str, cache_config: dict = None, cache: FragmentCache = None) -> tuple[str, float]:
+    # cache is opened per call so it works in worker processes too, unless open one is given
+    start = time.perf_counter()
+    if (cache):
+        content = DIGEST_RENDERERS[format](cache).render(digest)
+        cache.flush()
+        return content, time.perf_counter() - start
+    cache = FragmentCache.from_config(cache_config)
+    try:
+        return DIGEST_RENDERERS[format](cache).render(digest), time.perf_counter() - start
+    finally:
+        if (cache):
+            cache.close()
+
+def render_digest(digest: Digest, formats: list[str], workers: int = 1, cache_config: dict = None,
+        metrics: Metrics = None, cache: FragmentCache = None) -> dict[str, str]:
+    """
+    Renders digest into each of requested formats
+    workers > 1 renders formats in separate processes, worth it only for very large digests
+    cache_config: digest.cache section, see FragmentCache.from_config
+    metrics: render time and size of each format, measured where it was rendered
+    cache: open cache kept by long running process instead of cache_config, renders in process
+    """
+    unknown = [format for format in formats if format not in DIGEST_RENDERERS]
+    if (unknown):
+        raise ValueError('Unknown digest formats: ' + str(unknown))
+    if (cache or workers <= 1 or len(formats) <= 1):
+        rendered = {format: _render_format(digest, format, cache_config, cache) for format in formats}
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(formats))) as executor:
+            futures = {format: executor.submit(_render_format, digest, format, cache_config) for format in formats}
+            rendered = {format: future.result() for format, future in futures.items()}
+    if (metrics and metrics.enabled):
+        for format, (content, duration) in rendered.items():
+            metrics.observe('render', duration, {'format': format}, bytes=len(content.encode('utf-8')))
+    return {format: content for format, (content, _) in rendered.items()}
+
+def write_digest(digest: Digest, format: str, output: TextIO, metrics: Metrics = None) -> None:
+    """
+    Renders digest chapter by chapter straight into text output
+    Nothing is cached, so memory does not grow with digest size
+    """
+    if (format not in DIGEST_RENDERERS):
+        raise ValueError('Unknown digest format: ' + format)
+    with (metrics if metrics else NULL_METRICS).stage('render', format=format):
+        DIGEST_RENDERERS[format]().write(digest, output)
 
 class ArticleToMarkdownConverter:
     """
     Parse articles list to markdown format string
     """
 
-    _markdown: MarkdownCreator
+    _renderer: MarkdownDigestRenderer
 
-    _article_categories = [
-        'DEV', 'OPS', 'DB', 'SEC', 'TOOLS', 'SOFT', 'TRIVIA'
-    ]
+    _article_categories = ARTICLE_CATEGORIES
 
     def __init__(self):
         self._logger = logging.getLogger(__name__ + '.ArticleToMarkdownConverter')
-        self._markdown = MarkdownCreator()
+        self._renderer = MarkdownDigestRenderer()
 
     def reset(self):
-        self._markdown = MarkdownCreator()
-
-    def convert(self, articles_list: list[Article], title: str = None, preface: str = None) -> str:
-        if (not articles_list):
-            raise ValueError('Articles list is not of expected type')
-        self._logger.info('Creating converting articles to markdown with title: {} and preface: {}'.format(title, preface))
-        articles_map = self._map_articles_by_category(articles_list)
-        self._logger.info("Used categories: " + str(articles_map.keys()))
-
-        self._add_title_and_preface(title, preface)
-        for category in self._article_categories:
-            if (category in articles_map):
-                self._add_markdown_chapter(category, articles_map[category])
-
-
-        return self._markdown.get_content()
-
-    def _map_articles_by_category(self, articles_list: list[Article]) -> dict[str, list[Article]]:
-        articles_categories_dict = {}
-        for article in articles_list:
-            category = article.category.upper()
-            if (category not in articles_categories_dict):
-                articles_categories_dict[category] = []
-            articles_categories_dict[category].append(article)
-        return articles_categories_dict
-
-    def _add_title_and_preface(self, title: str, preface: str) -> None:
-        if (title):
-            self._markdown.create_header(title, 1)
-        if (preface):
-            for line in preface.split('\n'):
-                self._markdown.insert_line(line)
-
-    def _add_markdown_chapter(self, category: str, articles_list: list[Article]) -> None:
-        self._markdown.create_header("\[\[ %s ]]" % category, 2)
-        self._markdown.push_list()
-        for article in articles_list:
-            link = self._markdown.create_link(article.name, article.link)
-            self._markdown.insert_list_item(link)
-            self._markdown.insert_line('\[{}] Source: {}'.format(article.type, article.source) + ('; Credits:%s' % article.credit if article.credit else ''))
-            if article.type == 'Meeting' and article.summary:
-                for line in article.summary.split('\\n'):
-                    self._markdown.insert_line(line)
-        self._markdown.pop_list()
+        self._renderer = MarkdownDigestRenderer()
+
+    def convert(self, articles_list: list[Article]|ArticleBatch, title: str = None, preface: str = None,
+            links: dict[str, LinkInfo] = None) -> str:
+        """
+        links: url -> LinkInfo of LinkEnricher, dead links are flagged and descriptions shown
+        """
+        return self._renderer.render(Digest.build(articles_list, title, preface, self._article_categories, links))
+
+    def write(self, output: TextIO, articles_list: list[Article]|ArticleBatch, title: str = None, preface: str = None,
+            links: dict[str, LinkInfo] = None) -> None:
+        """
+        Renders markdown straight into text file-like output without building whole string
+        """
+        self._renderer.write(Digest.build(articles_list, title, preface, self._article_categories, links), output)
 
 class ArticleToHtmlConverter:
     """
@@ -72,66 +310,26 @@ class ArticleToHtmlConverter:
     Why I chose not to? Becase that's a "simple" thing to do what I want.. and I'm dumb
     By any chance you'll need to modify this change implementation to actualy be using xml.dom or any other python lib
     """
-    _html = None
-    _article_categories = [
-        'DEV', 'OPS', 'DB', 'SEC', 'TOOLS', 'SOFT', 'TRIVIA'
-    ]
+    _renderer = None
+    _article_categories = ARTICLE_CATEGORIES
 
     def __init__(self):
         self._logger = logging.getLogger(__name__ + '.ArticleToHtmlConverter')
-        self._html = HtmlCreator()
-
-    def convert(self, articles_list: list[Article], title: str = None, preface: str = None) -> str:
-        if (not articles_list):
-            raise ValueError('Articles list is not of expected type')
-        self._logger.info('Creating converting articles to markdown with title: {} and preface: {}'.format(title, preface))
-        articles_map = self._map_articles_by_category(articles_list)
-        self._logger.info("Used categories: " + str(articles_map.keys()))
-
-        self._html.push_paragraph()
-        self._add_toc(self._html)
-        self._add_title_and_preface(title, preface)
-        for category in self._article_categories:
-            if (category in articles_map):
-                self._add_chapter(category, articles_map[category])
-        self._html.pop_paragraph()
-        return self._html.get_content()
-
-    def _map_articles_by_category(self, articles_list: list[Article]) -> dict[str, list[Article]]:
-        articles_categories_dict = {}
-        for article in articles_list:
-            category = article.category.upper()
-            if (category not in articles_categories_dict):
-                articles_categories_dict[category] = []
-            articles_categories_dict[category].append(article)
-        return articles_categories_dict
-
-    def _add_title_and_preface(self, title: str, preface: str) -> None:
-        if title:
-            self._html.insert(self._html.h1(title))
-        if preface:
-            self._html.push_paragraph()
-            for line in preface.split('\n'):
-                self._html.insert(self._html.text(line) + self._html.br())
-            self._html.pop_paragraph()
-
-    def _add_chapter(self, category: str, articles_list: list[Article]) -> None:
-        self._html.insert(self._html.h2("[[ %s ]]" % category))
-        self._html.push_list()
-        for article in articles_list:
-            self._html.push_list_item()
-            article_row = self._html.div(self._html.a(article.name, article.link))
-            article_row += self._html.div('[{}] Source: {}'.format(article.type, article.source) + ('; Credits:%s' % article.credit if article.credit else ''))
-            if article.type == 'Meeting' and article.summary:
-                article_row += self._html.div(article.summary.replace('\\n', self._html.br()))
-            self._html.insert(article_row)
-            self._html.pop_list_item()
-        self._html.pop_list()
+        self._renderer = HtmlDigestRenderer()
 
-    def _add_toc(self, html: HtmlCreator):
-        html.insert("""
-<div class="toc-macro client-side-toc-macro conf-macro output-block"
-    data-headerelements="H1,H2,H3,H4,H5,H6,H7\"
-    data-hasbody="false"
-    data-macro-name="toc"></div>
-        """)
\ No newline at end of file
+    def reset(self):
+        self._renderer = HtmlDigestRenderer()
+
+    def convert(self, articles_list: list[Article]|ArticleBatch, title: str = None, preface: str = None,
+            links: dict[str, LinkInfo] = None) -> str:
+        """
+        links: url -> LinkInfo of LinkEnricher, dead links are flagged and descriptions shown
+        """
+        return self._renderer.render(Digest.build(articles_list, title, preface, self._article_categories, links))
+
+    def write(self, output: TextIO, articles_list: list[Article]|ArticleBatch, title: str = None, preface: str = None,
+            links: dict[str, LinkInfo] = None) -> None:
+        """
+        Renders html straight into text file-like output without building whole string
+        """
+        self._renderer.write(Digest.build(articles_list, title, preface, self._article_categories, links), output)
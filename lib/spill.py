@@ -0,0 +1,123 @@
+import logging
+import os
+import pickle
+import shutil
+import tempfile
+from typing import Iterable, Iterator
+
+from .notion import Article
+
+def _to_row(article: Article) -> tuple:
+    return (
+        article.id, article.object, article.name, article.link, article.summary, article.credit, article.category,
+        article.type, article.source, article.tech_category, article.created_time, article.published_time,
+        article.last_edited_time,
+    )
+
+def _from_row(row: tuple) -> Article:
+    # same order as Article arguments, categorical values are interned again
+    return Article(*row)
+
+class SpillBucket:
+    """
+    Articles of one category in arrival order
+    Up to threshold articles are kept in memory, full chunk is pickled to the end of spill file.
+    Iteration reads spilled chunks back one at a time followed by the in memory tail,
+    so bucket can be iterated again (once per rendered format) without holding it whole.
+    """
+
+    def __init__(self, path: str, threshold: int):
+        self._path = path
+        self._threshold = threshold
+        self._articles = []
+        self._spilled = 0
+
+    def add(self, article: Article) -> None:
+        self._articles.append(article)
+        if (len(self._articles) >= self._threshold):
+            self._spill()
+
+    @property
+    def spilled(self) -> int:
+        return self._spilled
+
+    def _spill(self) -> None:
+        with open(self._path, 'ab') as f:
+            pickle.dump([_to_row(article) for article in self._articles], f, protocol=pickle.HIGHEST_PROTOCOL)
+        self._spilled += len(self._articles)
+        self._articles = []
+
+    def __iter__(self) -> Iterator[Article]:
+        if (self._spilled):
+            with open(self._path, 'rb') as f:
+                while True:
+                    try:
+                        rows = pickle.load(f)
+                    except EOFError:
+                        break
+                    for row in rows:
+                        yield _from_row(row)
+        yield from self._articles
+
+    def __len__(self):
+        return self._spilled + len(self._articles)
+
+class CategoryBuckets:
+    """
+    Articles grouped by upper cased category with bounded memory, see SpillBucket
+    Memory holds at most threshold articles per category whatever the number of articles,
+    spill files live in temporary directory removed on close.
+    """
+    _logger = logging.getLogger(__name__ + '.CategoryBuckets')
+
+    def __init__(self, threshold: int = 10000, directory: str = None):
+        if (threshold < 1):
+            raise ValueError('Spill threshold has to be positive but was ' + str(threshold))
+        self._threshold = threshold
+        self._directory = tempfile.mkdtemp(prefix='digest-spill-', dir=directory)
+        self._buckets = {}
+
+    @staticmethod
+    def from_config(config: dict) -> 'CategoryBuckets':
+        """
+        config: digest.spill section
+        """
+        config = config or {}
+        return CategoryBuckets(config.get('threshold', 10000), config.get('directory'))
+
+    def add(self, article: Article) -> None:
+        category = article.category.upper() if article.category else None
+        bucket = self._buckets.get(category)
+        if (bucket is None):
+            bucket = self._buckets[category] = SpillBucket(os.path.join(self._directory, 'bucket-{}.pickle'.format(len(self._buckets))), self._threshold)
+        bucket.add(article)
+
+    def extend(self, articles: Iterable[Article]) -> int:
+        count = 0
+        for article in articles:
+            self.add(article)
+            count += 1
+        return count
+
+    @property
+    def spilled(self) -> int:
+        return sum(bucket.spilled for bucket in self._buckets.values())
+
+    def __contains__(self, category: str) -> bool:
+        return category in self._buckets
+
+    def __getitem__(self, category: str) -> SpillBucket:
+        return self._buckets[category]
+
+    def __len__(self):
+        return sum(len(bucket) for bucket in self._buckets.values())
+
+    def close(self) -> None:
+        shutil.rmtree(self._directory, ignore_errors=True)
+        self._buckets = {}
+
+    def __enter__(self) -> 'CategoryBuckets':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -0,0 +1,164 @@
+import json
+import logging
+import sqlite3
+from typing import Iterable, Iterator
+
+from .notion import Article
+
+_ARTICLE_COLUMNS = (
+    'id', 'object', 'name', 'link', 'summary', 'type', 'source', 'category',
+    'tech_category', 'credit', 'created_time', 'published_time', 'last_edited_time'
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS articles (
+    id TEXT PRIMARY KEY,
+    object TEXT,
+    name TEXT,
+    link TEXT,
+    summary TEXT,
+    type TEXT,
+    source TEXT,
+    category TEXT,
+    tech_category TEXT,
+    credit TEXT,
+    created_time TEXT,
+    published_time TEXT,
+    last_edited_time TEXT
+);
+CREATE INDEX IF NOT EXISTS articles_unpublished ON articles (published_time, created_time);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# update in place keeps rowid so order of articles created in the same minute is stable
+_UPSERT_ARTICLE = 'INSERT INTO articles ({}) VALUES ({}) ON CONFLICT(id) DO UPDATE SET {}'.format(
+    ', '.join(_ARTICLE_COLUMNS),
+    ', '.join('?' * len(_ARTICLE_COLUMNS)),
+    ', '.join('{0} = excluded.{0}'.format(column) for column in _ARTICLE_COLUMNS[1:]))
+
+class ArticleStore:
+    """
+    Local sqlite copy of Notion articles keyed by page id
+    Keeps last_edited_time watermark so only changed pages have to be fetched
+    and time of last reconciliation with whole unpublished set, see retain_unpublished
+    """
+    _logger = logging.getLogger(__name__ + '.ArticleStore')
+
+    _WATERMARK_KEY = 'last_edited_time'
+    _RECONCILED_KEY = 'reconciled'
+    _batch_size = 500 # rows written per transaction
+
+    def __init__(self, path: str):
+        self._path = path
+        self._connection = sqlite3.connect(path)
+        self._connection.executescript(_SCHEMA)
+        self._logger.debug('Article store opened: {}'.format(path))
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def get_watermark(self) -> str|None:
+        row = self._connection.execute('SELECT value FROM meta WHERE key = ?', (self._WATERMARK_KEY,)).fetchone()
+        return row[0] if row else None
+
+    def upsert(self, articles: Iterable[Article]) -> int:
+        """
+        Inserts or replaces given articles and moves watermark to the newest last_edited_time
+        Rows are committed in batches of batch_size, so write lock is not held while articles are fetched,
+        watermark moves only with the last batch so interrupted sync fetches the same pages again
+        Returns number of written rows
+        """
+        count = 0
+        watermark = self.get_watermark()
+        rows = []
+        for article in articles:
+            rows.append(self._to_row(article))
+            # notion timestamps are ISO 8601 in UTC so string comparison is enough
+            if (article.last_edited_time and (watermark is None or article.last_edited_time > watermark)):
+                watermark = article.last_edited_time
+            if (len(rows) >= self._batch_size):
+                with self._connection:
+                    self._connection.executemany(_UPSERT_ARTICLE, rows)
+                count += len(rows)
+                rows = []
+        with self._connection:
+            self._connection.executemany(_UPSERT_ARTICLE, rows)
+            if (watermark):
+                self._connection.execute(
+                    'INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (self._WATERMARK_KEY, watermark))
+        count += len(rows)
+        self._logger.debug('Upserted {} articles, watermark: {}'.format(count, watermark))
+        return count
+
+    def get_reconciled(self) -> float|None:
+        row = self._connection.execute('SELECT value FROM meta WHERE key = ?', (self._RECONCILED_KEY,)).fetchone()
+        return float(row[0]) if row else None
+
+    def set_reconciled(self, reconciled: float) -> None:
+        with self._connection:
+            self._connection.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (self._RECONCILED_KEY, str(reconciled)))
+
+    def retain_unpublished(self, article_ids: Iterable[str]) -> int:
+        """
+        Removes unpublished articles missing in given ids (whole unpublished set of Notion),
+        pages deleted or archived in Notion are never returned by edited pages query
+        Returns number of removed rows
+        """
+        with self._connection:
+            self._connection.execute('CREATE TEMP TABLE IF NOT EXISTS retained (id TEXT PRIMARY KEY)')
+            self._connection.execute('DELETE FROM retained')
+            self._connection.executemany('INSERT OR IGNORE INTO retained (id) VALUES (?)', ((article_id,) for article_id in article_ids))
+            removed = self._connection.execute(
+                'DELETE FROM articles WHERE published_time IS NULL AND id NOT IN (SELECT id FROM retained)').rowcount
+            self._connection.execute('DELETE FROM retained')
+        self._logger.debug('Removed {} articles missing in Notion'.format(removed))
+        return removed
+
+    def mark_published(self, article_ids: Iterable[str], published_time: dict) -> None:
+        with self._connection:
+            self._connection.executemany(
+                'UPDATE articles SET published_time = ? WHERE id = ?',
+                [(json.dumps(published_time), article_id) for article_id in article_ids])
+
+    def iter_unpublished(self) -> Iterator[Article]:
+        """
+        Yields unpublished articles in created time ascending order, same as Notion query
+        """
+        cursor = self._connection.execute(
+            'SELECT {} FROM articles WHERE published_time IS NULL ORDER BY created_time ASC, rowid ASC'.format(', '.join(_ARTICLE_COLUMNS)))
+        for row in cursor:
+            yield self._from_row(row)
+
+    def count(self) -> int:
+        return self._connection.execute('SELECT COUNT(*) FROM articles').fetchone()[0]
+
+    @staticmethod
+    def _to_row(article: Article) -> tuple:
+        return (
+            article.id, article.object, article.name, article.link, article.summary, article.type,
+            article.source, article.category,
+            json.dumps(article.tech_category) if article.tech_category is not None else None,
+            article.credit, article.created_time,
+            json.dumps(article.published_time) if article.published_time is not None else None,
+            article.last_edited_time,
+        )
+
+    @staticmethod
+    def _from_row(row: tuple) -> Article:
+        values = dict(zip(_ARTICLE_COLUMNS, row))
+        return Article(
+            values['id'], values['object'],
+            name=values['name'],
+            link=values['link'],
+            summary=values['summary'],
+            credit=values['credit'],
+            category=values['category'],
+            type=values['type'],
+            source=values['source'],
+            technical_category=json.loads(values['tech_category']) if values['tech_category'] else None,
+            created_time=values['created_time'],
+            published_time=json.loads(values['published_time']) if values['published_time'] else None,
+            last_edited_time=values['last_edited_time'])
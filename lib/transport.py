@@ -0,0 +1,279 @@
+import gzip
+import json
+import logging
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+from .metrics import Metrics, NULL_METRICS
+from .ratelimit import TokenBucket
+
+class TransportStats:
+    """
+    Thread safe counters of http traffic going through HttpTransport
+    Every event is reported to metrics as well, which attribute it to stage of calling thread
+    """
+
+    def __init__(self, metrics: Metrics = None):
+        self._lock = threading.Lock()
+        self._metrics = metrics if metrics else NULL_METRICS
+        self.requests = 0
+        self.connections = 0
+        self.retries = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    @property
+    def reused(self) -> int:
+        """
+        Requests served by already opened connection
+        """
+        return max(self.requests - self.connections, 0)
+
+    def connection_opened(self) -> None:
+        with self._lock:
+            self.connections += 1
+        self._metrics.connection_opened()
+
+    def request_sent(self, bytes_sent: int) -> None:
+        with self._lock:
+            self.requests += 1
+            self.bytes_sent += bytes_sent
+        self._metrics.request_sent(bytes_sent)
+
+    def response_received(self, bytes_received: int) -> None:
+        with self._lock:
+            self.bytes_received += bytes_received
+        self._metrics.response_received(bytes_received)
+
+    def retried(self) -> None:
+        with self._lock:
+            self.retries += 1
+        self._metrics.retried()
+
+    def as_dict(self) -> dict:
+        return {
+            'requests': self.requests,
+            'connections': self.connections,
+            'reused': self.reused,
+            'retries': self.retries,
+            'bytes_sent': self.bytes_sent,
+            'bytes_received': self.bytes_received,
+        }
+
+    def __str__(self):
+        return "TransportStats [requests:{}, connections:{}, reused:{}, retries:{}, bytes_sent:{}, bytes_received:{}]".format(
+            self.requests, self.connections, self.reused, self.retries, self.bytes_sent, self.bytes_received)
+
+def _counting_pool(pool_class, stats: TransportStats):
+    class CountingConnection(pool_class.ConnectionCls):
+        def connect(self):
+            # called for every new socket, also when dropped connection is reopened
+            stats.connection_opened()
+            return super().connect()
+
+    class CountingConnectionPool(pool_class):
+        ConnectionCls = CountingConnection
+    return CountingConnectionPool
+
+class _CountingAdapter(HTTPAdapter):
+    """
+    Pooled adapter reporting every sent request and newly opened connection to stats
+    Counts requests of clients using session directly (atlassian) as well
+    """
+
+    def __init__(self, stats: TransportStats, **kwargs):
+        self._stats = stats
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        body = request.body
+        self._stats.request_sent(len(body) if isinstance(body, (bytes, str)) else 0)
+        return super().send(request, **kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _counting_pool(HTTPConnectionPool, self._stats),
+            'https': _counting_pool(HTTPSConnectionPool, self._stats),
+        }
+
+class HttpTransport:
+    """
+    Shared http layer for Notion, Medium and Confluence clients
+    Keeps one pooled keep-alive session per host, applies timeouts,
+    retries 429/5xx responses with exponential backoff (or Retry-After) and counts traffic
+
+    config (all optional):
+      timeout:
+        connect: seconds
+        read: seconds
+      retries: int
+      backoff: float - first backoff delay, doubled with each retry
+      pool:
+        maxsize: int - connections kept per host
+      gzip: bool - compress json request bodies
+    metrics: receives traffic of every request, see Metrics
+    """
+    _logger = logging.getLogger(__name__ + '.HttpTransport')
+
+    _connect_timeout = 5.0
+    _read_timeout = 30.0
+    _retries = 3
+    _backoff = 0.5
+    _pool_maxsize = 10
+    _gzip = False
+    _retry_statuses = (429, 500, 502, 503, 504)
+
+    def __init__(self, config: dict = None, metrics: Metrics = None):
+        config = config or {}
+        timeout_config = config.get('timeout') or {}
+        self._connect_timeout = timeout_config.get('connect', self._connect_timeout)
+        self._read_timeout = timeout_config.get('read', self._read_timeout)
+        self._retries = config.get('retries', self._retries)
+        self._backoff = config.get('backoff', self._backoff)
+        self._pool_maxsize = (config.get('pool') or {}).get('maxsize', self._pool_maxsize)
+        self._gzip = config.get('gzip', self._gzip)
+        self._sessions = {}
+        self._sessions_lock = threading.Lock()
+        self._rate_limiters = {}
+        self.metrics = metrics if metrics else NULL_METRICS
+        self.stats = TransportStats(self.metrics)
+
+    @property
+    def timeout(self) -> tuple[float, float]:
+        return (self._connect_timeout, self._read_timeout)
+
+    @property
+    def retries(self) -> int:
+        return self._retries
+
+    @property
+    def backoff(self) -> float:
+        return self._backoff
+
+    def session(self, url: str, retry_statuses: tuple[int, ...] = None) -> requests.Session:
+        """
+        Returns pooled session for host of given url, creates one when missing
+        retry_statuses: for clients using session directly (atlassian), responses with these statuses
+            are retried inside the adapter with transport retries and backoff, honouring Retry-After.
+            Such sessions are kept apart from the ones used by request, which retries on its own.
+        """
+        parts = urlsplit(url)
+        host_key = '{}://{}'.format(parts.scheme, parts.netloc)
+        session_key = (host_key, tuple(retry_statuses) if retry_statuses else None)
+        with self._sessions_lock:
+            session = self._sessions.get(session_key)
+            if (session is None):
+                session = requests.Session()
+                max_retries = 0
+                if (retry_statuses):
+                    max_retries = Retry(total=None, connect=0, read=0, status=self._retries, allowed_methods=None,
+                        status_forcelist=retry_statuses, backoff_factor=self._backoff, respect_retry_after_header=True)
+                adapter = _CountingAdapter(self.stats, pool_connections=1, pool_maxsize=self._pool_maxsize, max_retries=max_retries)
+                session.mount(host_key, adapter)
+                self._sessions[session_key] = session
+                self._logger.debug('Opened session for {}'.format(host_key))
+            return session
+
+    def detached_session(self, pools: int, pool_maxsize: int = None) -> requests.Session:
+        """
+        Pooled session for any host, not kept by transport, caller closes it
+        At most pools host connection pools are kept (least recently used are dropped), e.g. for link checks
+        of many sites that would otherwise leave a session per site for the life of the process
+        """
+        session = requests.Session()
+        adapter = _CountingAdapter(self.stats, pool_connections=pools, pool_maxsize=pool_maxsize or self._pool_maxsize, max_retries=0)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def rate_limiter(self, key: str, rate: float) -> TokenBucket:
+        """
+        Token bucket shared by all clients of the transport asking for the same key (e.g. api url),
+        so parallel clients of one api stay within its limit together. Rate of the first caller wins.
+        """
+        with self._sessions_lock:
+            rate_limiter = self._rate_limiters.get(key)
+            if (rate_limiter is None):
+                rate_limiter = self._rate_limiters[key] = TokenBucket(rate)
+            return rate_limiter
+
+    def request(self, method: str, url: str, json_body: dict = None, headers: dict = None,
+            rate_limiter: TokenBucket = None, retry_server_errors: bool = True, compress: bool = None,
+            stream: bool = False) -> requests.Response:
+        """
+        Sends request through pooled session of the host
+        rate_limiter: acquired before every attempt, paused on 429
+        retry_server_errors: set false for non idempotent calls so 5xx is not retried
+        compress: gzip json body, defaults to transport configuration
+        stream: body of successful response is not read, use iter_content to count received bytes
+        Returns last response, even if it was an error one
+        """
+        session = self.session(url)
+        headers = CaseInsensitiveDict(headers)
+        body = None
+        if (json_body is not None):
+            body = json.dumps(json_body).encode('utf-8')
+            headers.setdefault('Content-Type', 'application/json')
+            if (self._gzip if compress is None else compress):
+                body = gzip.compress(body)
+                headers['Content-Encoding'] = 'gzip'
+
+        attempt = 0
+        while True:
+            if (rate_limiter):
+                rate_limiter.acquire()
+            try:
+                response = session.request(method=method, url=url, data=body, headers=headers, timeout=self.timeout, stream=stream)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if (attempt >= self._retries or not retry_server_errors):
+                    raise
+                delay = self._backoff_delay(attempt)
+                self._logger.warning('{} {} failed with {}, retrying in {:.2f}s'.format(method.upper(), url, repr(e), delay))
+            else:
+                status = response.status_code
+                retryable = status == 429 or (retry_server_errors and status in self._retry_statuses)
+                if (stream and status == 200):
+                    return response
+                self.stats.response_received(len(response.content))
+                if (not retryable or attempt >= self._retries):
+                    return response
+                delay = self._retry_after(response, self._backoff_delay(attempt))
+                if (status == 429 and rate_limiter):
+                    rate_limiter.pause(delay)
+                self._logger.warning('{} {} returned {}, retrying in {:.2f}s'.format(method.upper(), url, status, delay))
+            self.stats.retried()
+            time.sleep(delay)
+            attempt += 1
+
+    def iter_content(self, response: requests.Response, chunk_size: int = 64 * 1024):
+        """
+        Yields raw body chunks of streamed response counting received bytes
+        """
+        for chunk in response.iter_content(chunk_size=chunk_size):
+            self.stats.response_received(len(chunk))
+            yield chunk
+
+    def close(self) -> None:
+        with self._sessions_lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions = {}
+
+    def _backoff_delay(self, attempt: int) -> float:
+        return self._backoff * (2 ** attempt)
+
+    @staticmethod
+    def _retry_after(response: requests.Response, default: float) -> float:
+        retry_after = response.headers.get('Retry-After')
+        try:
+            return max(float(retry_after), 0.0)
+        except (TypeError, ValueError):
+            return default
@@ -13,24 +13,38 @@
 # Confluence api reference
 #   https://docs.atlassian.com/ConfluenceServer/rest/8.0.2/#api/content-createContent
 # Confluence
-import yaml
-import logging, logging.config
+import logging
 import os
 import argparse
-import json
+import time
+from typing import TYPE_CHECKING
 
-from lib.notion import NotionDbClient
-from lib.service import ArticleToMarkdownConverter
-from lib.service import ArticleToHtmlConverter
-from atlassian import Confluence
-from lib.medium import MediumBlog
+# heavy modules (requests, atlassian, notion client) are imported where they are used,
+# so --help and runs of a single channel do not pay for all of them
+from lib.formats import FORMAT_MARKDOWN, FORMAT_HTML, FORMAT_EXTENSIONS
+from lib.publishers import PUBLISHERS, PublisherSpec, add_publisher_arguments, selected_publishers
+
+if TYPE_CHECKING:
+    from lib.fragment_cache import FragmentCache
+    from lib.journal import PublishJournal
+    from lib.links import LinkInfo
+    from lib.metrics import Metrics
+    from lib.publisher import IssueReport, PublishChannel
+    from lib.store import ArticleStore
+    from lib.transport import HttpTransport
 
-with open('logging.yml', 'r') as f:
-    config = yaml.safe_load(f.read())
-    logging.config.dictConfig(config)
 logger = logging.getLogger(__name__)
 
+def configure_logging():
+    import logging.config
+    import yaml
+    with open('logging.yml', 'r') as f:
+        config = yaml.safe_load(f.read())
+    # module logger exists before logging is configured, it must stay enabled
+    logging.config.dictConfig(dict({'disable_existing_loggers': False}, **config))
+
 def load_config():
+    import yaml
     config = {}
     with open('config.yml', 'r') as f:
         config = yaml.safe_load(f.read())
@@ -43,10 +57,68 @@ def load_config():
 
 parser = argparse.ArgumentParser()
 parser.add_argument("-m", "--message", dest="message", action="store", help='Set issue preface')
-parser.add_argument("-c", "--confluence", dest="confluence", action="store_true", help='Publish to confluence')
-parser.add_argument("-t", "--msteams", dest="msteams", action="store_true", help='publish to Microsoft Teams')
-parser.add_argument("-e", "--medium", dest="medium", action="store_true", help='publish to Medium')
+add_publisher_arguments(parser)
 parser.add_argument("-u", "--update", dest="update", action="store_true", help='Update Notion database articles with published date')
+parser.add_argument("-s", "--sync", dest="sync", action="store_true", help='Incrementally sync Notion into local article store and read articles from it')
+parser.add_argument("-r", "--replay", dest="replay", action="store_true", help='Replay Notion responses recorded by previous runs instead of querying Notion')
+parser.add_argument("--resume", dest="resume", action="store_true", help='Finish last interrupted issue run (-u) from its journal, skipping done steps')
+parser.add_argument("-d", "--digest", dest="digests", action="append", help='Publish only given digest of config digests list, repeatable')
+parser.add_argument("-o", "--output", dest="output", action="store", help='Stream digest files of unpublished articles into given directory with bounded memory, nothing is published')
+parser.add_argument("--daemon", dest="daemon", action="store_true", help='Keep running, poll Notion and publish issues on daemon schedule or threshold')
+
+def merge_config(base: dict, override: dict) -> dict:
+    """
+    Copy of base with override applied, nested sections are merged key by key
+    """
+    merged = dict(base)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = merge_config(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+def get_digest_configs(config: dict, names: list[str] = None) -> list[tuple[str|None, dict]]:
+    """
+    (name, config) of every digest of config digests list, each one merged over top level config
+    Digests do not share issue counter, journal and article store unless their definition says so
+    Without digests list top level config is the only, unnamed digest
+    """
+    definitions = config.get('digests') or []
+    if not definitions:
+        if names:
+            raise ValueError('No digests configured, unknown digests: {}'.format(names))
+        return [(None, config)]
+    digests = []
+    for definition in definitions:
+        name = definition.get('name')
+        if not name or name in [digest_name for digest_name, _ in digests]:
+            raise ValueError('Every digest needs unique name: {}'.format(name))
+        defaults = {
+            'issue': {'number': {'file': 'issue_{}.txt'.format(name)}},
+            'journal': {'directory': os.path.join((config.get('journal') or {}).get('directory', 'journals'), name)},
+            'notion': {'store': {'file': 'notion_articles_{}.db'.format(name)}},
+        }
+        overrides = {key: value for key, value in definition.items() if key not in ('name', 'publish')}
+        digests.append((name, merge_config(merge_config(config, defaults), overrides)))
+    if names:
+        unknown = set(names) - {name for name, _ in digests}
+        if unknown:
+            raise ValueError('Unknown digests: {}'.format(sorted(unknown)))
+        digests = [(name, digest_config) for name, digest_config in digests if name in names]
+    return digests
+
+def get_digest_publishers(config: dict, name: str|None, args) -> list[PublisherSpec]:
+    """
+    Channels listed in digest definition (publish), channels selected by flags otherwise
+    """
+    definition = next((definition for definition in config.get('digests') or [] if definition.get('name') == name), {})
+    if 'publish' not in definition:
+        return selected_publishers(args)
+    unknown = [channel for channel in definition['publish'] if channel not in PUBLISHERS]
+    if unknown:
+        raise ValueError('Unknown channels of digest {}: {}'.format(name, unknown))
+    return [PUBLISHERS[channel] for channel in definition['publish']]
 
 def get_issue_number(config: dict, args: dict) -> str|None:
     issue_number_file = config['issue']['number']['file']
@@ -69,67 +141,401 @@ def get_issue_number(config: dict, args: dict) -> str|None:
     logger.info('Starting publishing news #' + issue_number)
     return issue_number
 
-def get_content_articles(config: dict):
-    notion_client = NotionDbClient(config['notion'])
-    articles_list = notion_client.get_unpublished_articles(load_saved=False, save_response=True)
+def get_article_store(config: dict, args) -> 'ArticleStore|None':
+    if not args.sync:
+        return None
+    from lib.store import ArticleStore
+    store_config = config['notion'].get('store') or {}
+    return ArticleStore(store_config.get('file', 'notion_articles.db'))
+
+def get_content_articles(config: dict, transport: 'HttpTransport', store: 'ArticleStore' = None, replay: bool = False):
+    from lib.notion import NotionDbClient, ArticleBatch
+    # stages of notion client are recorded into transport metrics
+    notion_client = NotionDbClient(config['notion'], transport=transport, store=store)
+    articles_list = ArticleBatch.from_articles(notion_client.iter_unpublished_articles(load_saved=replay))
     logger.info('Got ' + str(len(articles_list)) + ' articles')
     return articles_list
 
-def get_markdown_content(articles_list: list, title: str, preface: str):
-    article2markdown_converter = ArticleToMarkdownConverter()
-    content_md = article2markdown_converter.convert(articles_list=articles_list, title=title, preface=preface)
-    logger.debug('Markdown content:\n##################################\n{}\n##################################\n'.format(repr(content_md)))
-    return content_md
-
-def get_html_content(articles_list: list, title: str, preface: str):
-    article2html_converter = ArticleToHtmlConverter()
-    content_html = article2html_converter.convert(articles_list=articles_list, title=title, preface=preface)
-    logger.debug('HTML content:\n##################################\n{}\n##################################\n'.format(repr(content_html)))
-    return content_html
-
-def publish_confluence(config, title, content):
-    logger.info('Publishing to Confluence')
-    confluence = Confluence(url=config['confluence']['url'], token=config['confluence']['auth']['token'])
-    response = confluence.create_page(space=config['confluence']['blog']['space'], title=title, body=content, type='blogpost', representation='storage')
-    if type(response) is dict:
-        logger.info ('Confluence published article: id:' + response["id"])
+def get_resumed_articles(config: dict, transport: 'HttpTransport', store: 'ArticleStore', journal: 'PublishJournal', articles_list=None):
+    """
+    Articles fetched by interrupted run, from its recorded Notion responses when available
+    as articles already marked as published are not returned by Notion query anymore
+    articles_list: articles kept by daemon, used instead of recorded responses
+    """
+    from lib.notion import ArticleBatch
+    if articles_list is None:
+        try:
+            articles_list = get_content_articles(config, transport, replay=True)
+        except FileNotFoundError:
+            logger.warning('Recorded Notion responses of issue #{} are not available, fetching articles again'.format(journal.issue))
+            articles_list = get_content_articles(config, transport, store)
+    ids = set(journal.article_ids)
+    resumed = ArticleBatch.from_articles(article for article in articles_list if article.id in ids)
+    if (len(resumed) < len(ids)):
+        logger.warning('{} articles of issue #{} are not available anymore'.format(len(ids) - len(resumed), journal.issue))
+    return resumed
+
+def get_journal(config: dict, args, issue_number: str = None, resume: bool = False) -> 'PublishJournal|None':
+    """
+    Journal of issue run, kept only for runs marking articles as published (-u)
+    With resume the last unfinished journal is returned
+    """
+    if not (args.update or resume):
+        return None
+    from lib.journal import PublishJournal
+    directory = (config.get('journal') or {}).get('directory', 'journals')
+    unfinished = PublishJournal.latest_unfinished(directory)
+    if resume:
+        if unfinished is None or not unfinished.started:
+            raise ValueError('No unfinished issue journal to resume in ' + directory)
+        logger.info('Resuming ' + str(unfinished))
+        return unfinished
+    if unfinished and unfinished.issue != issue_number:
+        logger.warning('Issue #{} was not finished, run with --resume to finish it'.format(unfinished.issue))
+    return PublishJournal.open(directory, issue_number)
+
+def get_required_formats(publishers: list[PublisherSpec]) -> list[str]:
+    """
+    Formats needed by selected channels, dry run renders all of them for preview
+    """
+    formats = []
+    for spec in publishers:
+        if spec.format not in formats:
+            formats.append(spec.format)
+    return formats if formats else [FORMAT_MARKDOWN, FORMAT_HTML]
+
+def get_links(config: dict, articles_list, transport: 'HttpTransport', metrics: 'Metrics' = None) -> dict[str, 'LinkInfo']|None:
+    """
+    url -> LinkInfo of every article link, checked concurrently and cached, None unless links are enabled
+    """
+    links_config = config.get('links') or {}
+    if not links_config.get('enabled'):
+        return None
+    from lib.links import LinkEnricher
+    enricher = LinkEnricher.from_config(links_config, transport, metrics)
+    try:
+        return enricher.enrich(article.link for article in articles_list)
+    finally:
+        enricher.close()
+
+def skip_dead_links(config: dict, articles_list, links: dict[str, 'LinkInfo']):
+    """
+    Articles without gone link (404, 410) when links.dead is skip, skipped articles stay unpublished for next issue
+    Links failing otherwise (timeouts, 403, 429, 5xx) may be fine next time, they are only flagged
+    """
+    from lib.notion import ArticleBatch
+    if not links or (config.get('links') or {}).get('dead', 'flag') != 'skip':
+        return articles_list
+    alive = ArticleBatch.from_articles(article for article in articles_list if not (article.link in links and links[article.link].gone))
+    if len(alive) < len(articles_list):
+        logger.warning('Skipping {} articles with missing pages'.format(len(articles_list) - len(alive)))
+    return alive
+
+def get_contents(config: dict, articles_list, title: str, preface: str, formats: list[str], metrics: 'Metrics' = None,
+        cache: 'FragmentCache' = None, links: dict[str, 'LinkInfo'] = None) -> dict[str, str]:
+    from lib.digest import Digest
+    from lib.service import render_digest
+    digest_config = config.get('digest') or {}
+    digest = Digest.build(articles_list, title=title, preface=preface, categories=digest_config.get('categories'), links=links)
+    workers = (digest_config.get('render') or {}).get('workers', 1)
+    contents = render_digest(digest, formats, workers=workers, cache_config=digest_config.get('cache'), metrics=metrics, cache=cache)
+    for format, content in contents.items():
+        logger.debug('{} content:\n##################################\n{}\n##################################\n'.format(format, repr(content)))
+    return contents
+
+def get_publish_channels(config: dict, publishers: list[PublisherSpec], title: str, contents: dict[str, str], transport: 'HttpTransport',
+        journal: 'PublishJournal' = None) -> list['PublishChannel']:
+    """
+    Publisher module of channel is imported only when its flag is set
+    Every attempt is journaled before it starts and once it ends, attempt abandoned on timeout
+    stays pending in journal (it may still publish), so resume warns instead of trusting it
+    """
+    from lib.publisher import PublishChannel
+    channels_config = config.get('channels') or {}
+    channels = []
+    for spec in publishers:
+        publish = spec.load()
+        hash = journal.record_rendered(spec.format, contents[spec.format]) if journal else None
+        def publish_channel(spec=spec, publish=publish, hash=hash):
+            if journal:
+                journal.record_publishing(spec.name, hash)
+            return publish(config, title, contents[spec.format], transport)
+        def on_attempt(success, value, error, spec=spec, hash=hash):
+            journal.record_published(spec.name, hash, success, value, error=error)
+        channels.append(PublishChannel.from_config(spec.name, publish_channel, channels_config.get(spec.name),
+            on_attempt if journal else None))
+    return channels
+
+def get_pending_publishers(publishers: list[PublisherSpec], journal: 'PublishJournal' = None,
+        contents: dict[str, str] = None) -> list[PublisherSpec]:
+    """
+    Channels not yet published in this issue with the same content, published post is never duplicated
+    contents: rendered contents compared with hashes published before, without them channel published
+        with any content is skipped
+    """
+    if not journal:
+        return publishers
+    from lib.journal import content_hash
+    pending = []
+    for spec in publishers:
+        published = journal.published.get(spec.name)
+        if published and (contents is None or published['hash'] == content_hash(contents[spec.format])):
+            logger.info('Skipping {}, already published in issue #{}: {}'.format(spec.name, journal.issue, published['value']))
+            continue
+        if published:
+            logger.warning('Content of {} changed since it was published in issue #{} ({}), publishing it again'.format(
+                spec.name, journal.issue, published['value']))
+        elif spec.name in journal.pending:
+            logger.warning('Publishing to {} was interrupted, check it for duplicate of issue #{}'.format(spec.name, journal.issue))
+        pending.append(spec)
+    return pending
+
+def mark_published(config: dict, transport: 'HttpTransport', store: 'ArticleStore', journal: 'PublishJournal', articles_list) -> bool:
+    """
+    Marks articles not yet patched in this issue as published
+    Returns True when all of them are marked
+    """
+    from lib.notion import NotionDbClient, Article
+    article_ids = journal.unpatched_ids() if journal else articles_list.ids
+    if len(article_ids) == 0:
+        return True
+    logger.info('Mark articles as published')
+    notion_client = NotionDbClient(config['notion'], transport=transport, store=store)
+    def on_result(result):
+        if journal and result.success:
+            journal.record_patched(result.article_id)
+    publish_report = notion_client.publish_articles(
+        article_list=[Article(id, 'page') for id in article_ids], on_result=on_result)
+    if publish_report.failed:
+        logger.error('Failed to mark {} articles as published'.format(len(publish_report.failed)))
+    return not publish_report.failed
+
+def write_metrics(config: dict, metrics: 'Metrics', transport: 'HttpTransport') -> None:
+    if not metrics.enabled:
+        return
+    metrics_config = config.get('metrics') or {}
+    if metrics_config.get('json'):
+        metrics.write_json(metrics_config['json'], {'transport': transport.stats.as_dict()})
+    if metrics_config.get('prometheus'):
+        metrics.write_prometheus(metrics_config['prometheus'])
+    logger.info('Metrics written')
+
+
+def publish_issue(config: dict, args, transport: 'HttpTransport', metrics: 'Metrics', store: 'ArticleStore' = None,
+        resume: bool = False, articles_list=None, cache: 'FragmentCache' = None, publishers: list[PublisherSpec] = None,
+        digest: str = None) -> 'IssueReport':
+    """
+    Single issue: fetch articles (unless given), render, publish to channels and mark articles as published
+    resume: finish last unfinished issue instead of starting new one, issue number is not bumped again
+    publishers: channels of the issue, selected by flags by default
+    """
+    from lib.publisher import IssueReport, PublishDispatcher
+    links = None
+    verified = True
+    if resume:
+        journal = get_journal(config, args, resume=True)
+        issue_number, title, preface = journal.issue, journal.title, journal.preface
+        publishers = [PUBLISHERS[name] for name in journal.channels]
+        update = True
+        fetched = journal.article_ids is None
+        if fetched:
+            # interrupted before articles were journaled, nothing is published yet, articles are fetched as for new issue
+            if articles_list is None:
+                articles_list = get_content_articles(config, transport, store, args.replay)
+            links = get_links(config, articles_list, transport, metrics)
+            articles_list = skip_dead_links(config, articles_list, links)
+            journal.record_articles(articles_list.ids)
+        if len(journal.article_ids) == 0:
+            # only explicitly empty issue (e.g. journal left by older versions) has nothing to finish
+            journal.complete()
+            logger.warning('Issue #{} has no articles, marked as completed'.format(issue_number))
+            return IssueReport(digest, issue_number, 0, completed=True)
+        if not fetched:
+            articles_list = get_resumed_articles(config, transport, store, journal, articles_list) if publishers else None
+            if articles_list is not None:
+                # content of missing articles cannot be compared, published channels are skipped by name then
+                verified = len(articles_list) == len(journal.article_ids)
+                # articles of the issue are journaled already, dead links are only flagged
+                links = get_links(config, articles_list, transport, metrics)
     else:
-        logger.error ('Communication with Confluence somewhat failed and response isnt a json.\nResponse:' + repr(response))
+        publishers = publishers if publishers is not None else selected_publishers(args)
+        if articles_list is None:
+            articles_list = get_content_articles(config, transport, store, args.replay)
+        links = get_links(config, articles_list, transport, metrics)
+        articles_list = skip_dead_links(config, articles_list, links)
+        if len(articles_list) == 0:
+            # issue number is not used up and no journal is left to resume
+            logger.info('No unpublished articles, issue is not published')
+            return IssueReport(digest, None, 0, completed=True)
+        with metrics.stage('issue_number'):
+            issue_number = get_issue_number(config, args)
+        title = config['issue'].get('title', 'Techish Digest #{}').format(issue_number)
+        preface = args.message
+        if not preface:
+            preface = '\n'
+        journal = get_journal(config, args, issue_number)
+        if journal and not journal.started:
+            journal.start(title, preface, [spec.name for spec in publishers])
+        if journal and journal.article_ids is None:
+            journal.record_articles(articles_list.ids)
+        update = args.update
+
+    dispatch_report = None
+    if articles_list is not None:
+        contents = get_contents(config, articles_list, title, preface, get_required_formats(publishers), metrics, cache, links)
+        pending_publishers = get_pending_publishers(publishers, journal, contents if verified else None)
+        channels = get_publish_channels(config, pending_publishers, title, contents, transport, journal)
+        dispatch_report = PublishDispatcher(metrics).dispatch(channels)
+        logger.info(dispatch_report)
+    marked = True
+    if update and dispatch_report and not dispatch_report.required_succeeded:
+        logger.error('Required channels failed, articles are not marked as published')
+        marked = False
+    elif update and any(spec.marks_published for spec in publishers):
+        # works good
+        marked = mark_published(config, transport, store, journal, articles_list)
+    completed = marked and not (dispatch_report and dispatch_report.failed)
+    if journal and completed:
+        journal.complete()
+        logger.info('Issue #{} completed'.format(issue_number))
+    articles_count = len(articles_list) if articles_list is not None else len(journal.article_ids)
+    return IssueReport(digest, issue_number, articles_count, dispatch_report, update and marked, completed)
+
+def write_issue(config: dict, args, transport: 'HttpTransport', metrics: 'Metrics', store: 'ArticleStore' = None,
+        digest: str = None) -> 'IssueReport':
+    """
+    Streaming pipeline for huge backlogs: articles flow from Notion (parsed incrementally) into per category
+    spill buckets and digest of every format is rendered chapter by chapter into its file in args.output,
+    so memory stays flat whatever the number of articles
+    """
+    from lib.digest import Digest
+    from lib.notion import NotionDbClient
+    from lib.publisher import IssueReport
+    from lib.service import write_digest
+    from lib.spill import CategoryBuckets
+    issue_number = get_issue_number(config, args)
+    title = config['issue'].get('title', 'Techish Digest #{}').format(issue_number)
+    preface = args.message if args.message else '\n'
+    digest_config = config.get('digest') or {}
+    notion_client = NotionDbClient(config['notion'], transport=transport, store=store)
+    os.makedirs(args.output, exist_ok=True)
+    with CategoryBuckets.from_config(digest_config.get('spill')) as buckets:
+        count = buckets.extend(notion_client.iter_unpublished_articles(load_saved=args.replay, stream=True))
+        logger.info('Got {} articles, {} spilled to disk'.format(count, buckets.spilled))
+        if count == 0:
+            raise ValueError('No unpublished articles to write')
+        issue_digest = Digest.from_buckets(buckets, title, preface, digest_config.get('categories'))
+        for format in (FORMAT_MARKDOWN, FORMAT_HTML):
+            path = os.path.join(args.output, '{}-{}{}'.format(digest if digest else 'digest', issue_number, FORMAT_EXTENSIONS[format]))
+            with open(path, 'w', encoding='utf-8') as output:
+                write_digest(issue_digest, format, output, metrics)
+            logger.info('Digest written to ' + path)
+    return IssueReport(digest, issue_number, count, completed=True)
 
+def run_digests(config: dict, args, transport: 'HttpTransport', metrics: 'Metrics') -> list['IssueReport']:
+    """
+    Issue of every configured digest, digests are processed in parallel (digest.parallel at once)
+    over shared transport, so they share connection pools and Notion rate limit
+    Failure of one digest does not stop the others, it is part of its report
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from lib.journal import PublishJournal
+    from lib.publisher import IssueReport
+    digests = get_digest_configs(config, args.digests)
 
-def publish_medium(config, title, content):
-    logger.info('Publishing to medium')
-    medium = MediumBlog(config=config['medium'])
-    response = medium.post(title=title, content=content)
-    logger.debug('Medium response[http_code:{}]:\n{}'.format(response.status_code, response.text))
-    if (response.status_code >= 200 or response.status_code < 300):
-        logger.info('Mediums publish is successful')
+    def run(name: str|None, digest_config: dict) -> 'IssueReport':
+        start = time.monotonic()
+        journal_directory = (digest_config.get('journal') or {}).get('directory', 'journals')
+        if args.resume and len(digests) > 1 and PublishJournal.latest_unfinished(journal_directory) is None:
+            logger.info('Digest {} has no unfinished issue'.format(name))
+            return IssueReport(name, completed=True)
+        try:
+            # sqlite store is opened in the thread using it
+            store = get_article_store(digest_config, args)
+            if args.output:
+                report = write_issue(digest_config, args, transport, metrics, store, name)
+            else:
+                report = publish_issue(digest_config, args, transport, metrics, store, args.resume,
+                    publishers=get_digest_publishers(config, name, args), digest=name)
+        except Exception as e:
+            if len(digests) == 1:
+                raise
+            logger.exception('Digest {} failed'.format(name))
+            report = IssueReport(name, error=repr(e))
+        report.duration = time.monotonic() - start
+        return report
 
+    if len(digests) == 1:
+        return [run(*digests[0])]
+    parallel = (config.get('digest') or {}).get('parallel', 4)
+    with ThreadPoolExecutor(max_workers=min(parallel, len(digests)), thread_name_prefix='digest') as executor:
+        return list(executor.map(lambda digest: run(*digest), digests))
+
+def write_report(config: dict, reports: list['IssueReport']) -> None:
+    """
+    Logs report of every digest and writes them together into report.file when configured
+    """
+    import json
+    for report in reports:
+        if report.completed:
+            logger.info(report)
+        else:
+            logger.error(report)
+    report_file = (config.get('report') or {}).get('file')
+    if report_file:
+        with open(report_file, 'w') as f:
+            json.dump({'digests': [report.as_dict() for report in reports]}, f, indent=2)
+        logger.info('Report written to ' + report_file)
+
+def run_daemon(config: dict, args, transport: 'HttpTransport', metrics: 'Metrics') -> None:
+    """
+    Articles, http connections and rendered fragments stay warm between issues
+    Unfinished issue (e.g. failed channel) is resumed before new one is started
+    """
+    from lib.daemon import PublisherDaemon, HealthServer
+    from lib.fragment_cache import FragmentCache
+    from lib.journal import PublishJournal
+    from lib.notion import NotionDbClient
+    digests = get_digest_configs(config, args.digests)
+    if len(digests) > 1:
+        raise ValueError('Daemon publishes single digest, select one with --digest and run daemon per digest')
+    publishers = get_digest_publishers(config, digests[0][0], args)
+    name, config = digests[0]
+    store = get_article_store(config, args)
+    daemon_config = config.get('daemon') or {}
+    cache = FragmentCache.from_config((config.get('digest') or {}).get('cache')) or FragmentCache(':memory:')
+    journal_directory = (config.get('journal') or {}).get('directory', 'journals')
+
+    def publish(articles_list) -> bool:
+        resume = args.update and PublishJournal.latest_unfinished(journal_directory) is not None
+        return publish_issue(config, args, transport, metrics, store, resume, articles_list, cache, publishers, name).completed
+
+    client = NotionDbClient(config['notion'], transport=transport)
+    daemon = PublisherDaemon.from_config(daemon_config, client, publish, metrics)
+    health = HealthServer.from_config(daemon_config.get('health'), daemon, metrics)
+    if health:
+        health.start()
+    try:
+        daemon.run()
+    finally:
+        if health:
+            health.stop()
+        cache.close()
 
 if __name__ == "__main__":
     args = parser.parse_args()
+    if args.output and (selected_publishers(args) or args.update or args.resume or args.daemon):
+        parser.error('--output writes digest files only, it cannot be combined with channels, -u, --resume or --daemon')
+    configure_logging()
+    from lib.metrics import Metrics
+    from lib.transport import HttpTransport
     config = load_config()
+    metrics = Metrics.from_config(config.get('metrics'))
+    transport = HttpTransport(config.get('http'), metrics=metrics)
 
-    issue_number = get_issue_number(config, args)
-    articles_list = get_content_articles(config)
-    title = 'Techish Digest #' + issue_number
-    preface = args.message
-    if not preface:
-        preface = '\n'
-
-    content_md = get_markdown_content(articles_list, title, preface)
-    content_html = get_html_content(articles_list, title, preface)
-
-    if args.confluence:
-        publish_confluence(config, title, content_html)
-    if args.msteams:
-        logger.info('Publishing to MsTeams')
-        # do msteams stuff
-    if args.medium:
-        publish_medium(config, title, content_md)
-    if args.update and len(articles_list) > 0 and (args.confluence or args.medium):
-        logger.info('Mark articles as published')
-        # works good
-        notion_client = NotionDbClient(config['notion'])
-        notion_client.publish_articles(article_list=articles_list)
-
+    if args.daemon:
+        run_daemon(config, args, transport, metrics)
+    else:
+        write_report(config, run_digests(config, args, transport, metrics))
+    logger.info(transport.stats)
+    write_metrics(config, metrics, transport)